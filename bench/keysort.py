@@ -15,7 +15,7 @@ for dtype1 in ('S6', 'b1',
         c=a.copy()
 
         t1=time()
-        d=c.argsort()
+        d=c.argsort(kind='mergesort')
         # c.sort()
         # e=c
         e=c[d]
@@ -23,10 +23,20 @@ for dtype1 in ('S6', 'b1',
         tref = time()-t1
         print "normal sort time-->", tref
 
-        t1=time()
-        keysort(a, b)
-        tks = time()-t1
-        print "keysort time-->", tks, "    %.2fx" % (tref/tks,)
-        assert numpy.alltrue(a == e)
-        #assert numpy.alltrue(b == d)
-        assert numpy.alltrue(f == d)
+        methods = ['quicksort']
+        if dtype1 != 'S6':
+            methods.append('radix')
+        for method in methods:
+            a2=a.copy()
+            b2=b.copy()
+            t1=time()
+            keysort(a2, b2, method)
+            tks = time()-t1
+            print "keysort (%s) time-->" % method, tks, \
+                  "    %.2fx" % (tref/tks,)
+            assert numpy.alltrue(a2 == e)
+            if method == 'radix':
+                # The radix sort is stable, like the mergesort
+                assert numpy.alltrue(b2 == f)
+            else:
+                assert numpy.alltrue(a[b2] == e)
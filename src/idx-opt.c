@@ -1,4 +1,5 @@
 #include "stdio.h"
+#include "string.h"
 #include "idx-opt.h"
 
 /*-------------------------------------------------------------------------
@@ -327,6 +328,121 @@ int bisect_right_d(npy_float64 *a, npy_float64 x, int hi, int offset) {
   return lo;
 }
 
+/*   Optimised version for left/fixed-width strings of ss bytes.
+     Strings are null-padded, so they compare as unsigned bytes. */
+int bisect_left_S(char *a, char *x, int hi, int offset, int ss) {
+  int lo = 0;
+  int mid;
+
+  if (memcmp(x, a+offset*ss, ss) <= 0) return 0;
+  if (memcmp(a+(hi-1+offset)*ss, x, ss) < 0) return hi;
+  while (lo < hi) {
+    mid = lo + (hi-lo)/2;
+    if (memcmp(a+(mid+offset)*ss, x, ss) < 0) lo = mid+1;
+    else hi = mid;
+  }
+  return lo;
+}
+
+/*   Optimised version for right/fixed-width strings of ss bytes */
+int bisect_right_S(char *a, char *x, int hi, int offset, int ss) {
+  int lo = 0;
+  int mid;
+
+  if (memcmp(x, a+offset*ss, ss) < 0) return 0;
+  if (memcmp(a+(hi-1+offset)*ss, x, ss) <= 0) return hi;
+  while (lo < hi) {
+    mid = lo + (hi-lo)/2;
+    if (memcmp(x, a+(mid+offset)*ss, ss) < 0) hi = mid;
+    else lo = mid+1;
+  }
+  return lo;
+}
+
+
+/*-------------------------------------------------------------------------
+ * Function: bisect_{left,right}_t
+ *
+ * Purpose: Look-up for a value in sorted arrays of any of the types
+ *          supported by the optimised versions above
+ *
+ * Return: The index of the value in array
+ *
+ * Comments:
+ *
+ *  These are used for searching many items at once, with the type of
+ *  the values given by one of the IDX_* codes in idx-opt.h.  `x`
+ *  points to the item, which is a npy_int64 for integer types (but
+ *  a npy_uint64 for IDX_UINT64), a npy_float64 for float types and a
+ *  string of `ss` bytes for IDX_STRING.
+ *
+ *-------------------------------------------------------------------------
+ */
+
+int bisect_left_t(int type, char *a, char *x, int hi, int ss) {
+  switch(type) {
+  case IDX_INT8:
+    return bisect_left_b((npy_int8 *)a, (long)*(npy_int64 *)x, hi, 0);
+  case IDX_UINT8:
+    return bisect_left_ub((npy_uint8 *)a, (long)*(npy_int64 *)x, hi, 0);
+  case IDX_INT16:
+    return bisect_left_s((npy_int16 *)a, (long)*(npy_int64 *)x, hi, 0);
+  case IDX_UINT16:
+    return bisect_left_us((npy_uint16 *)a, (long)*(npy_int64 *)x, hi, 0);
+  case IDX_INT32:
+    return bisect_left_i((npy_int32 *)a, (long)*(npy_int64 *)x, hi, 0);
+  case IDX_UINT32:
+    /* Items out of the range of values would wrap around */
+    if (*(npy_int64 *)x < 0) return 0;
+    if (*(npy_int64 *)x > 0xffffffffLL) return hi;
+    return bisect_left_ui((npy_uint32 *)a, (npy_uint32)*(npy_int64 *)x,
+                          hi, 0);
+  case IDX_INT64:
+    return bisect_left_ll((npy_int64 *)a, *(npy_int64 *)x, hi, 0);
+  case IDX_UINT64:
+    return bisect_left_ull((npy_uint64 *)a, *(npy_uint64 *)x, hi, 0);
+  case IDX_FLOAT32:
+    return bisect_left_f((npy_float32 *)a, *(npy_float64 *)x, hi, 0);
+  case IDX_FLOAT64:
+    return bisect_left_d((npy_float64 *)a, *(npy_float64 *)x, hi, 0);
+  case IDX_STRING:
+    return bisect_left_S(a, x, hi, 0, ss);
+  }
+  return -1;
+}
+
+int bisect_right_t(int type, char *a, char *x, int hi, int ss) {
+  switch(type) {
+  case IDX_INT8:
+    return bisect_right_b((npy_int8 *)a, (long)*(npy_int64 *)x, hi, 0);
+  case IDX_UINT8:
+    return bisect_right_ub((npy_uint8 *)a, (long)*(npy_int64 *)x, hi, 0);
+  case IDX_INT16:
+    return bisect_right_s((npy_int16 *)a, (long)*(npy_int64 *)x, hi, 0);
+  case IDX_UINT16:
+    return bisect_right_us((npy_uint16 *)a, (long)*(npy_int64 *)x, hi, 0);
+  case IDX_INT32:
+    return bisect_right_i((npy_int32 *)a, (long)*(npy_int64 *)x, hi, 0);
+  case IDX_UINT32:
+    /* Items out of the range of values would wrap around */
+    if (*(npy_int64 *)x < 0) return 0;
+    if (*(npy_int64 *)x > 0xffffffffLL) return hi;
+    return bisect_right_ui((npy_uint32 *)a, (npy_uint32)*(npy_int64 *)x,
+                           hi, 0);
+  case IDX_INT64:
+    return bisect_right_ll((npy_int64 *)a, *(npy_int64 *)x, hi, 0);
+  case IDX_UINT64:
+    return bisect_right_ull((npy_uint64 *)a, *(npy_uint64 *)x, hi, 0);
+  case IDX_FLOAT32:
+    return bisect_right_f((npy_float32 *)a, *(npy_float64 *)x, hi, 0);
+  case IDX_FLOAT64:
+    return bisect_right_d((npy_float64 *)a, *(npy_float64 *)x, hi, 0);
+  case IDX_STRING:
+    return bisect_right_S(a, x, hi, 0, ss);
+  }
+  return -1;
+}
+
 
 /*  Now, it follows a series of functions for doing in-place sorting.
   The array that starts at start1 is sorted in-place. array2 is also
@@ -1166,3 +1282,145 @@ int keysort_S(char *start1, int ss, char *start2, npy_intp num, int ts)
 }
 
 
+
+
+/*-------------------------------------------------------------------------
+ * Function: keysort_radix
+ *
+ * Purpose: Sort in-place the array of numbers that starts at start1
+ *          with an LSD radix sort, moving the elements of the array
+ *          that starts at start2 following the array1 order
+ *
+ * Return: 0 on success, -1 if the temporary buffers cannot be allocated
+ *         and -2 if the type of the keys is not supported
+ *
+ * Comments:
+ *
+ *  `vs` is the size of the keys (1, 2, 4 or 8 bytes) and `kind` their
+ *  NumPy kind ('b', 'u', 'i' or 'f').  Keys are mapped into unsigned
+ *  integers with the same order before sorting (and mapped back
+ *  afterwards), so that one pass per byte is enough.  Passes for bytes
+ *  that are the same in all the keys are skipped.
+ *
+ *  Unlike the keysort_* functions above, this sort is stable.  It
+ *  needs temporary buffers as large as both arrays.
+ *
+ *-------------------------------------------------------------------------
+ */
+
+/* Copy the `ts` bytes of an element of array2 */
+#define iCOPY(a,b) {						\
+    switch(ts) {						\
+    case 8:							\
+      *(npy_int64 *)(a) = *(npy_int64 *)(b);			\
+      break;							\
+    case 4:							\
+      *(npy_int32 *)(a) = *(npy_int32 *)(b);			\
+      break;							\
+    case 2:							\
+      *(npy_int16 *)(a) = *(npy_int16 *)(b);			\
+      break;							\
+    case 1:							\
+      *(npy_int8 *)(a) = *(npy_int8 *)(b);			\
+      break;							\
+    default:							\
+      opt_memcpy((a), (b), ts);					\
+    }								\
+  }
+
+#define RADIX_KEYSORT(name, utype)					\
+static int								\
+name(utype *keys, char kind, char *start2, npy_intp num, int ts)	\
+{									\
+  const int nbytes = sizeof(utype);					\
+  const utype sign = (utype)1 << (8*sizeof(utype) - 1);			\
+  npy_intp counts[sizeof(utype)][256];					\
+  npy_intp *c, i, j, sum, t;						\
+  utype *kbuf, *ksrc, *kdst, *kt, k;					\
+  char *ibuf, *isrc, *idst, *it;					\
+  int pass, shift;							\
+									\
+  if (num < 2) return 0;						\
+  kbuf = malloc(num * sizeof(utype));					\
+  ibuf = malloc(num * ts);						\
+  if (kbuf == NULL || ibuf == NULL) {					\
+    free(kbuf); free(ibuf);						\
+    return -1;								\
+  }									\
+									\
+  /* Map the keys into ordered unsigned integers and compute the	\
+     histograms of all their bytes at once */				\
+  memset(counts, 0, sizeof(counts));					\
+  for (i = 0; i < num; i++) {						\
+    k = keys[i];							\
+    if (kind == 'i') k ^= sign;						\
+    else if (kind == 'f') k = (k & sign) ? (utype)~k : (k ^ sign);	\
+    keys[i] = k;							\
+    for (pass = 0; pass < nbytes; pass++)				\
+      counts[pass][(k >> (8*pass)) & 0xff]++;				\
+  }									\
+									\
+  ksrc = keys; kdst = kbuf; isrc = start2; idst = ibuf;		\
+  for (pass = 0; pass < nbytes; pass++) {				\
+    shift = 8*pass;							\
+    c = counts[pass];							\
+    if (c[(ksrc[0] >> shift) & 0xff] == num)				\
+      continue;		/* the same byte in all the keys */		\
+    for (sum = 0, j = 0; j < 256; j++) {				\
+      t = c[j]; c[j] = sum; sum += t;					\
+    }									\
+    for (i = 0; i < num; i++) {						\
+      k = ksrc[i];							\
+      j = c[(k >> shift) & 0xff]++;					\
+      kdst[j] = k;							\
+      iCOPY(idst + j*ts, isrc + i*ts);					\
+    }									\
+    kt = ksrc; ksrc = kdst; kdst = kt;					\
+    it = isrc; isrc = idst; idst = it;					\
+  }									\
+  if (ksrc != keys) {							\
+    memcpy(keys, ksrc, num * sizeof(utype));				\
+    memcpy(start2, isrc, num * ts);					\
+  }									\
+									\
+  /* Map the keys back into their original type */			\
+  if (kind == 'i') {							\
+    for (i = 0; i < num; i++) keys[i] ^= sign;				\
+  }									\
+  else if (kind == 'f') {						\
+    for (i = 0; i < num; i++) {						\
+      k = keys[i];							\
+      keys[i] = (k & sign) ? (k ^ sign) : (utype)~k;			\
+    }									\
+  }									\
+									\
+  free(kbuf); free(ibuf);						\
+  return 0;								\
+}
+
+RADIX_KEYSORT(radix_keysort_8, npy_uint8)
+RADIX_KEYSORT(radix_keysort_16, npy_uint16)
+RADIX_KEYSORT(radix_keysort_32, npy_uint32)
+RADIX_KEYSORT(radix_keysort_64, npy_uint64)
+
+
+int keysort_radix(char *start1, int vs, char kind,
+		  char *start2, npy_intp num, int ts)
+{
+  if (kind != 'b' && kind != 'u' && kind != 'i' && kind != 'f')
+    return -2;
+  if (kind == 'f' && vs != 4 && vs != 8)
+    return -2;
+  switch(vs) {
+  case 1:
+    return radix_keysort_8((npy_uint8 *)start1, kind, start2, num, ts);
+  case 2:
+    return radix_keysort_16((npy_uint16 *)start1, kind, start2, num, ts);
+  case 4:
+    return radix_keysort_32((npy_uint32 *)start1, kind, start2, num, ts);
+  case 8:
+    return radix_keysort_64((npy_uint64 *)start1, kind, start2, num, ts);
+  default:
+    return -2;
+  }
+}
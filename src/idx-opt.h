@@ -27,6 +27,25 @@ int bisect_right_f(npy_float32 *a, npy_float64 x, int hi, int offset);
 int bisect_left_d(npy_float64 *a, npy_float64 x, int hi, int offset);
 int bisect_right_d(npy_float64 *a, npy_float64 x, int hi, int offset);
 
+int bisect_left_S(char *a, char *x, int hi, int offset, int ss);
+int bisect_right_S(char *a, char *x, int hi, int offset, int ss);
+
+/* Types of values for the generic bisect functions */
+#define IDX_INT8     0
+#define IDX_UINT8    1
+#define IDX_INT16    2
+#define IDX_UINT16   3
+#define IDX_INT32    4
+#define IDX_UINT32   5
+#define IDX_INT64    6
+#define IDX_UINT64   7
+#define IDX_FLOAT32  8
+#define IDX_FLOAT64  9
+#define IDX_STRING  10
+
+int bisect_left_t(int type, char *a, char *x, int hi, int ss);
+int bisect_right_t(int type, char *a, char *x, int hi, int ss);
+
 
 int keysort_f64(npy_float64 *start1, char *start2, npy_intp num, int ts);
 int keysort_f32(npy_float32 *start1, char *start2, npy_intp num, int ts);
@@ -40,3 +59,6 @@ int keysort_i8(npy_int8 *start1, char *start2, npy_intp num, int ts);
 int keysort_u8(npy_uint8 *start1, char *start2, npy_intp num, int ts);
 int keysort_S(char *start1, int ss, char *start2, npy_intp num, int ts);
 
+int keysort_radix(char *start1, int vs, char kind,
+                  char *start2, npy_intp num, int ts);
+
@@ -101,6 +101,7 @@ from tables.earray import EArray
 from tables.vlarray import VLArray
 from tables.unimplemented import UnImplemented, Unknown
 from tables.expression import Expr
+from tables.joins import join
 from tables.tests import print_versions, test
 
 
@@ -117,7 +118,7 @@ __all__ = [
     # Functions:
     'isHDF5File', 'isPyTablesFile', 'whichLibVersion',
     'copyFile', 'openFile', 'print_versions', 'test',
-    'split_type', 'restrict_flavors', 'lrange',
+    'split_type', 'restrict_flavors', 'lrange', 'join',
     # Helper classes:
     'IsDescription', 'Description', 'Filters', 'Cols', 'Column',
     # Types:
@@ -51,7 +51,7 @@ SYS_ATTRS = ["CLASS", "VERSION", "TITLE", "NROWS", "EXTDIM",
              "ENCODING", "PYTABLES_FORMAT_VERSION",
              "FLAVOR", "FILTERS", "AUTO_INDEX",
              "DIRTY", "NODE_TYPE", "NODE_TYPE_VERSION",
-             "PSEUDOATOM"]
+             "PSEUDOATOM", "QUERY_VERSION", "QUERY_TABLE_ID"]
 # Prefixes of other system attributes
 SYS_ATTRS_PREFIXES = ["FIELD_"]
 # RO_ATTRS will be disabled and let the user modify them if they
@@ -65,7 +65,8 @@ SYS_ATTRS_PREFIXES = ["FIELD_"]
 
 # The next attributes are not meant to be copied during a Node copy process
 SYS_ATTRS_NOTTOBECOPIED = ["CLASS", "VERSION", "TITLE", "NROWS", "EXTDIM",
-                           "PYTABLES_FORMAT_VERSION", "FILTERS", "ENCODING"]
+                           "PYTABLES_FORMAT_VERSION", "FILTERS", "ENCODING",
+                           "QUERY_VERSION", "QUERY_TABLE_ID"]
 # Attributes forced to be copied during node copies
 FORCE_COPY_CLASS = ['CLASS', 'VERSION']
 # Regular expression for column default values.
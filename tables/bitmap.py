@@ -0,0 +1,173 @@
+########################################################################
+#
+#       License: BSD
+#       Created: October 16, 2026
+#
+#       $Id$
+#
+########################################################################
+
+"""Compressed bitmaps for the chunks selected by indexed queries.
+
+Classes:
+
+    Bitmap
+
+Misc variables:
+
+    __version__
+"""
+
+import numpy
+
+
+__version__ = "$Revision$"
+
+
+def _normalize(starts, stops):
+    """Merge the overlapping or adjacent runs in sorted `starts`."""
+    keep = stops > starts
+    starts, stops = starts[keep], stops[keep]
+    if len(starts) < 2:
+        return (starts, stops)
+    # Running maximum of stops, so that nested runs are absorbed
+    stops = numpy.maximum.accumulate(stops)
+    # A new run begins where its start is past the end of the previous one
+    new = numpy.empty(len(starts), dtype=bool)
+    new[0] = True
+    new[1:] = starts[1:] > stops[:-1]
+    firsts = new.nonzero()[0]
+    lasts = numpy.append(firsts[1:] - 1, len(starts) - 1)
+    return (starts[firsts], stops[lasts])
+
+
+class Bitmap(object):
+    """
+    A run-length compressed bitmap of `size` bits.
+
+    The set bits are kept as sorted, disjoint and non-adjacent runs of
+    ``[start, stop)`` positions, so that memory and the time for
+    combining bitmaps (with the ``&``, ``|`` and ``~`` operators)
+    depend on the number of runs instead of on `size`.  This is well
+    suited for chunkmaps of indexed queries, where selected chunks are
+    either few or clustered.
+
+    Public instance variables
+    -------------------------
+
+    size
+        The number of bits in the bitmap.
+    starts
+        The start positions of the runs of set bits.
+    stops
+        The (exclusive) stop positions of the runs of set bits.
+
+    Public methods
+    --------------
+
+    any()
+        Is any bit set?
+    count()
+        Get the number of set bits.
+    positions()
+        Get the positions of set bits.
+    runs()
+        Iterate over the ``(start, stop)`` runs of set bits.
+    todense()
+        Get the bitmap as a boolean array.
+    """
+
+    def __init__(self, size, starts=None, stops=None):
+        self.size = size
+        if starts is None:
+            starts = stops = numpy.empty(shape=0, dtype='int64')
+        self.starts = numpy.asarray(starts, dtype='int64')
+        self.stops = numpy.asarray(stops, dtype='int64')
+
+    def fromdense(cls, chunkmap):
+        """Build a bitmap from the boolean array `chunkmap`."""
+        edges = numpy.diff(numpy.concatenate(
+            ([0], numpy.asarray(chunkmap, dtype='int8'), [0])))
+        idx = edges.nonzero()[0]
+        return cls(len(chunkmap), idx[edges[idx] > 0], idx[edges[idx] < 0])
+    fromdense = classmethod(fromdense)
+
+    def frompositions(cls, size, positions):
+        """Build a bitmap with the bits at `positions` set."""
+        positions = numpy.unique(numpy.asarray(positions, dtype='int64'))
+        return cls.fromruns(size, positions, positions + 1)
+    frompositions = classmethod(frompositions)
+
+    def fromruns(cls, size, starts, stops):
+        """Build a bitmap from possibly overlapping, unsorted runs."""
+        starts = numpy.asarray(starts, dtype='int64')
+        stops = numpy.asarray(stops, dtype='int64')
+        order = starts.argsort(kind='mergesort')
+        starts, stops = _normalize(starts[order], stops[order])
+        return cls(size, starts, stops)
+    fromruns = classmethod(fromruns)
+
+    def __repr__(self):
+        return "Bitmap(%d, %d runs, %d set)" % (
+            self.size, len(self.starts), self.count())
+
+    def any(self):
+        """Is any bit set?"""
+        return len(self.starts) > 0
+
+    def count(self):
+        """Get the number of set bits."""
+        return long((self.stops - self.starts).sum())
+
+    def runs(self):
+        """Iterate over the ``(start, stop)`` runs of set bits."""
+        for i in xrange(len(self.starts)):
+            yield (long(self.starts[i]), long(self.stops[i]))
+
+    def positions(self):
+        """Get the (sorted) positions of set bits."""
+        lengths = self.stops - self.starts
+        if len(lengths) == 0:
+            return numpy.empty(shape=0, dtype='int64')
+        # Every position is the start of its run plus its offset in it
+        offsets = numpy.arange(lengths.sum(), dtype='int64')
+        runstarts = numpy.repeat(self.starts, lengths)
+        firsts = numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+        return runstarts + offsets - firsts
+
+    def todense(self):
+        """Get the bitmap as a boolean array."""
+        dense = numpy.zeros(shape=self.size, dtype='bool')
+        for (start, stop) in self.runs():
+            dense[start:stop] = True
+        return dense
+
+    def _combine(self, other, minbits):
+        """Get the bits set in at least `minbits` of `self` and `other`."""
+        size = max(self.size, other.size)
+        bounds = numpy.concatenate(
+            (self.starts, self.stops, other.starts, other.stops))
+        if len(bounds) == 0:
+            return Bitmap(size)
+        nself, nother = len(self.starts), len(other.starts)
+        deltas = numpy.concatenate(
+            (numpy.ones(nself, 'int64'), -numpy.ones(nself, 'int64'),
+             numpy.ones(nother, 'int64'), -numpy.ones(nother, 'int64')))
+        # Number of bitmaps covering every interval between boundaries
+        bounds, inverse = numpy.unique(bounds, return_inverse=True)
+        covers = numpy.cumsum(numpy.bincount(inverse, weights=deltas))
+        selected = (covers[:-1] >= minbits).nonzero()[0]
+        starts, stops = _normalize(bounds[selected], bounds[selected+1])
+        return Bitmap(size, starts, stops)
+
+    def __and__(self, other):
+        return self._combine(other, 2)
+
+    def __or__(self, other):
+        return self._combine(other, 1)
+
+    def __invert__(self):
+        bounds = numpy.concatenate(([0], self.stops))
+        ends = numpy.concatenate((self.starts, [self.size]))
+        starts, stops = _normalize(bounds, ends)
+        return Bitmap(self.size, starts, stops)
@@ -20,6 +20,8 @@ Functions:
 
 `compile_condition`
     Compile a condition and extract usable index conditions.
+`expand_startswith`
+    Expand prefix predicates into string comparisons.
 `call_on_recarr`
     Evaluate a function over a record array.
 """
@@ -30,10 +32,42 @@ from numexpr.necompiler import expressionToAST, typeCompileAst
 from numexpr.necompiler import stringToExpression, NumExpr
 from tables.utilsExtension import getNestedField
 from tables.utils import lazyattr
+from tables.idxutils import StringNextAfter
 
 _no_matching_opcode = re.compile(r"[^a-z]([a-z]+)_([a-z]+)[^a-z]")
 # E.g. "gt" and "bfc" from "couldn't find matching opcode for 'gt_bfc'".
 
+_string_literal = r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")"""
+_startswith = re.compile(
+    _string_literal + r"""|\b([A-Za-z_][A-Za-z0-9_]*)\.startswith\(\s*"""
+    + _string_literal + r"""\s*\)""" )
+# E.g. "name" and "'ABC'" from "name.startswith('ABC')".  String literals
+# are matched first, so that predicates inside them are left alone.
+
+def expand_startswith(condition):
+    """
+    Expand prefix predicates in `condition` into string comparisons.
+
+    Numexpr does not support string methods, so predicates like
+    ``name.startswith('ABC')`` (with a literal prefix) are replaced by
+    the equivalent ``((name >= 'ABC') & (name < 'ABD'))`` range, which
+    is also able to use an index on ``name``.  The new condition is
+    returned.
+    """
+    def expand(match):
+        if match.group(1) is not None:
+            # A string literal, kept as is
+            return match.group(1)
+        var, prefix = match.group(2), eval(match.group(3), {}, {})
+        if not prefix.rstrip('\xff'):
+            # No string with this prefix has a larger prefix
+            return "(%s >= %r)" % (var, prefix)
+        upper = StringNextAfter(prefix, +1, len(prefix)).rstrip('\x00')
+        return "((%s >= %r) & (%s < %r))" % (var, prefix, var, upper)
+    if '.startswith' not in condition:
+        return condition
+    return _startswith.sub(expand, condition)
+
 def _unsupported_operation_error(exception):
     """
     Make the \"no matching opcode\" Numexpr `exception` more clear.
@@ -130,6 +164,19 @@ def _get_indexable_cmp(exprnode, indexedcols):
     return not_indexable
 
 
+def _is_multirange(ops):
+    """Are `ops` the operators of an expression with several ranges?"""
+    return type(ops[0]) is tuple
+
+
+def _get_idx_ranges(expr):
+    """Get the list of ``(ops, limits)`` ranges in index expression `expr`."""
+    var, ops, lims = expr
+    if _is_multirange(ops):
+        return zip(ops, lims)
+    return [(ops, lims)]
+
+
 def _get_idx_expr_recurse(exprnode, indexedcols, idxexprs, strexpr):
     """Here lives the actual implementation of the get_idx_expr() wrapper.
 
@@ -189,6 +236,18 @@ def _get_idx_expr_recurse(exprnode, indexedcols, idxexprs, strexpr):
         return not_indexable
 
     left, right = exprnode.children
+    # Use disjunctions of indexable expressions on the same column like
+    # ``(x < a) | (x > b)`` as a single lookup of several ranges.
+    if exprnode.value == 'or':
+        lexpr = _get_idx_expr_recurse(left, indexedcols, [], [''])
+        rexpr = _get_idx_expr_recurse(right, indexedcols, [], [''])
+        if ( type(lexpr) == list and type(rexpr) == list
+             and lexpr[0][0] == rexpr[0][0] ):
+            ranges = _get_idx_ranges(lexpr[0]) + _get_idx_ranges(rexpr[0])
+            expr = ( lexpr[0][0], tuple([ops for (ops, lims) in ranges]),
+                     tuple([lims for (ops, lims) in ranges]) )
+            return [expr]
+
     # Get the expression at left
     lcolvar, lop, llim = _get_indexable_cmp(left, indexedcols)
     # Get the expression at right
@@ -257,6 +316,11 @@ def _get_idx_expr(expr, indexedcols):
     * ``(a <[=] x) & (y <[=] b)`` and ``(a == x) | (b == y)``
     * ``~(~c_bool)``, ``~~c_bool`` and ``~(~c_bool) & (c_extra != 2)``
 
+    Disjunctions of indexable comparisons on the same column, like
+    ``(a < x) | (a > y)`` or ``(a == x) | (a == y) | (a == z)``, result
+    in a single expression in the form ``(var, (ops1, ops2...),
+    (limits1, limits2...))``, to be looked up as several ranges.
+
     (where ``a``, ``b`` and ``c_bool`` are indexed columns, but
     ``c_extra`` is not)
 
@@ -269,6 +333,63 @@ def _get_idx_expr(expr, indexedcols):
     return _get_idx_expr_recurse(expr, indexedcols, [], [''])
 
 
+def _get_conjuncts(exprnode):
+    """Get the list of expression nodes and'ed in `exprnode`."""
+    if exprnode.astType == 'op' and exprnode.value == 'and':
+        left, right = exprnode.children
+        return _get_conjuncts(left) + _get_conjuncts(right)
+    return [exprnode]
+
+
+def _get_composite_expr(expr, compositecols, indexedcols):
+    """
+    Extract the composite index expression out of `expr`.
+
+    `compositecols` maps the keys of composite indexes to tuples with
+    the variable names of their leading columns, in index order.  The
+    comparisons of a variable with a constant which are and'ed at the
+    top level of `expr` are looked for, and the composite index whose
+    longest prefix of columns is usable is chosen.  All the columns in
+    the prefix but the last one must be compared for equality, while
+    the last one may be compared with any operators, like in::
+
+        (sym == s) & (t >= a) & (t < b)
+
+    A tuple of ``(key, exprs)`` is returned, where `key` is the key of
+    the chosen composite index and `exprs` a tuple of expressions in the
+    form ``(var, (ops), (limits))`` for every column of the prefix.  A
+    prefix of a single column in `indexedcols` is not considered, as its
+    own index is used instead.  If no composite index is usable, `None`
+    is returned.
+    """
+    compvars = set()
+    for varnames in compositecols.itervalues():
+        compvars.update(varnames)
+    cmps = {}
+    for exprnode in _get_conjuncts(expr):
+        var, op, lim = _get_indexable_cmp(exprnode, compvars)
+        if var is None or op == 'invert':
+            continue
+        cmps.setdefault(var, []).append((op, lim))
+
+    best = None
+    for (key, varnames) in compositecols.iteritems():
+        exprs = []
+        for var in varnames:
+            if var not in cmps:
+                break
+            ops = tuple([op for (op, lim) in cmps[var]])
+            lims = tuple([lim for (op, lim) in cmps[var]])
+            exprs.append((var, ops, lims))
+            if 'eq' not in ops:
+                break  # no more columns can be used
+        if len(exprs) == 1 and exprs[0][0] in indexedcols:
+            continue
+        if exprs and (best is None or len(exprs) > len(best[1])):
+            best = (key, tuple(exprs))
+    return best
+
+
 
 class CompiledCondition(object):
     """Container for a compiled condition."""
@@ -287,15 +408,26 @@ class CompiledCondition(object):
         return frozenset(idxvars)
 
 
-    def __init__(self, func, params, idxexprs, strexpr):
+    def __init__( self, func, params, idxexprs, strexpr, complete=False,
+                  compexpr=None, zmexpr=None ):
         self.function = func
         """The compiled function object corresponding to this condition."""
         self.parameters = params
         """A list of parameter names for this condition."""
         self.index_expressions = idxexprs
-        """A list of expressions in the form ``(var, (ops), (limits))``."""
+        """A list of expressions in the form ``(var, (ops), (limits))``
+        (or ``(var, (ops1, ops2...), (limits1, limits2...))`` for
+        several ranges)."""
         self.string_expression = strexpr
         """The indexable expression in string format."""
+        self.is_complete = complete
+        """Whether the index expressions resolve the whole condition."""
+        self.composite_expression = compexpr
+        """A tuple of ``(key, exprs)`` for the usable composite index, or
+        `None` (see `_get_composite_expr()`)."""
+        self.zonemap_expression = zmexpr
+        """A tuple of ``(idxexprs, strexpr)`` like the index expressions
+        above, but on columns with a zone map, or `None`."""
 
     def __repr__(self):
         return ( "idxexprs: %s\nstrexpr: %s\nidxvars: %s"
@@ -310,22 +442,41 @@ class CompiledCondition(object):
         A new compiled condition is returned.  Values are taken from
         the `condvars` mapping and converted to Python scalars.
         """
-        exprs = self.index_expressions
-        exprs2 = []
-        for expr in exprs:
-            idxlims = expr[2]  # the limits are in third place
+        def replace_limits(idxlims):
             limit_values = []
             for idxlim in idxlims:
                 if type(idxlim) is tuple:  # variable
                     idxlim = condvars[idxlim[0]]  # look up value
                     idxlim = idxlim.tolist()  # convert back to Python
                 limit_values.append(idxlim)
-            # Add this replaced entry to the new exprs2
-            var, ops, _ = expr
-            exprs2.append((var, ops, tuple(limit_values)))
+            return tuple(limit_values)
+
+        def replace_exprs(exprs):
+            exprs2 = []
+            for expr in exprs:
+                var, ops, idxlims = expr  # the limits are in third place
+                if _is_multirange(ops):
+                    limit_values = tuple([ replace_limits(lims)
+                                           for lims in idxlims ])
+                else:
+                    limit_values = replace_limits(idxlims)
+                # Add this replaced entry to the new exprs2
+                exprs2.append((var, ops, limit_values))
+            return exprs2
+
+        exprs2 = replace_exprs(self.index_expressions)
+        compexpr = self.composite_expression
+        if compexpr is not None:
+            key, cexprs = compexpr
+            compexpr = (key, tuple([ (var, ops, replace_limits(lims))
+                                     for (var, ops, lims) in cexprs ]))
+        zmexpr = self.zonemap_expression
+        if zmexpr is not None:
+            zmexpr = (replace_exprs(zmexpr[0]), zmexpr[1])
         # Create a new container for the converted values
         newcc = CompiledCondition(
-            self.function, self.parameters, exprs2, self.string_expression )
+            self.function, self.parameters, exprs2, self.string_expression,
+            self.is_complete, compexpr, zmexpr )
         return newcc
 
 
@@ -342,7 +493,8 @@ def _get_variable_names(expression):
     return list(set(names))  # remove repeated names
 
 
-def compile_condition(condition, typemap, indexedcols, copycols):
+def compile_condition( condition, typemap, indexedcols, copycols,
+                       compositecols=None, zonemapcols=None ):
     """
     Compile a condition and extract usable index conditions.
 
@@ -351,8 +503,9 @@ def compile_condition(condition, typemap, indexedcols, copycols):
     `indexedcols`.  The part of `condition` having usable indexes is
     returned as a compiled condition in a `CompiledCondition` container.
 
-    Expressions such as '0 < c1 <= 1' do not work as expected.  The
-    Numexpr types of *all* variables must be given in the `typemap`
+    Expressions such as '0 < c1 <= 1' do not work as expected.  Prefix
+    predicates like ``name.startswith('ABC')`` are supported (see
+    `expand_startswith()`).  The Numexpr types of *all* variables must be given in the `typemap`
     mapping.  The ``function`` of the resulting `CompiledCondition`
     instance is a Numexpr function object, and the ``parameters`` list
     indicates the order of its parameters.
@@ -362,9 +515,19 @@ def compile_condition(condition, typemap, indexedcols, copycols):
     referenced.  This seems to accelerate access to unaligned,
     *unidimensional* arrays up to 2x (multidimensional arrays still
     need to be copied by `call_on_recarr()`.).
+
+    If given, `compositecols` maps the keys of composite indexes to the
+    variable names of their leading columns, and the usable composite
+    index (if any) is also extracted (see `_get_composite_expr()`).
+
+    If given, `zonemapcols` is a set of variable names of columns with a
+    zone map, and the comparisons on them are extracted in the same way
+    as index expressions are, as the ``zonemap_expression`` of the
+    result (see `Column.createZoneMap()`).
     """
 
     # Get the expression tree and extract index conditions.
+    condition = expand_startswith(condition)
     expr = stringToExpression(condition, typemap, {})
     if expr.astKind != 'bool':
         raise TypeError( "condition ``%s`` does not have a boolean type"
@@ -372,13 +535,27 @@ def compile_condition(condition, typemap, indexedcols, copycols):
     idxexprs = _get_idx_expr(expr, indexedcols)
     # Post-process the answer
     if type(idxexprs) == list:
-        # Simple expression
+        # Simple expression (the index resolves the whole condition)
         strexpr = ['e0']
+        complete = True
     else:
         # Complex expression
         idxexprs, strexpr = idxexprs
+        complete = False
     # Get rid of the unneccessary list wrapper for strexpr
     strexpr = strexpr[0]
+    compexpr = None
+    if compositecols:
+        compexpr = _get_composite_expr(expr, compositecols, indexedcols)
+    zmexpr = None
+    if zonemapcols:
+        zmexpr = _get_idx_expr(expr, zonemapcols)
+        if type(zmexpr) == list:
+            zmexpr = (zmexpr, 'e0')
+        elif zmexpr[0]:
+            zmexpr = (zmexpr[0], zmexpr[1][0])
+        else:
+            zmexpr = None
 
     # Get the variable names used in the condition.
     # At the same time, build its signature.
@@ -395,7 +572,8 @@ def compile_condition(condition, typemap, indexedcols, copycols):
     params = varnames
 
     # This is more comfortable to handle about than a tuple.
-    return CompiledCondition(func, params, idxexprs, strexpr)
+    return CompiledCondition(
+        func, params, idxexprs, strexpr, complete, compexpr, zmexpr )
 
 
 def call_on_recarr(func, params, recarr, param2arg=None):
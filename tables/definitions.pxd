@@ -29,6 +29,7 @@ cdef extern from "string.h":
   int strcmp(char *s1, char *s2)
   char *strdup(char *s)
   void *memcpy(void *dest, void *src, size_t n)
+  int memcmp(void *s1, void *s2, size_t n)
 
 cdef extern from "time.h":
   ctypedef int time_t
@@ -0,0 +1,293 @@
+########################################################################
+#
+#       License: BSD
+#       Created: October 16, 2026
+#
+#       $Id$
+#
+########################################################################
+
+"""External sorting of table columns.
+
+Classes:
+
+    SortedRuns
+
+Functions:
+
+    decodeCoords
+    encodeKeys
+    iterSortedColumn
+    iterSortedKeys
+    iterSortedRows
+
+Misc variables:
+
+    __version__
+"""
+
+import os
+import tempfile
+
+import numpy
+
+from tables import indexesExtension
+from tables.atom import Atom, Int64Atom, StringAtom
+from tables.utilsExtension import lrange
+
+
+__version__ = "$Revision$"
+
+
+class SortedRuns(object):
+    """
+    Sorted runs of keys and row coordinates in a temporary file.
+
+    Every run is sorted in memory with the `keysort()` function used for
+    building indexes, and then it is appended to a pair of enlargeable
+    arrays (one for keys and the other one for their row coordinates)
+    of a temporary PyTables file, which is removed when closed.  Runs
+    can then be merged by blocks.
+
+    Public instance variables
+    -------------------------
+
+    filename
+        The name of the temporary file.
+
+    Public methods
+    --------------
+
+    append(keys, coords)
+        Sort `keys` and `coords` and spill them as a new run.
+    merge()
+        Iterate over the merged runs.
+    close()
+        Close and remove the temporary file.
+    """
+
+    def __init__(self, keyatom, tmp_dir=None):
+        """Create a temporary file for runs of keys with `keyatom` type."""
+        from tables.file import openFile  # avoid a circular import
+
+        fd, self.filename = tempfile.mkstemp(".tmp", "pytables-", tmp_dir)
+        # Close the file descriptor so as to avoid leaks
+        os.close(fd)
+        self._file = tmpfile = openFile(self.filename, "w")
+        self._keys = tmpfile.createEArray('/', 'keys', keyatom, (0,))
+        self._coords = tmpfile.createEArray('/', 'coords', Int64Atom(), (0,))
+        self._runs = []
+
+    def append(self, keys, coords):
+        """
+        Sort `keys` and `coords` and spill them as a new run.
+
+        Both arrays are sorted in-place following the order of `keys`.
+        """
+        indexesExtension.keysort(keys, coords)
+        nrows = self._keys.nrows
+        self._runs.append((nrows, nrows + len(keys)))
+        self._keys.append(keys)
+        self._coords.append(coords)
+
+    def merge(self):
+        """
+        Iterate over the merged runs.
+
+        Runs are read and merged by blocks, and a ``(keys, coords)``
+        tuple of arrays is yielded for every merged block, in increasing
+        order of keys.
+        """
+        keysarr, coordsarr = self._keys, self._coords
+        blocksize = keysarr.nrowsinbuf
+        runs = self._runs
+        starts = [start for (start, stop) in runs]
+        stops = [stop for (start, stop) in runs]
+        keys, coords = [], []
+        for (i, (start, stop)) in enumerate(runs):
+            starts[i] = min(start+blocksize, stop)
+            keys.append(keysarr.read(start, starts[i]))
+            coords.append(coordsarr.read(start, starts[i]))
+
+        while True:
+            live = [i for i in xrange(len(runs)) if len(keys[i]) > 0]
+            if not live:
+                break
+            # Keys lower than the lowest last key in the buffers of the
+            # runs not read yet are complete.
+            bounds = [keys[i][-1] for i in live if starts[i] < stops[i]]
+            bound = None
+            if bounds:
+                bound = min(bounds)
+            mkeys, mcoords = [], []
+            for i in live:
+                n = len(keys[i])
+                if bound is not None:
+                    n = keys[i].searchsorted(bound, 'left')
+                mkeys.append(keys[i][:n])
+                mcoords.append(coords[i][:n])
+                keys[i], coords[i] = keys[i][n:], coords[i][n:]
+                if ( starts[i] < stops[i]
+                     and (len(keys[i]) == 0 or keys[i][-1] == bound) ):
+                    # Keys equal to the bound may go on in the next block
+                    stop = min(starts[i]+blocksize, stops[i])
+                    keys[i] = numpy.concatenate(
+                        [keys[i], keysarr.read(starts[i], stop)])
+                    coords[i] = numpy.concatenate(
+                        [coords[i], coordsarr.read(starts[i], stop)])
+                    starts[i] = stop
+            mkeys = numpy.concatenate(mkeys)
+            mcoords = numpy.concatenate(mcoords)
+            if len(mkeys) > 0:
+                indexesExtension.keysort(mkeys, mcoords)
+                yield (mkeys, mcoords)
+
+    def close(self):
+        """Close and remove the temporary file."""
+        if self._file is not None:
+            self._file.close()
+            os.remove(self.filename)
+            self._file = None
+
+
+def _iterSorted(readkeys, nkeys, keyatom, blocksize, maxsize, tmp_dir):
+    """
+    Iterate over keys in sorted order.
+
+    `readkeys` is a function returning a ``(keys, coords)`` tuple of
+    arrays for the keys in a ``(start, stop)`` range of the `nkeys`
+    keys, which are of `keyatom` type.  Keys are sorted in runs of
+    `maxsize` bytes, spilled to a temporary file in the `tmp_dir`
+    directory and merged (unless there is a single run), and the sorted
+    ``(keys, coords)`` are yielded in blocks.
+    """
+    runsize = max(maxsize // (keyatom.itemsize + 8), blocksize)
+    if nkeys <= runsize:
+        keys, coords = readkeys(0, nkeys)
+        indexesExtension.keysort(keys, coords)
+        for start in xrange(0, nkeys, blocksize):
+            yield (keys[start:start+blocksize], coords[start:start+blocksize])
+        return
+
+    runs = SortedRuns(keyatom, tmp_dir)
+    try:
+        for start in xrange(0, nkeys, runsize):
+            runs.append(*readkeys(start, min(start+runsize, nkeys)))
+        for block in runs.merge():
+            yield block
+    finally:
+        runs.close()
+
+
+def iterSortedColumn(table, colname, maxsize, tmp_dir=None):
+    """
+    Iterate over the values of a table column in sorted order.
+
+    A ``(keys, coords)`` tuple of arrays is yielded for every block of
+    values of the `colname` column of `table`, in increasing order of
+    values, where `coords` are the row coordinates of the values in
+    `keys`.  If the column takes more than `maxsize` bytes (including
+    row coordinates), it is sorted in runs of that size which are
+    spilled to a temporary file in the `tmp_dir` directory, and then
+    merged.
+    """
+    def readkeys(start, stop):
+        return (table._read(start, stop, 1, colname),
+                numpy.arange(start, stop, dtype='int64'))
+    atom = Atom.from_dtype(table.coldtypes[colname])
+    return _iterSorted(
+        readkeys, table.nrows, atom, table.nrowsinbuf, maxsize, tmp_dir)
+
+
+def encodeKeys(columns, coords=None, reverse=False):
+    """
+    Encode the values of several columns into single string keys.
+
+    `columns` is a sequence of arrays with the values of the columns
+    (of boolean, integer, floating point or string types), and `coords`
+    the array of row coordinates of these values.  A string array is
+    returned, whose order is the lexicographical order of the values in
+    `columns` (or the reversed one if `reverse` is true), with ties
+    resolved by increasing order of `coords`.  This allows sorting by
+    several columns with `keysort()`.
+
+    The row coordinates take the last 8 bytes of every key.  If
+    `coords` is `None`, they are left out, so that the keys can be used
+    as prefixes of the complete ones.
+    """
+    nrows = len(columns[0])
+    parts = []
+    for values in columns:
+        kind, size = values.dtype.kind, values.dtype.itemsize
+        if kind == 'S':
+            part = values.view('u1').reshape(nrows, size)
+        elif kind in 'biuf':
+            utype = numpy.dtype('u%d' % size)
+            signbit = utype.type(1 << (8*size - 1))
+            part = values.astype(values.dtype.newbyteorder('=')).view(utype)
+            if kind == 'i':
+                part = part ^ signbit
+            elif kind == 'f':
+                # Negative values get all their bits flipped
+                negative = (part & signbit) != 0
+                part = numpy.where(negative, ~part, part | signbit)
+            part = part.astype(utype.newbyteorder('>'))
+            part = part.view('u1').reshape(nrows, size)
+        else:
+            raise TypeError( "can not use values of type ``%s`` as keys"
+                             % values.dtype )
+        if reverse:
+            part = ~part
+        parts.append(part)
+    if coords is not None:
+        coords = numpy.asarray(coords, dtype='>u8')
+        parts.append(coords.view('u1').reshape(nrows, 8))
+    keys = numpy.concatenate(parts, axis=1)
+    return keys.view('S%d' % keys.shape[1]).ravel()
+
+
+def decodeCoords(keys):
+    """Get the row coordinates in the complete `keys` of `encodeKeys()`."""
+    keysize = keys.dtype.itemsize
+    coords = keys.view('u1').reshape(len(keys), keysize)[:, keysize-8:]
+    coords = numpy.ascontiguousarray(coords).view('>u8').ravel()
+    return coords.astype('int64')
+
+
+def iterSortedKeys(table, colnames, start, stop, step, reverse=False,
+                   maxsize=None, tmp_dir=None):
+    """
+    Iterate over the keys of the rows of a table in sorted order.
+
+    The rows of `table` in the range given by `start`, `stop` and `step`
+    are sorted by the values in the `colnames` columns (see
+    `encodeKeys()`), in runs of `maxsize` bytes which are spilled to a
+    temporary file in the `tmp_dir` directory and merged.  A ``(keys,
+    coords)`` tuple of arrays is yielded for every block, with the
+    sorted keys and their row coordinates.
+    """
+    if maxsize is None:
+        maxsize = table._v_file.params['SORT_MAX_SIZE']
+    def readkeys(pstart, pstop):
+        rstart, rstop = start + pstart*step, min(start + pstop*step, stop)
+        columns = [ table._read(rstart, rstop, step, colname)
+                    for colname in colnames ]
+        coords = numpy.arange(rstart, rstop, step, dtype='int64')
+        return (encodeKeys(columns, coords, reverse), coords)
+    keysize = 8 + sum([table.coldtypes[name].itemsize for name in colnames])
+    nrows = lrange(start, stop, step).length
+    return _iterSorted(readkeys, nrows, StringAtom(itemsize=keysize),
+                       table.nrowsinbuf, maxsize, tmp_dir)
+
+
+def iterSortedRows(table, colnames, start, stop, step, reverse=False,
+                   maxsize=None, tmp_dir=None):
+    """
+    Iterate over the rows of a table in sorted order.
+
+    The rows are sorted as in `iterSortedKeys()`, and an array with the
+    sorted row coordinates is yielded for every block.
+    """
+    for (keys, coords) in iterSortedKeys(
+        table, colnames, start, stop, step, reverse, maxsize, tmp_dir):
+        yield coords
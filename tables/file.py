@@ -54,6 +54,7 @@ from tables.path import joinPath, splitPath, isVisiblePath
 from tables import undoredo
 from tables.description import IsDescription, UInt8Col, StringCol
 from tables.filters import Filters
+from tables.querycache import QueryCache
 from tables.node import Node, NotLoggedMixin
 from tables.group import Group, RootGroup
 from tables.group import TransactionGroupG, TransactionG, MarkG
@@ -552,6 +553,9 @@ class File(hdf5Extension.File, object):
         # For the moment Undo/Redo is not enabled.
         self._undoEnabled = False
 
+        # The persistent query cache is opened on demand.
+        self._querycache = None
+
         # Set the flag to indicate that the file has been opened.
         # It must be set before opening the root group
         # to allow some basic access to its attributes.
@@ -2140,6 +2144,10 @@ Mark ``%s`` is older than the current mark. Use `redo()` or `goto()` instead."""
         # Close all loaded nodes.
         self.root._f_close()
 
+        # Close the persistent query cache (if any).
+        if self._querycache is not None:
+            self._querycache.close()
+
         # Post-conditions
         assert len(self._deadNodes) == 0, \
                ("dead nodes remain after closing dead nodes: %s"
@@ -2162,6 +2170,20 @@ Mark ``%s`` is older than the current mark. Use `redo()` or `goto()` instead."""
         del _open_files[filename]
 
 
+    def _getQueryCache(self):
+        """
+        Get the persistent query cache of this file.
+
+        `None` is returned if the ``QUERY_CACHE_FILE`` parameter is not
+        set.
+        """
+        cachefile = self.params['QUERY_CACHE_FILE']
+        if self._querycache is None and cachefile:
+            self._querycache = QueryCache(
+                cachefile, self.params['QUERY_CACHE_MAX_ELEMENTS'])
+        return self._querycache
+
+
     def __enter__(self):
         """Enter a context and return the same file."""
         return self
@@ -0,0 +1,264 @@
+########################################################################
+#
+#       License: BSD
+#       Created: October 16, 2026
+#
+#       $Id$
+#
+########################################################################
+
+"""Aggregation of table rows grouped by the values of a key.
+
+Classes:
+
+    Grouping
+    SpilledRuns
+
+Misc variables:
+
+    __version__
+"""
+
+import os
+import tempfile
+
+import numpy
+
+from tables.utilsExtension import getNestedField
+
+
+__version__ = "$Revision$"
+
+
+# The ufuncs used to reduce partial aggregates.
+_reduceFuncs = { 'sum': numpy.add,
+                 'min': numpy.minimum,
+                 'max': numpy.maximum, }
+
+
+class Grouping(object):
+    """
+    The aggregation of rows grouped by the values of a key.
+
+    Groups are kept as *partial aggregates*: arrays of records with a
+    ``key`` field, a ``count`` field and one more field for every sum,
+    minimum or maximum needed by the requested aggregates.  Partial
+    aggregates with the same key can be reduced into a single one, so
+    rows can be aggregated by blocks and the results of the blocks be
+    combined later on.  Reduced partial aggregates are sorted by key.
+
+    Public instance variables
+    -------------------------
+
+    aggregates
+        The mapping of column path names to the aggregates requested on
+        them, as in `Table.aggregateWhere()`.
+    dtype
+        The type of partial aggregate records.
+
+    Public methods
+    --------------
+
+    empty()
+        Get an empty array of partial aggregates.
+    partial(keys, records)
+        Get the partial aggregates of rows with the given `keys`.
+    reduce(partials)
+        Reduce partial aggregates with the same key into a single one.
+    results(partials)
+        Iterate over the final results of partial aggregates.
+    """
+
+    def __init__(self, keydtype, aggregates, coldtypes):
+        """
+        Create the aggregation of rows by a key of `keydtype` type.
+
+        The types of the columns in `aggregates` are taken from the
+        `coldtypes` mapping.
+        """
+        self.aggregates = aggregates
+        self._fields = fields = {}
+        """Maps ``(colname, func)`` tuples to partial aggregate fields."""
+        dtype = [('key', keydtype), ('count', 'int64')]
+        for (colname, afuncs) in aggregates.iteritems():
+            if isinstance(afuncs, basestring):
+                afuncs = (afuncs,)
+            for afunc in afuncs:
+                if afunc == 'count':
+                    continue
+                if afunc == 'mean':
+                    afunc = 'sum'
+                if (colname, afunc) in fields:
+                    continue
+                fdtype = coldtypes[colname]
+                if afunc == 'sum':
+                    fdtype = numpy.zeros(0, dtype=fdtype).sum().dtype
+                fields[(colname, afunc)] = name = 'a%d' % len(fields)
+                dtype.append((name, fdtype))
+        self.dtype = numpy.dtype(dtype)
+
+    def empty(self):
+        """Get an empty array of partial aggregates."""
+        return numpy.empty(0, dtype=self.dtype)
+
+    def partial(self, keys, records):
+        """
+        Get the partial aggregates of rows with the given `keys`.
+
+        The values of the aggregated columns are taken from the
+        `records` array, which may be `None` if only counts are needed.
+        """
+        partials = numpy.empty(len(keys), dtype=self.dtype)
+        partials['key'] = keys
+        partials['count'] = 1
+        for ((colname, afunc), name) in self._fields.iteritems():
+            partials[name] = getNestedField(records, colname)
+        return self.reduce(partials)
+
+    def reduce(self, partials):
+        """
+        Reduce partial aggregates with the same key into a single one.
+
+        The reduced partial aggregates are returned sorted by key.
+        """
+        keys = partials['key']
+        if len(keys) > 1 and (keys[1:] < keys[:-1]).any():
+            partials = partials[keys.argsort()]
+            keys = partials['key']
+        if len(keys) == 0:
+            return partials
+        starts = numpy.concatenate(
+            ([0], numpy.flatnonzero(keys[1:] != keys[:-1]) + 1))
+        if len(starts) == len(keys):
+            return partials
+        result = numpy.empty(len(starts), dtype=self.dtype)
+        result['key'] = keys[starts]
+        result['count'] = numpy.add.reduceat(partials['count'], starts)
+        for ((colname, afunc), name) in self._fields.iteritems():
+            result[name] = _reduceFuncs[afunc].reduceat(partials[name], starts)
+        return result
+
+    def results(self, partials):
+        """
+        Iterate over the final results of partial aggregates.
+
+        A ``(key, aggs)`` tuple is yielded for every record in
+        `partials`, where `aggs` is a dictionary with the same format as
+        the one returned by `Table.aggregateWhere()`.
+        """
+        fields = self._fields
+        for record in partials:
+            count = int(record['count'])
+            aggs = {}
+            for (colname, afuncs) in self.aggregates.iteritems():
+                if isinstance(afuncs, basestring):
+                    afuncs = (afuncs,)
+                values = []
+                for afunc in afuncs:
+                    if afunc == 'count':
+                        values.append(count)
+                    elif afunc == 'mean':
+                        values.append(
+                            record[fields[(colname, 'sum')]] / float(count))
+                    else:
+                        values.append(record[fields[(colname, afunc)]])
+                if isinstance(self.aggregates[colname], basestring):
+                    aggs[colname] = values[0]
+                else:
+                    aggs[colname] = tuple(values)
+            yield (record['key'], aggs)
+
+
+class SpilledRuns(object):
+    """
+    Runs of partial aggregates spilled to a temporary file.
+
+    Every run is an array of reduced partial aggregates (see
+    `Grouping.reduce()`), so it is sorted by key and it has no repeated
+    keys.  Runs are kept in a table of a temporary PyTables file, which
+    is removed when closed.
+
+    Public instance variables
+    -------------------------
+
+    filename
+        The name of the temporary file.
+    grouping
+        The `Grouping` instance of the partial aggregates.
+
+    Public methods
+    --------------
+
+    append(run)
+        Spill a new `run` of partial aggregates.
+    merge(lastrun)
+        Iterate over the merged partial aggregates of all runs.
+    close()
+        Close and remove the temporary file.
+    """
+
+    def __init__(self, grouping, tmp_dir=None):
+        from tables.file import openFile  # avoid a circular import
+
+        self.grouping = grouping
+        fd, self.filename = tempfile.mkstemp(".tmp", "pytables-", tmp_dir)
+        # Close the file descriptor so as to avoid leaks
+        os.close(fd)
+        self._file = openFile(self.filename, "w")
+        self._table = self._file.createTable('/', 'runs', grouping.dtype)
+        self._runs = []
+
+    def append(self, run):
+        """Spill a new `run` of partial aggregates."""
+        nrows = self._table.nrows
+        self._runs.append((nrows, nrows + len(run)))
+        self._table.append(run)
+
+    def merge(self, lastrun):
+        """
+        Iterate over the merged partial aggregates of all runs.
+
+        The spilled runs and the `lastrun` array are read by blocks and
+        merged, and the resulting partial aggregates are yielded by
+        blocks in increasing order of key.
+        """
+        table, reduce_ = self._table, self.grouping.reduce
+        table.flush()
+        blocksize = table.nrowsinbuf
+        starts = [start for (start, stop) in self._runs] + [len(lastrun)]
+        stops = [stop for (start, stop) in self._runs] + [len(lastrun)]
+        buffers = [ table.read(start, min(start+blocksize, stop))
+                    for (start, stop) in self._runs ] + [lastrun]
+        for i in xrange(len(self._runs)):
+            starts[i] += len(buffers[i])
+
+        while True:
+            live = [i for i in xrange(len(buffers)) if len(buffers[i]) > 0]
+            if not live:
+                break
+            # Keys up to the lowest last key in the buffers of the runs
+            # not read yet are complete, as keys are not repeated in a run.
+            bounds = [ buffers[i]['key'][-1] for i in live
+                       if starts[i] < stops[i] ]
+            parts = []
+            for i in live:
+                buffer_ = buffers[i]
+                n = len(buffer_)
+                if bounds:
+                    n = buffer_['key'].searchsorted(min(bounds), 'right')
+                parts.append(buffer_[:n])
+                buffers[i] = buffer_[n:]
+                if len(buffers[i]) == 0 and starts[i] < stops[i]:
+                    stop = min(starts[i]+blocksize, stops[i])
+                    buffers[i] = table.read(starts[i], stop)
+                    starts[i] = stop
+            partials = reduce_(numpy.concatenate(parts))
+            if len(partials) > 0:
+                yield partials
+
+    def close(self):
+        """Close and remove the temporary file."""
+        if self._file is not None:
+            self._file.close()
+            os.remove(self.filename)
+            self._file = None
@@ -24,6 +24,14 @@ import numpy
 # the performance by requering the HDF5 to use a lot of memory and CPU
 # for its internal B-Tree.
 
+# The number of slices (of both values and indices) kept in memory
+# during the optimization of an index.  ``Index.reorder_slices()`` sorts
+# two slices at a time and ``Index.do_complete_sort()`` sorts slices
+# extended with the values overlapping the next ones, while the rest of
+# the memory budget is left for the chunk caches of the temporary file.
+budget_slices = 4
+
+
 def csformula(nrows):
     """Return the fitted chunksize (a float value) for nrows."""
     # This formula has been computed using two points:
@@ -79,6 +87,29 @@ def computeslicesize(expectedrows, memlevel):
     return ss
 
 
+def budgetslicesize(expectedrows, memory_budget, chunksize,
+                    itemsize, indsize):
+    """Get the largest slicesize that fits in a memory budget (in bytes).
+
+    The optimization of an index keeps up to `budget_slices` slices (of
+    both values and indices) in memory at a time.  The slicesize is a
+    multiple of `chunksize`, but it is never smaller than one chunk nor
+    larger than needed for `expectedrows`.
+    """
+
+    ss = memory_budget // (budget_slices * (itemsize + indsize))
+    ss = (ss // chunksize) * chunksize
+    maxss = ((limit_er(expectedrows) // chunksize) + 1) * chunksize
+    if ss > maxss:
+        ss = maxss
+    # See computeslicesize() for the reasons of this upper limit
+    if ss > 2**30:
+        ss = (2**30 // chunksize) * chunksize
+    if ss < chunksize:
+        ss = chunksize
+    return int(ss)
+
+
 def computeblocksize(expectedrows, compoundsize, lowercompoundsize):
     """Calculate the optimum number of superblocks made from compounds blocks.
 
@@ -97,7 +128,8 @@ def computeblocksize(expectedrows, compoundsize, lowercompoundsize):
     return size
 
 
-def calcChunksize(expectedrows, optlevel=6, indsize=4, memlevel=4):
+def calcChunksize(expectedrows, optlevel=6, indsize=4, memlevel=4,
+                  memory_budget=None, itemsize=8):
     """Calculate the HDF5 chunk size for index and sorted arrays.
 
     The logic to do that is based purely in experiments playing with
@@ -105,6 +137,10 @@ def calcChunksize(expectedrows, optlevel=6, indsize=4, memlevel=4):
     using big chunks optimizes the I/O speed, but if they are too
     large, the uncompressor takes too much time. This might (should)
     be further optimized by doing more experiments.
+
+    If a `memory_budget` (in bytes) is given, the slicesize is the
+    largest one whose temporaries fit in it for values of `itemsize`
+    bytes, instead of the one derived from `memlevel` and `optlevel`.
     """
 
     chunksize = computechunksize(expectedrows)
@@ -119,6 +155,9 @@ def calcChunksize(expectedrows, optlevel=6, indsize=4, memlevel=4):
         chunksize, slicesize = ccs_medium(optlevel, chunksize, slicesize)
     elif indsize == 8:  # full
         chunksize, slicesize = ccs_full(optlevel, chunksize, slicesize)
+    if memory_budget is not None:
+        slicesize = budgetslicesize(expectedrows, memory_budget, chunksize,
+                                    itemsize, indsize)
 
     # Finally, compute blocksize and superblocksize
     blocksize = computeblocksize(expectedrows, slicesize, chunksize)
@@ -546,6 +585,16 @@ def nextafter(x, direction, dtype, itemsize):
     raise TypeError("data type ``%s`` is not supported" % dtype)
 
 
+def quantile_positions(qs, nelements):
+    """Return the positions of the `qs` quantiles in `nelements` sorted values.
+
+    The quantile ``q`` is the smallest value with at least ``q *
+    nelements`` values lower or equal than it.
+    """
+    positions = numpy.ceil(numpy.asarray(qs) * nelements) - 1
+    return numpy.clip(positions, 0, nelements - 1).astype('int64')
+
+
 
 ## Local Variables:
 ## mode: python
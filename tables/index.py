@@ -15,6 +15,7 @@ See Index class docstring for more info.
 Classes:
 
     Index
+    CompositeIndex
 
 Functions:
 
@@ -39,14 +40,14 @@ import warnings
 import numpy
 
 from tables.idxutils import (
-    calcChunksize, calcoptlevels, get_reduction_level,
-    nextafter, infType )
+    calcChunksize, calcoptlevels, get_reduction_level, budget_slices,
+    nextafter, infType, StringNextAfter, quantile_positions )
 
 from tables import indexesExtension
 from tables import utilsExtension
 from tables.attributeset import AttributeSet
 from tables.node import NotLoggedMixin
-from tables.atom import IntAtom, UIntAtom, Atom
+from tables.atom import IntAtom, UIntAtom, Atom, StringAtom
 from tables.earray import EArray
 from tables.carray import CArray
 from tables.leaf import Filters
@@ -56,6 +57,8 @@ from tables.path import joinPath
 from tables.exceptions import PerformanceWarning
 from tables.utils import is_idx, idx2long, lazyattr
 from tables.lrucacheExtension import ObjectCache
+from tables.bitmap import Bitmap
+from tables.extsort import decodeCoords, encodeKeys, iterSortedKeys
 
 
 __version__ = "$Revision: 1236 $"
@@ -101,6 +104,13 @@ opt_search_types = ("int8", "int16", "int32", "int64",
 # The upper limit for uint32 ints
 max32 = 2**32
 
+# The number of datasets in the temporary file for optimizing indexes
+ntmp_datasets = 18
+
+# The maximum number of elements in the starts and lengths matrices of
+# the batches of ranges looked up at once by `Index.search_ranges()`
+batch_search_elements = 2**20
+
 
 def _tableColumnPathnameOfIndex(indexpathname):
     names = indexpathname.split("/")
@@ -133,6 +143,8 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
     dirty
         Whether the index is dirty or not. Dirty indexes are out of sync
         with column data, so are not usable.
+    ndelta
+        The number of modified rows kept in the delta of this index.
     kind
         The kind of the index.
     optlevel
@@ -145,6 +157,14 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
 
     _c_classId = 'INDEX'
 
+    _lastruns = None
+    """The runs of elements found in last search, if it was done for
+    several ranges (see `search_ranges()`)."""
+
+    _delta = None
+    """A cache for the coordinates of the rows in the delta of this
+    index (see `readDelta()`)."""
+
 
     # <properties>
 
@@ -184,6 +204,16 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
         but they are not usable.
         """ )
 
+    ndelta = property(
+        lambda self: len(self.readDelta()), None, None,
+        """
+        The number of modified rows kept in the delta of this index.
+
+        The values of these rows in the index may be out of sync with
+        column data, so they are always taken as candidates in searches
+        (see `addDelta()`).
+        """ )
+
     def _getcolumn(self):
         tablepath, columnpath = _tableColumnPathnameOfIndex(self._v_pathname)
         table = self._v_file._getNode(tablepath)
@@ -319,6 +349,7 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
                  expectedrows=0,
                  byteorder=None,
                  blocksizes=None,
+                 memory_budget=None,
                  new=True):
         """Create an Index instance.
 
@@ -353,6 +384,12 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
         blocksizes -- The four main sizes of the compound blocks in
             index datasets (a low level parameter).
 
+        memory_budget -- The maximum amount of memory (in bytes) to be
+            used by the temporaries of the index building and
+            optimization processes.  It sets the slicesize (unless
+            `blocksizes` is given) and the chunk caches of the temporary
+            file.
+
         """
 
         self._v_version = None
@@ -389,6 +426,11 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
         """The number of currently indexed row for this column."""
         self.blocksizes = blocksizes
         """The four main sizes of the compound blocks (if specified)."""
+        self.memory_budget = memory_budget
+        """The memory budget for building the index (if specified)."""
+        self.peakmemory = 0
+        """The peak memory (in bytes) used by the temporaries of the
+        last index building and optimization processes."""
         self.dirtycache = True
         """Dirty cache (for ranges, bounds & sorted) flag."""
         self.superblocksize = None
@@ -437,6 +479,10 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
             self.blocksizes = (self.superblocksize, self.blocksize,
                                self.slicesize, self.chunksize)
             self.optlevel = int(attrs.optlevel)
+            if 'memory_budget' in attrs:
+                self.memory_budget = long(attrs.memory_budget)
+            if 'peakmemory' in attrs:
+                self.peakmemory = long(attrs.peakmemory)
             sorted = self.sorted
             indices = self.indices
             self.dtype = sorted.atom.dtype
@@ -486,7 +532,9 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
         # (in case these parameters haven't been passed to the constructor)
         if self.blocksizes is None:
             self.blocksizes = calcChunksize(
-                self.expectedrows, self.optlevel, self.indsize)
+                self.expectedrows, self.optlevel, self.indsize,
+                memory_budget=self.memory_budget,
+                itemsize=self.dtype.itemsize)
         (self.superblocksize, self.blocksize,
          self.slicesize, self.chunksize) = self.blocksizes
         if debug:
@@ -506,6 +554,9 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
         self._v_attrs.optlevel = self.optlevel
         # Save the reduction level
         self._v_attrs.reduction = self.reduction
+        # Save the memory budget (so that re-indexing honors it)
+        if self.memory_budget is not None:
+            self._v_attrs.memory_budget = numpy.uint64(self.memory_budget)
 
         # Create the IndexArray for sorted values
         sorted = IndexArray(self, 'sorted', atom, "Sorted Values",
@@ -575,13 +626,27 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
         if profile: tref = time()
         if profile: show_stats("Entering initial_append", tref)
         arr = xarr.pop()
-        indsize = self.indsize
-        slicesize = self.slicesize
-        blocksize = self.blocksize
         nelementsILR = self.nelementsILR
         if profile: show_stats("Before creating idx", tref)
+        idx = self.initial_indices(len(arr), nrow)
+        # Add the last row at the beginning of arr & idx (if needed)
+        if (self.indsize == 8 and nelementsILR > 0):
+            # It is possible that the values in LR are already sorted.
+            # Fetch them and override existing values in arr and idx.
+            assert len(arr) > nelementsILR
+            self.read_sliceLR(self.sortedLR, arr[:nelementsILR])
+            self.read_sliceLR(self.indicesLR, idx[:nelementsILR])
+        larr, arr = self.sort_slice(arr, idx, reduction)
+        if profile: show_stats("Exiting initial_append", tref)
+        return larr, arr, idx
+
+
+    def initial_indices(self, nelements, nrow):
+        """Compute the initial indices for `nelements` in the row `nrow`."""
+        indsize = self.indsize
+        slicesize = self.slicesize
         if indsize == 8:
-            idx = numpy.arange(0, len(arr), dtype="uint64") + nrow*slicesize
+            idx = numpy.arange(0, nelements, dtype="uint64") + nrow*slicesize
         elif indsize == 4:
             # For medium (32-bit) all the rows in tables should be
             # directly reachable.  But as len(arr) < 2**31, we can
@@ -601,9 +666,9 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
             # example, in table sorts).
             #
             # F. Alted 2008-09-15
-            idx = numpy.arange(0, len(arr), dtype="uint32")
+            idx = numpy.arange(0, nelements, dtype="uint32")
         else:
-            idx = numpy.empty(len(arr), "uint%d"%(indsize*8))
+            idx = numpy.empty(nelements, "uint%d"%(indsize*8))
             lbucket = self.lbucket
             # Fill the idx with the bucket indices
             offset = lbucket-((nrow*(slicesize%lbucket))%lbucket)
@@ -615,15 +680,22 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
                 # First normalize the number of rows
                 offset2 = (nrow%self.nslicesblock)*slicesize/lbucket
                 idx += offset2
-        # Add the last row at the beginning of arr & idx (if needed)
-        if (indsize == 8 and nelementsILR > 0):
-            # It is possible that the values in LR are already sorted.
-            # Fetch them and override existing values in arr and idx.
-            assert len(arr) > nelementsILR
-            self.read_sliceLR(self.sortedLR, arr[:nelementsILR])
-            self.read_sliceLR(self.indicesLR, idx[:nelementsILR])
-        # In-place sorting
+        return idx
+
+
+    def sort_slice(self, arr, idx, reduction):
+        """Sort the values in `arr` in-place, together with `idx`.
+
+        A ``(larr, arr)`` tuple is returned, with the largest value and
+        the sorted values (reduced if `reduction` is larger than 1).
+        Nothing is read from or written to disk, and the GIL is released
+        while sorting, so several slices can be sorted at once in
+        different threads.
+        """
+        if profile: tref = time()
         if profile: show_stats("Before keysort", tref)
+        # In-place sorting
+        self.track_memory(arr.nbytes + idx.nbytes)
         indexesExtension.keysort(arr, idx)
         larr = arr[-1]
         if reduction > 1:
@@ -634,12 +706,7 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
             if profile: show_stats("After reduction", tref)
             arr = reduc
             if profile: show_stats("After arr <-- reduc", tref)
-        # A completely sorted index is not longer possible after an
-        # append of an index with already one slice.
-        if nrow > 0:
-            self._v_attrs.is_CSI = False
-        if profile: show_stats("Exiting initial_append", tref)
-        return larr, arr, idx
+        return larr, arr
 
 
     def final_idx32(self, idx, offset):
@@ -659,25 +726,47 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
         return idx
 
 
+    def append_target(self, update=False):
+        """Get the ``(where, reduction)`` pair for appending to the index.
+
+        `where` is the node whose arrays receive the appended values,
+        and `reduction` the reduction level applied to them.
+        """
+        if not update and self.temp_required:
+            # The reduction will take place *after* the optimization process
+            return (self.tmp, 1)
+        return (self, self.reduction)
+
+
     def append(self, xarr, update=False):
         """Append the array to the index objects"""
 
+        where, reduction = self.append_target(update)
+        nrows = where.sorted.nrows  # before sorted.append()
+        larr, arr, idx = self.initial_append(xarr, nrows, reduction)
+        self.append_sorted(larr, arr, idx, update)
+
+
+    def append_sorted(self, larr, arr, idx, update=False):
+        """Append an already sorted slice to the index objects.
+
+        `larr`, `arr` and `idx` are the values returned for the slice by
+        `initial_append()` (or by `initial_indices()` and `sort_slice()`).
+        """
+
         if profile: tref = time()
         if profile: show_stats("Entering append", tref)
-        if not update and self.temp_required:
-            where = self.tmp
-            # The reduction will take place *after* the optimization process
-            reduction = 1
-        else:
-            where = self
-            reduction = self.reduction
+        where, reduction = self.append_target(update)
         sorted = where.sorted; indices = where.indices
         ranges = where.ranges; mranges = where.mranges
         bounds = where.bounds; mbounds = where.mbounds
         abounds = where.abounds; zbounds = where.zbounds
         sortedLR = where.sortedLR; indicesLR = where.indicesLR
         nrows = sorted.nrows  # before sorted.append()
-        larr, arr, idx = self.initial_append(xarr, nrows, reduction)
+        # A completely sorted index is not longer possible after an
+        # append of an index with already one slice.
+        if nrows > 0:
+            self._v_attrs.is_CSI = False
         # Save the sorted array
         sorted.append(arr.reshape(1, arr.size))
         cs = self.chunksize/reduction;  ncs = self.nchunkslice
@@ -720,16 +809,14 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
         if profile: show_stats("Entering appendLR", tref)
         # compute the elements in the last row sorted & bounds array
         nrows = self.nslices
-        if not update and self.temp_required:
-            where = self.tmp
-            # The reduction will take place *after* the optimization process
-            reduction = 1
-        else:
-            where = self
-            reduction = self.reduction
+        where, reduction = self.append_target(update)
         indicesLR = where.indicesLR
         sortedLR = where.sortedLR
         larr, arr, idx = self.initial_append(xarr, nrows, reduction)
+        # A completely sorted index is not longer possible after an
+        # append of an index with already one slice.
+        if nrows > 0:
+            self._v_attrs.is_CSI = False
         nelementsSLR = len(arr)
         nelementsILR = len(idx)
         # Build the cache of bounds
@@ -759,15 +846,36 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
         if profile: show_stats("Exiting appendLR", tref)
 
 
-    def optimize(self, verbose=False):
+    def track_memory(self, nbytes):
+        """Account `nbytes` of temporaries in the peak memory usage.
+
+        `nbytes` is the size of the temporaries that are alive at the
+        same time in a step of the index building or optimization
+        processes.
+        """
+        if nbytes > self.peakmemory:
+            self.peakmemory = nbytes
+
+
+    def optimize(self, verbose=False, memory_budget=None):
         """Optimize an index so as to allow faster searches.
 
         verbose -- If True, messages about the progress of the
             optimization process are printed out.
 
+        memory_budget -- The maximum amount of memory (in bytes) to be
+            used by the temporaries of the optimization process.  If
+            not given, the budget the index was created with is used.
+            As the size of the temporaries depends on the slicesize,
+            which cannot be changed once the index is built, a
+            `PerformanceWarning` is issued if they do not fit in it.
+
+        The peak memory used by the temporaries is kept in the
+        `peakmemory` attribute afterwards.
         """
 
         if not self.temp_required:
+            self._v_attrs.peakmemory = numpy.uint64(self.peakmemory)
             return
 
         if verbose == True:
@@ -775,6 +883,19 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
         else:
             self.verbose = debug
 
+        if memory_budget is None:
+            memory_budget = self.memory_budget
+        if memory_budget is not None:
+            nbytes = budget_slices * self.slicesize * (
+                self.dtype.itemsize + self.indsize)
+            if nbytes > memory_budget:
+                warnings.warn(
+                    "the temporaries for optimizing the index may take up "
+                    "to %d bytes, which exceeds the memory budget of %d "
+                    "bytes; re-index the column with this budget so as to "
+                    "use smaller slices" % (nbytes, memory_budget),
+                    PerformanceWarning )
+
         # Initialize last_tover and last_nover
         self.last_tover = 0
         self.last_nover = 0
@@ -823,6 +944,9 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
 
         # Close and delete the temporal optimization index file
         self.cleanup_temp()
+        self._v_attrs.peakmemory = numpy.uint64(self.peakmemory)
+        if self.verbose:
+            print "peak memory for temporaries:", self.peakmemory, "bytes"
         return
 
 
@@ -900,6 +1024,9 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
                 sindices = numpy.concatenate(
                     (iremain, indicesLR[starts[i]:nelementsLR], iover))
             # Sort the extended slices
+            self.track_memory(ssorted.nbytes + sindices.nbytes +
+                              sover.nbytes + iover.nbytes +
+                              sremain.nbytes + iremain.nbytes)
             indexesExtension.keysort(ssorted, sindices)
             # Save the first elements of extended slices in the slice i
             if i < self.nslices:
@@ -989,8 +1116,14 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
             ".tmp", "pytables-" , self.tmp_dir)
         # Close the file descriptor so as to avoid leaks
         os.close(fd)
-        # Create the proper PyTables file
-        self.tmpfile = self._openFile(self.tmpfilename, "w")
+        # Create the proper PyTables file.  With a memory budget, the
+        # chunk caches of the temporary datasets share the part of it
+        # not used by the slice buffers.
+        params = {}
+        if self.memory_budget is not None:
+            params['CHUNK_CACHE_SIZE'] = max(
+                self.memory_budget // (budget_slices * ntmp_datasets), 1)
+        self.tmpfile = self._openFile(self.tmpfilename, "w", **params)
         self.tmp = tmp = self.tmpfile.root
         cs = self.chunksize
         ss = self.slicesize
@@ -1137,6 +1270,7 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
         ncs = ncs2 = self.nchunkslice
         self_nslices = self.nslices
         tmp = numpy.empty(shape=self.slicesize, dtype=dtype)
+        self.track_memory(tmp.nbytes)
         for i in xrange(nslices):
             ns = offset + i;
             if ns == self_nslices:
@@ -1318,6 +1452,7 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
         ssorted = numpy.empty(shape=ss*2, dtype=self.dtype)
         sindices = numpy.empty(shape=ss*2,
                                dtype=numpy.dtype('u%d' % self.indsize))
+        self.track_memory(ssorted.nbytes + sindices.nbytes)
 
         if self.indsize == 8:
             # Bootstrap the process for reordering
@@ -1768,7 +1903,23 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
 
 
     def search(self, item):
-        """Do a binary search in this index for an item"""
+        """Do a binary search in this index for an item.
+
+        The `item` is a ``(lo, hi)`` range or, as returned by
+        `getLookupRange()` for disjunctions, a tuple of sorted and
+        disjoint ranges.  The number of elements found is returned.
+        The rows in the delta of the index are candidates as well, so
+        they are included in this number.
+        """
+        return self._search(item) + self.ndelta
+
+
+    def _search(self, item):
+        """Do a binary search in this index for an item.
+
+        This works like `search()`, but the rows in the delta of the
+        index are not taken into account.
+        """
 
         if profile: tref = time()
         if profile: show_stats("Entering search", tref)
@@ -1776,6 +1927,21 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
         if self.dirtycache:
             self.restorecache()
 
+        self._lastruns = None
+        if item and type(item[0]) is tuple:
+            # Several ranges, whose runs of elements are kept aside
+            nslot = self.limboundscache.getslot(item)
+            if nslot >= 0:
+                runs = self.limboundscache.getitem(nslot)
+            else:
+                runs = self.search_ranges(item)
+                if self.limboundscache.couldenablecache():
+                    size = len(runs[0]) * 8 * 3 + 1
+                    self.limboundscache.setitem(item, runs, size)
+            self._lastruns = runs
+            if profile: show_stats("Exiting search", tref)
+            return long((runs[2] - runs[1]).sum())
+
         # An empty item or if left limit is larger than the right one
         # means that the number of records is always going to be empty,
         # so we avoid further computation (including looking up the
@@ -1800,7 +1966,42 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
                 tlen = tlen + length
             return tlen
         # The item is not in cache. Do the real lookup.
+        tlen = self._search_bin(item)
+
+        if self.limboundscache.couldenablecache():
+            # Get a startlengths tuple and save it in cache.
+            # This is quite slow, but it is a good way to compress
+            # the bounds info. Moreover, the .couldenablecache()
+            # is doing a good work so as to avoid computing this
+            # when it is not necessary to do it.
+            startlengths = []
+            for nrow, length in enumerate(self.lengths):
+                if length > 0:
+                    startlengths.append((nrow, self.starts[nrow], length))
+            # Compute the size of the recarray (aproximately)
+            # The +1 at the end is important to avoid 0 lengths
+            # (remember, the object headers take some space)
+            size = len(startlengths) * 8 * 2 + 1
+            # Put this startlengths list in cache
+            self.limboundscache.setitem(item, startlengths, size)
+
+        if profile: show_stats("Exiting search", tref)
+        return tlen
+
+
+    def _search_bin(self, item):
+        """Do the binary search for an item in all the index rows.
+
+        The `starts` and `lengths` arrays are updated with the elements
+        found, and their number is returned.  The limits cache is
+        neither looked up nor updated.
+        """
+        tlen = 0
         sorted = self.sorted
+        if self.dtype.kind == 'S' and self._fit_string_item(item) is None:
+            self.starts[:] = 0
+            self.lengths[:] = 0
+            return 0
         if self.nslices > 0:
             if self.type in self.opt_search_types:
                 # The next are optimizations. However, they hide the
@@ -1828,6 +2029,8 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
                     tlen = sorted._searchBinNA_us(*item)
                 else:
                     assert False, "This can't happen!"
+            elif self.dtype.kind == 'S':
+                tlen = sorted._searchBinNA_S(*self._fit_string_item(item))
             else:
                 tlen = self.search_scalar(item, sorted)
         # Get possible remaining values in last row
@@ -1837,26 +2040,360 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
             self.starts[-1] = start
             self.lengths[-1] = stop - start
             tlen += stop - start
+        return tlen
 
-        if self.limboundscache.couldenablecache():
-            # Get a startlengths tuple and save it in cache.
-            # This is quite slow, but it is a good way to compress
-            # the bounds info. Moreover, the .couldenablecache()
-            # is doing a good work so as to avoid computing this
-            # when it is not necessary to do it.
-            startlengths = []
-            for nrow, length in enumerate(self.lengths):
-                if length > 0:
-                    startlengths.append((nrow, self.starts[nrow], length))
-            # Compute the size of the recarray (aproximately)
-            # The +1 at the end is important to avoid 0 lengths
-            # (remember, the object headers take some space)
-            size = len(startlengths) * 8 * 2 + 1
-            # Put this startlengths list in cache
-            self.limboundscache.setitem(item, startlengths, size)
 
-        if profile: show_stats("Exiting search", tref)
-        return tlen
+    def search_batch(self, lows, highs):
+        """Do a binary search in this index for many ranges at once.
+
+        `lows` and `highs` are sequences with the lower and upper limits
+        of the ``(lo, hi)`` ranges to look up.  A ``(starts, lengths)``
+        tuple of int32 matrices is returned, with a row for every range
+        and a column for every index row, holding what the `starts` and
+        `lengths` arrays would after searching that range alone.  The
+        limits cache is neither looked up nor updated, and the rows in
+        the delta of the index are not taken into account.
+
+        For optimized types, the slices are looked up for all the ranges
+        in a single call, and so is the last row.
+        """
+
+        if self.dirtycache:
+            self.restorecache()
+
+        nitems = len(lows)
+        assert len(highs) == nitems
+        starts = numpy.zeros(shape=(nitems, self.nrows), dtype=numpy.int32)
+        lengths = numpy.zeros(shape=(nitems, self.nrows), dtype=numpy.int32)
+        if nitems == 0:
+            return (starts, lengths)
+        sorted = self.sorted
+        if self.dtype.kind == 'S':
+            items = [ self._fit_string_item(item)
+                      for item in zip(lows, highs) ]
+            empty = [ i for (i, item) in enumerate(items) if item is None ]
+            items = [ item or ('', '') for item in items ]
+            lows = [item[0] for item in items]
+            highs = [item[1] for item in items]
+            itemtype = self.dtype
+        elif self.dtype.kind == 'f':
+            itemtype = 'float64'
+        elif self.type == 'uint64':
+            itemtype = 'uint64'
+        else:
+            itemtype = 'int64'
+        nslices = self.nslices
+        if nslices > 0:
+            if self.type in self.opt_search_types or self.dtype.kind == 'S':
+                sorted._searchBinNA_batch(
+                    numpy.array(lows, dtype=itemtype),
+                    numpy.array(highs, dtype=itemtype), starts, lengths)
+            else:
+                for (i, item) in enumerate(zip(lows, highs)):
+                    self.search_scalar(item, sorted)
+                    starts[i, :nslices] = self.starts[:nslices]
+                    lengths[i, :nslices] = self.lengths[:nslices]
+        # Get possible remaining values in last row
+        if self.nelementsSLR > 0:
+            sortedlr = self.sortedLR[:self.nelementsSLR]
+            lrstarts = sortedlr.searchsorted(
+                numpy.array(lows, dtype=itemtype), side='left')
+            lrstops = sortedlr.searchsorted(
+                numpy.array(highs, dtype=itemtype), side='right')
+            starts[:, -1] = lrstarts
+            lengths[:, -1] = numpy.maximum(lrstops - lrstarts, 0)
+        if self.dtype.kind == 'S' and empty:
+            starts[empty] = 0
+            lengths[empty] = 0
+        return (starts, lengths)
+
+
+    def search_values(self, values):
+        """Do a batched search in this index for several values.
+
+        `values` must be sorted and unique.  The elements found are
+        returned as runs, like in `search_ranges()`.
+        """
+        return self.search_ranges([(value, value) for value in values])
+
+
+    def search_ranges(self, items):
+        """Do a batched search in this index for several items.
+
+        `items` is a sequence of ``(lo, hi)`` ranges, which must be
+        sorted and disjoint.  They are looked up in batches with
+        `search_batch()`, so that the bounds and sorted chunks of every
+        slice are read once for all the ranges in a batch.  The limits
+        cache is not used.
+
+        The elements found are returned as a ``(rows, starts, stops)``
+        tuple of arrays with the runs of elements in every index row
+        (adjacent runs are merged), which can be passed to
+        `get_chunkbitmap()` and `get_coords()`.
+        """
+
+        if profile: tref = time()
+        if profile: show_stats("Entering search_ranges", tref)
+        if self.dirtycache:
+            self.restorecache()
+
+        rows, starts, stops = [], [], []
+        lows = [item[0] for item in items]
+        highs = [item[1] for item in items]
+        # Keep the starts and lengths matrices of a batch within bounds
+        nbatch = max(1, batch_search_elements // max(self.nrows, 1))
+        for i in xrange(0, len(items), nbatch):
+            bstarts, blengths = self.search_batch(
+                lows[i:i+nbatch], highs[i:i+nbatch])
+            # Found elements come ordered by range and then by row
+            nitem, found = blengths.nonzero()
+            rows.append(found)
+            starts.append(bstarts[nitem, found])
+            stops.append(bstarts[nitem, found] + blengths[nitem, found])
+        if not rows or not sum(len(found) for found in rows):
+            empty = numpy.empty(shape=0, dtype='int64')
+            return (empty, empty, empty)
+        rows = numpy.concatenate(rows).astype('int64')
+        starts = numpy.concatenate(starts).astype('int64')
+        stops = numpy.concatenate(stops).astype('int64')
+        # Items are sorted, so runs are already sorted within every row
+        order = rows.argsort(kind='mergesort')
+        rows, starts, stops = rows[order], starts[order], stops[order]
+        # Merge the runs following (or overlapping, in reduced indexes)
+        # another one in the same row
+        new = numpy.empty(len(rows), dtype=bool)
+        new[0] = True
+        new[1:] = (rows[1:] != rows[:-1]) | (starts[1:] > stops[:-1])
+        firsts = new.nonzero()[0]
+        lasts = numpy.append(firsts[1:] - 1, len(rows) - 1)
+        if profile: show_stats("Exiting search_ranges", tref)
+        return (rows[firsts], starts[firsts], stops[lasts])
+
+
+    def _get_cdf(self):
+        """Get an approximation of the distribution of indexed values.
+
+        The distribution is computed from the start, median and end
+        bounds of the chunks in slices, with the elements of every chunk
+        evenly spread between its bounds, and from the values in the
+        last row.  A ``(knots, cumulative, slopes)`` tuple of arrays is
+        returned, with the values where the distribution changes, the
+        number of elements lower or equal than every knot and the number
+        of elements per unit between a knot and the next one.  For
+        strings, elements are kept at the bounds and `slopes` is `None`.
+        """
+
+        isstring = (self.dtype.kind == 'S')
+        reduction = self.reduction
+        cs = self.chunksize;  ncs = self.nchunkslice
+        segments = []   # (lower values, upper values, number of elements)
+        nslices = self.nslices
+        if nslices > 0:
+            nbounds = nslices * ncs
+            abounds = self.abounds[:nbounds]
+            mbounds = self.mbounds[:nbounds]
+            zbounds = self.zbounds[:nbounds]
+            # The end bound of the last chunk in a reduced slice may be
+            # lower than the largest value in the slice
+            zbounds[ncs-1::ncs] = self.ranges[:nslices][:,1]
+            if isstring:
+                segments.append((abounds, abounds, cs / 4.))
+                segments.append((mbounds, mbounds, cs / 2.))
+                segments.append((zbounds, zbounds, cs / 4.))
+            else:
+                segments.append((abounds, mbounds, cs / 2.))
+                segments.append((mbounds, zbounds, cs / 2.))
+        nelementsSLR = self.nelementsSLR
+        if nelementsSLR > 0:
+            sortedlr = self.sortedLR[:nelementsSLR]
+            # Every (reduced) value stands for `reduction` elements
+            weights = numpy.empty(nelementsSLR, dtype='float64')
+            weights[:] = reduction
+            weights[-1] = self.nelementsILR - reduction * (nelementsSLR - 1)
+            if reduction == 1 or isstring:
+                segments.append((sortedlr, sortedlr, weights))
+            else:
+                upper = numpy.concatenate((sortedlr[1:], self.bebounds[-1:]))
+                segments.append((sortedlr, upper, weights))
+
+        lower = numpy.concatenate([seg[0] for seg in segments])
+        upper = numpy.concatenate([seg[1] for seg in segments])
+        weights = numpy.concatenate([
+            seg[2] * numpy.ones(len(seg[0])) for seg in segments ])
+        if isstring:
+            knots = numpy.unique(lower)
+            jumps = numpy.zeros(len(knots))
+            _accumulate(jumps, knots.searchsorted(lower), weights)
+            return (knots, jumps.cumsum(), None)
+
+        lower = lower.astype('float64');  upper = upper.astype('float64')
+        valid = ~(numpy.isnan(lower) | numpy.isnan(upper))
+        lower, upper, weights = lower[valid], upper[valid], weights[valid]
+        knots = numpy.unique(numpy.concatenate((lower, upper)))
+        # Elements in empty segments are right at their knot
+        point = (lower == upper)
+        jumps = numpy.zeros(len(knots))
+        _accumulate(jumps, knots.searchsorted(lower[point]), weights[point])
+        # The rest contribute to the slopes between their knots
+        spread = ~point
+        densities = weights[spread] / (upper[spread] - lower[spread])
+        dslopes = numpy.zeros(len(knots))
+        _accumulate(dslopes, knots.searchsorted(lower[spread]), densities)
+        _accumulate(dslopes, knots.searchsorted(upper[spread]), -densities)
+        slopes = dslopes.cumsum()
+        cumulative = jumps.cumsum()
+        cumulative[1:] += (slopes[:-1] * numpy.diff(knots)).cumsum()
+        return (knots, cumulative, slopes)
+
+
+    def _eval_cdf(self, cdf, values, side):
+        """Get the (estimated) number of elements lower than `values`.
+
+        `cdf` is the approximation returned by `_get_cdf()`.  With
+        ``side='right'``, elements equal to a value are counted too.
+        """
+        knots, cumulative, slopes = cdf
+        values = numpy.asarray(values)
+        positions = knots.searchsorted(values, side=side) - 1
+        below = (positions < 0)
+        positions = numpy.maximum(positions, 0)
+        counts = cumulative[positions]
+        if slopes is not None:
+            offsets = numpy.clip(values.astype('float64'),
+                                 knots[0], knots[-1]) - knots[positions]
+            counts = counts + slopes[positions] * offsets
+        return numpy.where(below, 0., counts)
+
+
+    def searchsorted(self, values, side='left'):
+        """Find where `values` would be in the sorted indexed elements.
+
+        Like in ``numpy.searchsorted()``, an int64 array is returned
+        with the number of indexed elements lower than every value in
+        `values` or, if `side` is ``'right'``, lower or equal than it.
+        They are exact for indexes without reduction ('medium' and
+        'full' ones), and estimated from the bounds of index chunks
+        otherwise.  The rows in the delta of the index are not taken
+        into account.
+        """
+
+        assert side in ('left', 'right')
+        values = numpy.asarray(values).ravel()
+        if self.nelements == 0 or len(values) == 0:
+            return numpy.zeros(len(values), dtype='int64')
+        if self.reduction > 1:
+            counts = self._eval_cdf(self._get_cdf(), values, side)
+            return numpy.round(counts).astype('int64')
+
+        above = None
+        if self.dtype.kind in 'iu' and values.dtype.kind == 'f':
+            # Look up the integers with the same elements around
+            if side == 'left':
+                values = numpy.ceil(values)
+            else:
+                values = numpy.floor(values)
+            info = numpy.iinfo(self.dtype)
+            above = (values > info.max)
+            values = numpy.clip(values, info.min, info.max)
+        lowest = infType(self.dtype, self.dtype.itemsize, sign=-1)
+        starts, lengths = self.search_batch([lowest] * len(values), values)
+        counts = lengths.sum(axis=1, dtype='int64')
+        if side == 'left':
+            starts, lengths = self.search_batch(values, values)
+            counts -= lengths.sum(axis=1, dtype='int64')
+        if above is not None:
+            counts[above] = self.nelements
+        return counts
+
+
+    def estimate_rows(self, range_):
+        """Estimate the number of indexed elements in `range_`.
+
+        The `range_` is a ``(lo, hi)`` range or, as returned by
+        `getLookupRange()` for disjunctions, a tuple of sorted and
+        disjoint ranges.  The estimate is computed from the bounds of
+        index chunks, without searching the index, so it is cheap but
+        it may be well off for narrow ranges.  The rows in the delta of
+        the index are not taken into account.
+        """
+
+        if not range_ or self.nelements == 0:
+            return 0
+        if type(range_[0]) is not tuple:
+            range_ = (range_,)
+        cdf = self._get_cdf()
+        lows = self._eval_cdf(cdf, [item[0] for item in range_], 'left')
+        highs = self._eval_cdf(cdf, [item[1] for item in range_], 'right')
+        return int(round(numpy.maximum(highs - lows, 0).sum()))
+
+
+    def quantiles(self, qs, exact=False):
+        """Get the `qs` quantiles of the indexed elements.
+
+        `qs` is an array of fractions between 0 and 1.  The quantile of
+        a fraction ``q`` is the lowest value with at least ``q`` times
+        the number of elements lower or equal than it, so 0 gives the
+        minimum and 1 the maximum.  If `exact` is true, they are read
+        from the sorted values at their positions, which is only
+        possible in completely sorted indexes (see `is_CSI`).
+        Otherwise, they are estimated from the bounds of index chunks.
+        The rows in the delta of the index are not taken into account.
+        """
+
+        qs = numpy.asarray(qs, dtype='float64').ravel()
+        if self.nelements == 0:
+            raise ValueError("the index has no elements")
+        if exact:
+            if not self.is_CSI:
+                raise ValueError(
+                    "exact quantiles need a completely sorted index")
+            return numpy.array(
+                [ self.readSorted(long(pos), long(pos)+1)[0]
+                  for pos in quantile_positions(qs, self.nelements) ],
+                dtype=self.dtype )
+
+        knots, cumulative, slopes = self._get_cdf()
+        targets = qs * cumulative[-1]
+        positions = numpy.minimum(
+            cumulative.searchsorted(targets, side='left'), len(knots)-1)
+        values = knots[positions]
+        if slopes is not None:
+            # Targets reached before the elements right at a knot are
+            # between the previous knot and this one
+            prevs = numpy.maximum(positions - 1, 0)
+            spans = slopes[prevs] * (knots[positions] - knots[prevs])
+            within = ( (positions > 0) & (slopes[prevs] > 0) &
+                       (targets < cumulative[prevs] + spans) )
+            prevs = prevs[within]
+            values[within] = ( knots[prevs] + (targets[within] -
+                               cumulative[prevs]) / slopes[prevs] )
+            if self.dtype.kind in 'biu':
+                values = numpy.round(values)
+        # The extremes are known exactly
+        values[qs <= 0] = knots[0]
+        values[qs >= 1] = knots[-1]
+        return values.astype(self.dtype)
+
+
+    def _fit_string_item(self, item):
+        """Fit the strings in `item` to the itemsize of the index.
+
+        Strings longer than values in the index are truncated, so that
+        the ``(lo, hi)`` range selects the same values in fixed-width
+        comparisons.  `None` is returned if no value in the index can
+        be in the range.
+        """
+        item1, item2 = item
+        itemsize = self.dtype.itemsize
+        if len(item1) > itemsize:
+            # Values are larger than `item1` only if they are larger
+            # than its truncated version.
+            item1 = item1[:itemsize]
+            if not item1.rstrip('\xff'):
+                # No value is larger than the largest string
+                return None
+            item1 = StringNextAfter(item1, +1, itemsize)
+        return (item1, item2[:itemsize])
 
 
     # This is an scalar version of search. It works with strings as well.
@@ -1943,24 +2480,40 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
         return (start, stop)
 
 
-    def get_chunkmap(self):
-        """Compute a map with the interesting chunks in index"""
+    def _get_runs(self, runs):
+        """Get the runs of elements found in last search or in `runs`.
 
-        if profile: tref = time()
-        if profile: show_stats("Entering get_chunkmap", tref)
+        A ``(rows, starts, stops)`` tuple of sequences is returned.
+        """
+        if runs is None:
+            runs = self._lastruns
+        if runs is None:
+            return (xrange(self.nrows), self.starts,
+                    self.starts + self.lengths)
+        return runs
+
+
+    def _get_buckets(self, runs=None):
+        """
+        Iterate over the buckets with elements found in last search.
+
+        An array of bucket numbers is yielded for every slice with
+        found elements.  If `runs` (as returned by `search_values()`)
+        are given, the elements in them are used instead.
+        """
         ss = self.slicesize;  bs = self.blocksize
         nsb = self.nslicesblock;  nslices = self.nslices
         lbucket = self.lbucket;  indsize = self.indsize
         bucketsinblock = float(self.blocksize)/lbucket
-        nchunks = long(math.ceil(float(self.nelements)/lbucket))
-        chunkmap = numpy.zeros(shape=nchunks, dtype="bool")
         reduction = self.reduction
-        starts = (self.starts-1)*reduction+1
-        stops = (self.starts+self.lengths)*reduction
+        rows, starts, stops = self._get_runs(runs)
+        starts = (starts-1)*reduction+1
+        stops = stops*reduction
         starts[starts < 0] = 0    # All negative values set to zero
         indices = self.indices
-        for nslice in xrange(self.nrows):
-            start = starts[nslice];  stop = stops[nslice]
+        for i in xrange(len(rows)):
+            nslice = int(rows[i])
+            start = starts[i];  stop = stops[i]
             if stop > start:
                 idx = numpy.empty(shape=stop-start, dtype='u%d' % indsize)
                 if nslice < nslices:
@@ -1979,7 +2532,19 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
                     idx = idx.astype("int_")
                     offset = (nslice*ss)/lbucket
                     idx += offset
-                chunkmap[idx] = True
+                yield idx
+
+
+    def get_chunkmap(self):
+        """Compute a map with the interesting chunks in index"""
+
+        if profile: tref = time()
+        if profile: show_stats("Entering get_chunkmap", tref)
+        lbucket = self.lbucket
+        nchunks = long(math.ceil(float(self.nelements)/lbucket))
+        chunkmap = numpy.zeros(shape=nchunks, dtype="bool")
+        for idx in self._get_buckets():
+            chunkmap[idx] = True
         # The case lbucket < nrowsinchunk should only happen in tests
         nrowsinchunk = self.nrowsinchunk
         if lbucket != nrowsinchunk:
@@ -1994,11 +2559,171 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
             for i in range(len(idx)):
                 tchunkmap[starts[i]:stops[i]] = True
             chunkmap = tchunkmap
+        # Modified rows are always candidates
+        chunkmap[self.readDelta() // nrowsinchunk] = True
         if profile: show_stats("Exiting get_chunkmap", tref)
         return chunkmap
 
 
+    def get_chunkbitmap(self, runs=None):
+        """Compute a compressed bitmap with the interesting chunks in index.
+
+        This works like `get_chunkmap()`, but a `Bitmap` instance is
+        returned, so that memory grows with the number of elements found
+        in last search instead of with the number of chunks in table.
+        If `runs` (as returned by `search_values()`) are given, the
+        elements in them are used instead of the ones in last search.
+        """
+
+        if profile: tref = time()
+        if profile: show_stats("Entering get_chunkbitmap", tref)
+        lbucket = self.lbucket
+        nrowsinchunk = self.nrowsinchunk
+        nchunks = long(math.ceil(float(self.nelements)/nrowsinchunk))
+        buckets = [numpy.unique(idx) for idx in self._get_buckets(runs)]
+        if buckets:
+            buckets = numpy.concatenate(buckets).astype('int64')
+        else:
+            buckets = numpy.empty(shape=0, dtype='int64')
+        # The case lbucket < nrowsinchunk should only happen in tests
+        if lbucket != nrowsinchunk:
+            # Map the 'coarse grain' buckets into the 'true' chunks
+            ratio = float(lbucket)/nrowsinchunk
+            starts = (buckets*ratio).astype('int64')
+            stops = numpy.ceil((buckets+1)*ratio).astype('int64')
+            bitmap = Bitmap.fromruns(nchunks, starts, stops)
+        else:
+            bitmap = Bitmap.frompositions(nchunks, buckets)
+        delta = self.readDelta()
+        if len(delta) > 0:
+            # Modified rows are always candidates
+            bitmap = bitmap | Bitmap.frompositions(
+                nchunks, delta // nrowsinchunk)
+        if profile: show_stats("Exiting get_chunkbitmap", tref)
+        return bitmap
+
+
+    def get_coords(self, withvalues=False, runs=None):
+        """Get the row coordinates of the elements found in last search.
+
+        Only 'full' indexes keep the absolute row numbers of their
+        elements, so this can not be used with other kinds of indexes.
+        The coordinates are returned in increasing order.  If
+        `withvalues` is true, a ``(coords, values)`` tuple is returned
+        instead, where `values` are the indexed values for `coords`.
+        If `runs` (as returned by `search_values()`) are given, the
+        elements in them are used instead of the ones in last search.
+
+        Unless `withvalues` is true, the rows in the delta of the index
+        are included too, as their values in the index may be out of
+        sync with column data.
+        """
+
+        assert self.indsize == 8, "only 'full' indexes keep row numbers"
+        if profile: tref = time()
+        if profile: show_stats("Entering get_coords", tref)
+        nslices = self.nslices
+        coords, values = [], []
+        rows, starts, stops = self._get_runs(runs)
+        for i in xrange(len(rows)):
+            nslice = int(rows[i])
+            start, stop = starts[i], stops[i]
+            if stop <= start:
+                continue
+            idx = numpy.empty(shape=stop-start, dtype='u8')
+            if nslice < nslices:
+                self.indices._readIndexSlice(nslice, start, stop, idx)
+            else:
+                self.indicesLR._readIndexSlice(start, stop, idx)
+            coords.append(idx)
+            if withvalues:
+                vals = numpy.empty(shape=stop-start, dtype=self.dtype)
+                if nslice < nslices:
+                    self.read_slice(self.sorted, nslice, vals, start)
+                else:
+                    self.read_sliceLR(self.sortedLR, vals, start)
+                values.append(vals)
+        if coords:
+            coords = numpy.concatenate(coords).astype('int64')
+        else:
+            coords = numpy.empty(shape=0, dtype='int64')
+        order = coords.argsort()
+        coords = coords[order]
+        if profile: show_stats("Exiting get_coords", tref)
+        if not withvalues and self.ndelta > 0:
+            # Modified rows are always candidates
+            coords = numpy.union1d(coords, self.readDelta())
+        if withvalues:
+            if values:
+                values = numpy.concatenate(values)[order]
+            else:
+                values = numpy.empty(shape=0, dtype=self.dtype)
+            return (coords, values)
+        return coords
+
+
+    def readDelta(self):
+        """Get the coordinates of the rows in the delta of this index.
+
+        The coordinates are returned as a sorted array without repeated
+        values.
+        """
+        if self._delta is None:
+            if 'delta' in self:
+                self._delta = numpy.unique(self.delta.read())
+            else:
+                self._delta = numpy.empty(shape=0, dtype='int64')
+        return self._delta
+
+
+    def addDelta(self, coords):
+        """Add the rows with `coords` to the delta of this index.
+
+        The values of the rows in the delta may be out of sync with the
+        values kept in the index, so these rows are taken as candidates
+        in every search, and their values are checked against the query
+        condition.  This way, modifying a few rows in the table does not
+        require rebuilding the whole index.  The number of rows in the
+        delta is returned.
+        """
+        coords = numpy.asarray(coords, dtype='int64').ravel()
+        # Rows not in the index yet will be added with their new values
+        coords = coords[coords < self.nelements]
+        new = numpy.setdiff1d(coords, self.readDelta())
+        if len(new) == 0:
+            return self.ndelta
+        if 'delta' not in self:
+            EArray(self, 'delta', IntAtom(itemsize=8), (0,), "Modified rows",
+                   self.filters, _log=False)
+        self.delta.append(new)
+        self._delta = numpy.union1d(self._delta, new)
+        return self.ndelta
+
+
+    def compact(self):
+        """Fold the delta of modified rows into this index.
+
+        The index is rebuilt from the current column data with the same
+        kind, optimization level and filters.  As the index is replaced
+        by a new one, this instance should not be used afterwards (get
+        the new index from the `Column.index` property instead).  The
+        number of indexed rows is returned (0 if the delta was empty).
+        """
+        if self.ndelta == 0:
+            return 0
+        return self.column._doReIndex(dirty=False)
+
+
     def getLookupRange(self, ops, limits):
+        """Get the range of values to look up for `ops` and `limits`.
+
+        When `ops` and `limits` are sequences with the operators and
+        limits of several ranges (for disjunctions), a tuple of the
+        sorted ranges is returned instead, with overlapping ones merged.
+        """
+        if ops and type(ops[0]) is tuple:
+            return self._getLookupRanges(ops, limits)
+
         assert len(ops) in [1, 2]
         assert len(limits) in [1, 2]
         assert len(ops) == len(limits)
@@ -2047,6 +2772,28 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
         return range_
 
 
+    def _getLookupRanges(self, ops, limits):
+        """Get the sorted, disjoint ranges for several `ops` and `limits`.
+
+        If a single range is left, it is returned by itself.
+        """
+        ranges = []
+        for (ops_, limits_) in zip(ops, limits):
+            range_ = self.getLookupRange(ops_, limits_)
+            if range_ and range_[0] <= range_[1]:
+                ranges.append(range_)
+        ranges.sort()
+        merged = []
+        for (lo, hi) in ranges:
+            if merged and lo <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(hi, merged[-1][1]))
+            else:
+                merged.append((lo, hi))
+        if len(merged) == 1:
+            return merged[0]
+        return tuple(merged)
+
+
     def _f_remove(self, recursive=False):
         """Remove this Index object"""
 
@@ -2084,14 +2831,16 @@ class Index(NotLoggedMixin, indexesExtension.Index, Group):
   superblocksize := %s
   filters := %s
   dirty := %s
+  ndelta := %s
+  peakmemory := %s
   byteorder := %r""" % (self._v_pathname, cpathname,
                         self.optlevel, self.kind,
                         self.filters, self.is_CSI,
                         self.nelements,
                         self.chunksize, self.slicesize,
                         self.blocksize, self.superblocksize,
-                        self.filters, self.dirty,
-                        self.byteorder)
+                        self.filters, self.dirty, self.ndelta,
+                        self.peakmemory, self.byteorder)
         retstr += "\n  sorted := %s" % self.sorted
         retstr += "\n  indices := %s" % self.indices
         retstr += "\n  ranges := %s" % self.ranges
@@ -2154,6 +2903,666 @@ class IndexesTableG(NotLoggedMixin, Group):
 
 
 
+def _accumulate(totals, positions, weights):
+    """Add the `weights` to the `totals` at their `positions`."""
+    if len(positions) > 0:
+        counts = numpy.bincount(positions, weights=weights)
+        totals[:len(counts)] += counts
+
+
+def _compositeIndexNameOf(colnames):
+    """Get the name of the composite index over the `colnames` columns."""
+    return '_p_' + '__'.join(colnames).replace('/', '_')
+
+
+def _limitValue(dtype, lim, upper):
+    """
+    Get the inclusive bound of `dtype` type for a `lim` limit.
+
+    The lowest value of `dtype` type which may be greater than or equal
+    to `lim` is returned (or the highest one which may be lower than or
+    equal to `lim`, if `upper` is true).  Some values beyond `lim` may
+    fall within the bound (e.g. because of rounding).  If no value of
+    `dtype` type can fulfill the comparison, `None` is returned.
+    """
+    kind = dtype.kind
+    if kind in 'iu':
+        if isinstance(lim, float):
+            if lim != lim:
+                return None  # NaN
+            if upper:
+                lim = math.floor(lim)
+            else:
+                lim = math.ceil(lim)
+        info = numpy.iinfo(dtype)
+        if upper:
+            if lim < info.min:
+                return None
+            return long(min(lim, info.max))
+        if lim > info.max:
+            return None
+        return long(max(lim, info.min))
+    if kind == 'f' and lim != lim:
+        return None  # NaN
+    if kind == 'S':
+        return lim[:dtype.itemsize]
+    return lim
+
+
+class CompositeIndex(NotLoggedMixin, Group):
+    """
+    Represents a composite index over several columns of a table.
+
+    The values of the indexed columns in every row are encoded into a
+    single string key (see `tables.extsort.encodeKeys()`) whose order
+    is the lexicographical order of the values, and which ends with the
+    row coordinate.  Keys are kept completely sorted in the ``sorted``
+    array, and the first key of every block of this array is kept in
+    the ``bounds`` array, so a range of keys is found with a binary
+    search in the bounds followed by reading just a block at each end.
+
+    Keys may be looked up by ranges on a prefix of the indexed columns,
+    where all the columns but the last one are compared for equality.
+    Only the rows existing when the index was built are indexed, so
+    rows appended later on must be looked up by other means.
+
+    This class is mainly intended for internal use, but some of its
+    attributes may be interesting for the programmer.
+
+    Public instance variables
+    -------------------------
+
+    blocksize
+        The number of keys in every block of the sorted keys.
+    columns
+        A tuple with the path names of the indexed columns, in order.
+    dirty
+        Whether the index is dirty or not.  Dirty indexes are out of
+        sync with column data, so are not usable.
+    filters
+        Filter properties for this index --see `Filters`.
+    nelements
+        The number of indexed rows.
+    table
+        The `Table` instance of the indexed columns.
+
+    Public methods
+    --------------
+
+    getLookupRange(exprs)
+        Get the range of keys for a lookup on a prefix of the columns.
+    search(range_)
+        Search the keys in `range_` and return their number.
+    get_coords()
+        Get the row coordinates of the keys found in last search.
+    """
+
+    _c_classId = 'CPINDEX'
+
+    _lastrange = (0, 0)
+    """The positions of the keys found in last search."""
+
+
+    # <properties>
+
+    filters = property(
+        lambda self: self._v_filters, None, None,
+        "The filters for this index.")
+
+    nelements = property(
+        lambda self: self.sorted.nrows, None, None,
+        "The number of indexed rows.")
+
+    table = property(
+        lambda self: self._v_parent.table, None, None,
+        "Accessor for the `Table` object of this index.")
+
+    def _getdirty(self):
+        if 'DIRTY' not in self._v_attrs:
+            return False
+        return self._v_attrs.DIRTY
+
+    def _setdirty(self, dirty):
+        wasdirty, isdirty = self.dirty, bool(dirty)
+        self._v_attrs.DIRTY = dirty
+        # Notify the condition cache as `Index` does.
+        conditionCache = self.table._conditionCache
+        if not wasdirty and isdirty:
+            conditionCache.nail()
+        if wasdirty and not isdirty:
+            conditionCache.unnail()
+
+    dirty = property(
+        _getdirty, _setdirty, None,
+        """
+        Whether the index is dirty or not.
+
+        Dirty indexes are out of sync with column data, so they exist
+        but they are not usable.
+        """ )
+
+    # </properties>
+
+
+    def __init__(self, parentNode, name, columns=None, title="",
+                 filters=None, new=False):
+        """Create a composite index over the `columns` path names."""
+        self.columns = columns
+        super(CompositeIndex, self).__init__(
+            parentNode, name, title, new, filters)
+
+
+    def _g_postInitHook(self):
+        super(CompositeIndex, self)._g_postInitHook()
+        if self._v_new:
+            self._v_attrs.COLUMNS = list(self.columns)
+        else:
+            self.columns = tuple([ str(colname)
+                                   for colname in self._v_attrs.COLUMNS ])
+            self.blocksize = int(self._v_attrs.blocksize)
+
+
+    @lazyattr
+    def _bounds(self):
+        """The first key of every block of the sorted keys."""
+        return self.bounds.read()
+
+
+    def _fill(self, tmp_dir=None):
+        """
+        Build the index from the current rows of the table.
+
+        Keys are sorted with an external merge sort using temporary
+        files in `tmp_dir`.  The number of indexed rows is returned.
+        """
+        table = self.table
+        keysize = 8 + sum([ table.coldtypes[colname].itemsize
+                            for colname in self.columns ])
+        atom = StringAtom(itemsize=keysize)
+        expectedrows = max(table._v_expectedrows, table.nrows)
+        sorted = EArray(self, 'sorted', atom, (0,), "Sorted keys",
+                        self.filters, expectedrows, _log=False)
+        bounds = EArray(self, 'bounds', atom, (0,), "Block bounds",
+                        self.filters, _log=False)
+        self.blocksize = blocksize = sorted.chunkshape[0]
+        self._v_attrs.blocksize = blocksize
+
+        for (keys, coords) in iterSortedKeys(
+            table, self.columns, 0, table.nrows, 1, tmp_dir=tmp_dir):
+            nkeys = sorted.nrows
+            bounds.append(keys[-nkeys % blocksize::blocksize])
+            sorted.append(keys)
+        sorted.flush()
+        bounds.flush()
+        return sorted.nrows
+
+
+    def getLookupRange(self, exprs):
+        """
+        Get the range of keys for a lookup on a prefix of the columns.
+
+        `exprs` is a sequence of ``(ops, limits)`` tuples with the
+        comparisons on every column of the prefix, in index order.
+        Columns after the first one not compared for equality are not
+        used.  A ``(lower, upper)`` tuple with the lowest and highest
+        keys in the range is returned, or `None` if it is empty.  Bounds
+        are inclusive, so the range may contain some keys which do not
+        fulfill the comparisons.
+        """
+        table = self.table
+        lparts, uparts = [], []
+        for (colname, (ops, lims)) in zip(self.columns, exprs):
+            dtype = table.coldtypes[colname]
+            lower, upper = None, None
+            for (op, lim) in zip(ops, lims):
+                for isupper in (False, True):
+                    if op not in (isupper and ('lt', 'le', 'eq')
+                                  or ('gt', 'ge', 'eq')):
+                        continue
+                    value = _limitValue(dtype, lim, isupper)
+                    if value is None:
+                        return None
+                    value = numpy.array([value], dtype=dtype)
+                    key = encodeKeys([value]).tostring()
+                    if isupper and (upper is None or key < upper):
+                        upper = key
+                    if not isupper and (lower is None or key > lower):
+                        lower = key
+            if lower is not None and upper is not None and lower > upper:
+                return None
+            if lower is not None:
+                lparts.append(lower)
+            if upper is not None:
+                uparts.append(upper)
+            if lower is None or lower != upper:
+                break  # no more columns can be used
+        keysize = self.sorted.atom.itemsize
+        lower = ''.join(lparts).ljust(keysize, '\x00')
+        upper = ''.join(uparts).ljust(keysize, '\xff')
+        return (lower, upper)
+
+
+    def _searchBlock(self, nblock, key, side):
+        """Get the position of `key` in the `nblock` block of keys."""
+        start = nblock * self.blocksize
+        keys = self.sorted.read(start, min(start+self.blocksize,
+                                           self.nelements))
+        return start + keys.searchsorted(key, side)
+
+
+    def search(self, range_):
+        """
+        Search the keys in `range_` and return their number.
+
+        `range_` is a ``(lower, upper)`` tuple as returned by
+        `getLookupRange()`.
+        """
+        lower, upper = range_
+        bounds = self._bounds
+        nblock = bounds.searchsorted(lower, 'left')
+        start = self._searchBlock(max(nblock-1, 0), lower, 'left')
+        nblock = bounds.searchsorted(upper, 'right')
+        stop = self._searchBlock(max(nblock-1, 0), upper, 'right')
+        stop = max(start, stop)
+        self._lastrange = (start, stop)
+        return stop - start
+
+
+    def get_coords(self):
+        """
+        Get the row coordinates of the keys found in last search.
+
+        The coordinates are returned in increasing order.
+        """
+        start, stop = self._lastrange
+        coords = decodeCoords(self.sorted.read(start, stop))
+        coords.sort()
+        return coords
+
+
+    def __str__(self):
+        """This provides a more compact representation than __repr__"""
+        return "CompositeIndex(%s).is_dirty=%s" % (
+            ", ".join(self.columns), self.dirty)
+
+
+
+def _zoneMapNameOf(colname):
+    """Get the name of the zone map of the `colname` column."""
+    return '_p_zonemap_' + colname.replace('/', '_')
+
+
+_FNV_OFFSET = numpy.uint64(14695981039346656037)
+_FNV_PRIME = numpy.uint64(1099511628211)
+_MIX1 = numpy.uint64(0x9E3779B97F4A7C15)
+_MIX2 = numpy.uint64(0xC2B2AE3D27D4EB4F)
+_SHIFT = numpy.uint64(31)
+
+def _bloomPositions(values, nbits, nhashes):
+    """
+    Get the positions of `values` in a Bloom filter of `nbits` bits.
+
+    `values` must be an array of integers or strings.  An array with a
+    row of `nhashes` bit positions for every value is returned.  Values
+    are hashed with their own type, so they must be converted to the
+    type of the column before.
+    """
+    if values.dtype.kind == 'S':
+        # FNV-1a hash of the bytes in every string
+        itemsize = values.dtype.itemsize
+        bytes = numpy.ascontiguousarray(values).view('uint8')
+        bytes = bytes.reshape(len(values), itemsize)
+        hashes = numpy.empty(len(values), dtype='uint64')
+        hashes[:] = _FNV_OFFSET
+        for i in xrange(itemsize):
+            hashes ^= bytes[:,i]
+            hashes *= _FNV_PRIME
+    else:
+        hashes = values.astype('uint64')
+    # Double hashing with two mixes of the hash values
+    h1 = hashes * _MIX1
+    h1 ^= h1 >> _SHIFT
+    h2 = hashes * _MIX2
+    h2 ^= h2 >> _SHIFT
+    positions = numpy.empty((len(values), nhashes), dtype='int64')
+    for i in xrange(nhashes):
+        positions[:,i] = (h1 + numpy.uint64(i) * h2) % numpy.uint64(nbits)
+    return positions
+
+
+class ZoneMap(NotLoggedMixin, Group):
+    """
+    Represents a zone map over a column of a table.
+
+    A zone map keeps a summary of the values of a column in every chunk
+    of the table: its lowest and highest values are kept in the ``mins``
+    and ``maxs`` arrays and, optionally, a Bloom filter with its values
+    is kept in a row of the ``bloom`` array (only for integer and string
+    columns).  Queries comparing the column with constants read just the
+    chunks whose summary does not prove that none of their rows fulfill
+    the comparisons.
+
+    Summaries are extended when rows are appended to the table, and they
+    are widened to cover the new values of modified rows, so they are
+    never out of sync with column data (but modifying rows may make them
+    less selective).
+
+    This class is mainly intended for internal use, but some of its
+    attributes may be interesting for the programmer.
+
+    Public instance variables
+    -------------------------
+
+    bloom
+        Whether the zone map has Bloom filters or not.
+    chunksize
+        The number of rows summarized in every chunk.
+    column
+        The path name of the summarized column.
+    filters
+        Filter properties for this zone map --see `Filters`.
+    nchunks
+        The number of summarized chunks (the last one may be partial).
+    nrows
+        The number of summarized rows.
+    table
+        The `Table` instance of the summarized column.
+
+    Public methods
+    --------------
+
+    update()
+        Summarize the rows appended to the table since last update.
+    widen(coords)
+        Widen the summaries of the chunks with modified rows.
+    search(ops, limits)
+        Get the chunks which may hold values fulfilling a comparison.
+    """
+
+    _c_classId = 'ZONEMAP'
+
+    _summary = None
+    """The cached ``(mins, maxs)`` arrays of summarized chunks."""
+
+
+    # <properties>
+
+    filters = property(
+        lambda self: self._v_filters, None, None,
+        "The filters for this zone map.")
+
+    table = property(
+        lambda self: self._v_parent.table, None, None,
+        "Accessor for the `Table` object of this zone map.")
+
+    bloom = property(
+        lambda self: 'bloomf' in self, None, None,
+        "Whether the zone map has Bloom filters or not.")
+
+    nrows = property(
+        lambda self: long(self._v_attrs.NROWS), None, None,
+        "The number of summarized rows.")
+
+    nchunks = property(
+        lambda self: (self.nrows + self.chunksize - 1) // self.chunksize,
+        None, None,
+        "The number of summarized chunks (the last one may be partial).")
+
+    # </properties>
+
+
+    def __init__(self, parentNode, name, column=None, title="",
+                 filters=None, new=False):
+        """Create a zone map over the `column` path name."""
+        self.column = column
+        super(ZoneMap, self).__init__(
+            parentNode, name, title, new, filters)
+
+
+    def _g_postInitHook(self):
+        super(ZoneMap, self)._g_postInitHook()
+        if self._v_new:
+            self._v_attrs.COLUMN = self.column
+        else:
+            self.column = str(self._v_attrs.COLUMN)
+            self.chunksize = int(self._v_attrs.chunksize)
+
+
+    def _fill(self, bloom=False):
+        """
+        Summarize the current rows of the table.
+
+        If `bloom` is true, Bloom filters are kept as well.  The number
+        of summarized rows is returned.
+        """
+        table = self.table
+        atom = Atom.from_dtype(table.coldtypes[self.column])
+        EArray(self, 'mins', atom, (0,), "Lowest values", self.filters,
+               _log=False)
+        EArray(self, 'maxs', atom, (0,), "Highest values", self.filters,
+               _log=False)
+        self.chunksize = table.chunkshape[0]
+        self._v_attrs.chunksize = self.chunksize
+        if bloom:
+            nbits = table._v_file.params['ZONEMAP_BLOOM_BITS']
+            nbytes = max((self.chunksize * nbits + 7) // 8, 1)
+            self._v_attrs.nhashes = max(int(round(nbits * math.log(2))), 1)
+            EArray(self, 'bloomf', UIntAtom(itemsize=1), (0, nbytes),
+                   "Bloom filters", self.filters, _log=False)
+        self._v_attrs.NROWS = 0
+        return self.update()
+
+
+    def _getSummary(self):
+        """Get the ``(mins, maxs)`` arrays of summarized chunks."""
+        if self._summary is None:
+            nchunks = self.nchunks
+            self._summary = (self.mins.read(0, nchunks),
+                             self.maxs.read(0, nchunks))
+        return self._summary
+
+
+    def _chunkBounds(self, values):
+        """
+        Get the lowest and highest `values` in every chunk.
+
+        `values` must start at the beginning of a chunk.  The last chunk
+        in them may be partial.
+        """
+        cs, nvalues = self.chunksize, len(values)
+        nfull = nvalues // cs
+        parts = [values[:nfull*cs].reshape(nfull, cs)]
+        if nvalues > nfull*cs:
+            parts.append(values[nfull*cs:].reshape(1, nvalues - nfull*cs))
+        mins, maxs = [], []
+        for part in parts:
+            if values.dtype.kind == 'S':
+                # Reductions are not supported for strings
+                part = numpy.sort(part, axis=1)
+                mins.append(part[:,0])
+                maxs.append(part[:,-1])
+            elif values.dtype.kind == 'f':
+                # NaNs never fulfill comparisons, so skip them
+                mins.append(numpy.fmin.reduce(part, axis=1))
+                maxs.append(numpy.fmax.reduce(part, axis=1))
+            else:
+                mins.append(part.min(axis=1))
+                maxs.append(part.max(axis=1))
+        return (numpy.concatenate(mins), numpy.concatenate(maxs))
+
+
+    def _bloomBits(self, nchunks, chunks, values):
+        """
+        Get the Bloom filters of `values` in `nchunks` chunks.
+
+        `chunks` holds the chunk of every value, relative to the first
+        one.  An array with a row of packed bits for every chunk is
+        returned.
+        """
+        bloomf = self.bloomf
+        nbits = bloomf.shape[1] * 8
+        positions = _bloomPositions(values, nbits, self._v_attrs.nhashes)
+        bits = numpy.zeros((nchunks, nbits), dtype=numpy.bool_)
+        bits[chunks[:,numpy.newaxis], positions] = True
+        return numpy.packbits(bits, axis=1)
+
+
+    def _write(self, array, nchunk, values):
+        """Write the chunk summaries in `values` to `array` from `nchunk`."""
+        nexisting = max(min(array.nrows - nchunk, len(values)), 0)
+        if nexisting > 0:
+            array[nchunk:nchunk+nexisting] = values[:nexisting]
+        if nexisting < len(values):
+            array.append(values[nexisting:])
+
+
+    def update(self):
+        """
+        Summarize the rows appended to the table since last update.
+
+        The last summarized chunk is computed again, as it may have been
+        partial.  If the table has less rows than those summarized (e.g.
+        after removing rows), all of them are summarized again.  The
+        number of summarized rows is returned.
+        """
+        table, cs = self.table, self.chunksize
+        nrows, first = table.nrows, self.nrows
+        if first > nrows:
+            first = 0
+        first = first // cs
+        bloom = self.bloom
+        nrowsinbuf = max(table.nrowsinbuf // cs, 1) * cs
+        for start in xrange(first*cs, nrows, nrowsinbuf):
+            stop = min(start + nrowsinbuf, nrows)
+            values = table._read(start, stop, 1, self.column)
+            nchunk = start // cs
+            mins, maxs = self._chunkBounds(values)
+            self._write(self.mins, nchunk, mins)
+            self._write(self.maxs, nchunk, maxs)
+            if bloom:
+                chunks = numpy.arange(len(values)) // cs
+                self._write(self.bloomf, nchunk,
+                            self._bloomBits(len(mins), chunks, values))
+        self._v_attrs.NROWS = nrows
+        self._summary = None
+        return nrows
+
+
+    def widen(self, coords):
+        """
+        Widen the summaries of the chunks with modified rows.
+
+        The current values in the rows with `coords` are added to the
+        summaries of their chunks, so that the chunks are selected by
+        queries for them.  The old values are not removed, as that would
+        need the whole chunks to be summarized again.
+        """
+        coords = numpy.asarray(coords, dtype='int64')
+        coords = numpy.unique(coords[coords < self.nrows])
+        if len(coords) == 0:
+            return
+        cs = self.chunksize
+        values = self.table._readCoordinates(coords, self.column)
+        allchunks = coords // cs
+        chunks = numpy.unique(allchunks)
+        starts = allchunks.searchsorted(chunks)
+        stops = numpy.append(starts[1:], len(values))
+        mins, maxs = self.mins, self.maxs
+        for (nchunk, start, stop) in zip(chunks, starts, stops):
+            cmins, cmaxs = self._chunkBounds(values[start:stop])
+            oldmin, oldmax = mins[nchunk], maxs[nchunk]
+            if values.dtype.kind == 'f':
+                newmin = numpy.fmin(oldmin, cmins[0])
+                newmax = numpy.fmax(oldmax, cmaxs[0])
+            else:
+                newmin = min(oldmin, cmins[0])
+                newmax = max(oldmax, cmaxs[0])
+            if newmin != oldmin:
+                mins[nchunk] = newmin
+            if newmax != oldmax:
+                maxs[nchunk] = newmax
+        if self.bloom:
+            bloomf = self.bloomf
+            for (nchunk, start, stop) in zip(chunks, starts, stops):
+                cvalues = values[start:stop]
+                bits = self._bloomBits(
+                    1, numpy.zeros(len(cvalues), dtype='int64'), cvalues)
+                bloomf[nchunk] = bloomf[nchunk] | bits[0]
+        self._summary = None
+
+
+    def _searchBloom(self, lim, selected):
+        """
+        Get the `selected` chunks whose Bloom filter may hold `lim`.
+
+        `selected` is a boolean array with the chunks to be checked.
+        """
+        dtype = self.table.coldtypes[self.column]
+        if dtype.kind in 'iu' and isinstance(lim, float):
+            # Integers are compared as floats, so several of them may
+            # be equal to `lim`: do not rely on hashes
+            return selected
+        value = _limitValue(dtype, lim, False)
+        if value is None or value != lim:
+            # No value of the column type is equal to `lim`
+            return numpy.zeros(len(selected), dtype=numpy.bool_)
+        value = numpy.array([value], dtype=dtype)
+        bloomf = self.bloomf
+        positions = _bloomPositions(
+            value, bloomf.shape[1] * 8, self._v_attrs.nhashes)[0]
+        bytepos = positions // 8
+        masks = (128 >> (positions % 8)).astype('uint8')
+        found = numpy.zeros(len(selected), dtype=numpy.bool_)
+        nrowsinbuf = bloomf.nrowsinbuf
+        for start in xrange(0, len(selected), nrowsinbuf):
+            stop = min(start + nrowsinbuf, len(selected))
+            if not selected[start:stop].any():
+                continue
+            bits = bloomf.read(start, stop)[:,bytepos]
+            found[start:stop] = ((bits & masks) != 0).all(axis=1)
+        return selected & found
+
+
+    def search(self, ops, limits):
+        """
+        Get the chunks which may hold values fulfilling a comparison.
+
+        `ops` and `limits` are the operators and limits of an index
+        expression on the column, possibly with several ranges (see
+        `Index.getLookupRange()`).  A boolean array with an element for
+        every summarized chunk is returned.
+        """
+        mins, maxs = self._getSummary()
+        if type(ops[0]) is tuple:  # several ranges
+            selected = numpy.zeros(len(mins), dtype=numpy.bool_)
+            for (ops_, limits_) in zip(ops, limits):
+                selected |= self.search(ops_, limits_)
+            return selected
+
+        selected = numpy.ones(len(mins), dtype=numpy.bool_)
+        for (op, lim) in zip(ops, limits):
+            if op == 'lt':
+                selected &= mins < lim
+            elif op == 'le':
+                selected &= mins <= lim
+            elif op == 'gt':
+                selected &= maxs > lim
+            elif op == 'ge':
+                selected &= maxs >= lim
+            elif op == 'eq':
+                selected &= (mins <= lim) & (maxs >= lim)
+                if self.bloom and selected.any():
+                    selected = self._searchBloom(lim, selected)
+        return selected
+
+
+    def __str__(self):
+        """This provides a more compact representation than __repr__"""
+        return "ZoneMap(%s, nchunks=%d, bloom=%s)" % (
+            self.column, self.nchunks, self.bloom)
+
+
+
 class OldIndex(NotLoggedMixin, Group):
     """This is meant to hide indexes of PyTables 1.x files."""
     _c_classId = 'CINDEX'
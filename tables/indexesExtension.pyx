@@ -38,7 +38,7 @@ from hdf5Extension cimport Array
 
 # numpy functions & objects
 from definitions cimport \
-     memcpy, \
+     memcpy, memcmp, \
      Py_BEGIN_ALLOW_THREADS, Py_END_ALLOW_THREADS, \
      import_array, ndarray, \
      npy_intp, \
@@ -56,6 +56,10 @@ from lrucacheExtension cimport NumCache
 
 __version__ = "$Revision$"
 
+radix_keysort_min = 2048
+"""The minimum number of elements for `keysort()` to sort numerical
+arrays with a radix sort by default (smaller ones use a quicksort)."""
+
 #-------------------------------------------------------------------
 
 # External C functions
@@ -100,18 +104,26 @@ cdef extern from "idx-opt.h":
   int bisect_right_f(npy_float32 *a, npy_float64 x, int hi, int offset)
   int bisect_left_d(npy_float64 *a, npy_float64 x, int hi, int offset)
   int bisect_right_d(npy_float64 *a, npy_float64 x, int hi, int offset)
-
-  int keysort_f64(npy_float64 *start1, char *start2, npy_intp num, int ts)
-  int keysort_f32(npy_float32 *start1, char *start2, npy_intp num, int ts)
-  int keysort_i64(npy_int64 *start1, char *start2, npy_intp num, int ts)
-  int keysort_u64(npy_uint64 *start1, char *start2, npy_intp num, int ts)
-  int keysort_i32(npy_int32 *start1, char *start2, npy_intp num, int ts)
-  int keysort_u32(npy_uint32 *start1, char *start2, npy_intp num, int ts)
-  int keysort_i16(npy_int16 *start1, char *start2, npy_intp num, int ts)
-  int keysort_u16(npy_uint16 *start1, char *start2, npy_intp num, int ts)
-  int keysort_i8(npy_int8 *start1, char *start2, npy_intp num, int ts)
-  int keysort_u8(npy_uint8 *start1, char *start2, npy_intp num, int ts)
-  int keysort_S(char *start1, int ss, char *start2, npy_intp num, int ts)
+  int bisect_left_S(char *a, char *x, int hi, int offset, int ss)
+  int bisect_right_S(char *a, char *x, int hi, int offset, int ss)
+  int bisect_left_t(int type, char *a, char *x, int hi, int ss)
+  int bisect_right_t(int type, char *a, char *x, int hi, int ss)
+  int IDX_INT8, IDX_UINT8, IDX_INT16, IDX_UINT16, IDX_INT32, IDX_UINT32
+  int IDX_INT64, IDX_UINT64, IDX_FLOAT32, IDX_FLOAT64, IDX_STRING
+
+  int keysort_f64(npy_float64 *start1, char *start2, npy_intp num, int ts) nogil
+  int keysort_f32(npy_float32 *start1, char *start2, npy_intp num, int ts) nogil
+  int keysort_i64(npy_int64 *start1, char *start2, npy_intp num, int ts) nogil
+  int keysort_u64(npy_uint64 *start1, char *start2, npy_intp num, int ts) nogil
+  int keysort_i32(npy_int32 *start1, char *start2, npy_intp num, int ts) nogil
+  int keysort_u32(npy_uint32 *start1, char *start2, npy_intp num, int ts) nogil
+  int keysort_i16(npy_int16 *start1, char *start2, npy_intp num, int ts) nogil
+  int keysort_u16(npy_uint16 *start1, char *start2, npy_intp num, int ts) nogil
+  int keysort_i8(npy_int8 *start1, char *start2, npy_intp num, int ts) nogil
+  int keysort_u8(npy_uint8 *start1, char *start2, npy_intp num, int ts) nogil
+  int keysort_S(char *start1, int ss, char *start2, npy_intp num, int ts) nogil
+  int keysort_radix(char *start1, int vs, char kind,
+                    char *start2, npy_intp num, int ts) nogil
 
 
 
@@ -128,43 +140,89 @@ import_array()
 # Functions
 
 # Sorting functions
-def keysort(ndarray array1, ndarray array2):
+def keysort(ndarray array1, ndarray array2, method=None):
   """Sort array1 in-place. array2 is also sorted following the array1 order.
 
   array1 can be of any type, except complex or string.  array2 may be made of
   elements on any size.
 
+  method can be 'quicksort' or 'radix'.  The radix sort is only available
+  for boolean, integer and 32/64-bit float arrays, and it is stable (it keeps
+  the order of array2 elements with equal keys), but it needs temporary
+  buffers as large as both arrays (a quicksort is done if they can not be
+  allocated).  If None, the radix sort is used for those arrays with at
+  least `radix_keysort_min` elements.
+
+  The GIL is released during the sort, so several arrays can be sorted at
+  once from different threads.
+
   """
   cdef npy_intp size
-  cdef int elsize1, elsize2
+  cdef int elsize1, elsize2, ret
+  cdef char *data1, *data2
+  cdef char kind
 
   size = array1.size
   elsize1 = array1.itemsize
   elsize2 = array2.itemsize
+  data1 = array1.data
+  data2 = array2.data
+  radixable = (array1.dtype.kind in "biu" or
+               (array1.dtype.kind == "f" and elsize1 in (4, 8)))
+  if method is None:
+    if radixable and size >= radix_keysort_min:
+      method = "radix"
+    else:
+      method = "quicksort"
+  if method == "radix":
+    if not radixable:
+      raise ValueError("radix sort is not supported for ``%s`` arrays"
+                       % array1.dtype)
+    kind = ord(array1.dtype.kind)
+    with nogil:
+      ret = keysort_radix(data1, elsize1, kind, data2, size, elsize2)
+    if ret == 0:
+      return ret
+    # The temporary buffers could not be allocated, so do a quicksort
+  elif method != "quicksort":
+    raise ValueError("method must be 'quicksort' or 'radix', not %r"
+                     % (method,))
   if array1.dtype == "float64":
-    return keysort_f64(<npy_float64 *>array1.data, array2.data, size, elsize2)
+    with nogil:
+      ret = keysort_f64(<npy_float64 *>data1, data2, size, elsize2)
   elif array1.dtype == "float32":
-    return keysort_f32(<npy_float32 *>array1.data, array2.data, size, elsize2)
+    with nogil:
+      ret = keysort_f32(<npy_float32 *>data1, data2, size, elsize2)
   elif array1.dtype == "int64":
-    return keysort_i64(<npy_int64 *>array1.data, array2.data, size, elsize2)
+    with nogil:
+      ret = keysort_i64(<npy_int64 *>data1, data2, size, elsize2)
   elif array1.dtype == "uint64":
-    return keysort_u64(<npy_uint64 *>array1.data, array2.data, size, elsize2)
+    with nogil:
+      ret = keysort_u64(<npy_uint64 *>data1, data2, size, elsize2)
   elif array1.dtype == "int32":
-    return keysort_i32(<npy_int32 *>array1.data, array2.data, size, elsize2)
+    with nogil:
+      ret = keysort_i32(<npy_int32 *>data1, data2, size, elsize2)
   elif array1.dtype == "uint32":
-    return keysort_u32(<npy_uint32 *>array1.data, array2.data, size, elsize2)
+    with nogil:
+      ret = keysort_u32(<npy_uint32 *>data1, data2, size, elsize2)
   elif array1.dtype == "int16":
-    return keysort_i16(<npy_int16 *>array1.data, array2.data, size, elsize2)
+    with nogil:
+      ret = keysort_i16(<npy_int16 *>data1, data2, size, elsize2)
   elif array1.dtype == "uint16":
-    return keysort_u16(<npy_uint16 *>array1.data, array2.data, size, elsize2)
+    with nogil:
+      ret = keysort_u16(<npy_uint16 *>data1, data2, size, elsize2)
   elif array1.dtype == "int8":
-    return keysort_i8(<npy_int8 *>array1.data, array2.data, size, elsize2)
+    with nogil:
+      ret = keysort_i8(<npy_int8 *>data1, data2, size, elsize2)
   elif array1.dtype == "uint8":
-    return keysort_u8(<npy_uint8 *>array1.data, array2.data, size, elsize2)
+    with nogil:
+      ret = keysort_u8(<npy_uint8 *>data1, data2, size, elsize2)
   elif array1.dtype == "bool":
-    return keysort_u8(<npy_uint8 *>array1.data, array2.data, size, elsize2)
+    with nogil:
+      ret = keysort_u8(<npy_uint8 *>data1, data2, size, elsize2)
   elif array1.dtype.char == "S":
-    return keysort_S(array1.data, elsize1, array2.data, size, elsize2)
+    with nogil:
+      ret = keysort_S(data1, elsize1, data2, size, elsize2)
     # As it turns out, an indirect sort is always faster, and much faster on
     # new processors.  See
     # http://www.mail-archive.com/numpy-discussion@scipy.org/msg06639.html
@@ -178,6 +236,7 @@ def keysort(ndarray array1, ndarray array2):
     #return 0
   else:
     raise ValueError, "This shouldn't happen!"
+  return ret
 
 
 # Classes
@@ -281,7 +340,8 @@ cdef class IndexArray(Array):
     self.nbounds = index.bounds.shape[1]
     self.bounds_ext = <CacheArray>index.bounds
     self.bounds_ext.initRead(self.nbounds)
-    if str(dtype) in self._v_parent.opt_search_types:
+    if (str(dtype) in self._v_parent.opt_search_types or
+        dtype.kind == 'S'):
       # The next caches should be defined only for optimized search types.
       # The 2nd level cache will replace the already existing ObjectCache and
       # already bound to the boundscache attribute. This way, the cache will
@@ -886,6 +946,149 @@ cdef class IndexArray(Array):
     return tlength
 
 
+  # Optimized version for fixed-width strings
+  def _searchBinNA_S(self, item1, item2):
+    cdef int cs, ss, ncs, nrow, nrows, nbounds, rvrow, itemsize
+    cdef int start, stop, tlength, length, bread, nchunk, nchunk2
+    cdef int *rbufst, *rbufln
+    cdef ndarray aitem1, aitem2
+    # Variables with specific type
+    cdef char *rbufrv, *rbufbc, *rbuflb, *citem1, *citem2
+
+    # Get null-padded copies of the items, as kept in the index
+    aitem1 = numpy.array(item1, dtype=self.atom.dtype)
+    aitem2 = numpy.array(item2, dtype=self.atom.dtype)
+    citem1 = aitem1.data;  citem2 = aitem2.data
+    itemsize = self.atom.dtype.itemsize
+
+    cs = self.l_chunksize;  ss = self.l_slicesize; ncs = ss / cs
+    nbounds = self.nbounds;  nrows = self.nrows
+    rbufst = <int *>self.rbufst;  rbufln = <int *>self.rbufln
+    rbufrv = <char *>self.rbufrv; tlength = 0
+    for nrow from 0 <= nrow < nrows:
+      rvrow = nrow*2;  bread = 0;  nchunk = -1
+      # Look if item1 is in this row
+      if memcmp(citem1, rbufrv + rvrow*itemsize, itemsize) > 0:
+        if memcmp(citem1, rbufrv + (rvrow+1)*itemsize, itemsize) <= 0:
+          # Get the bounds row from the LRU cache or read them.
+          rbufbc = <char *>self.getLRUbounds(nrow, nbounds)
+          bread = 1
+          nchunk = bisect_left_S(rbufbc, citem1, nbounds, 0, itemsize)
+          # Get the sorted row from the LRU cache or read it.
+          rbuflb = <char *>self.getLRUsorted(nrow, ncs, nchunk, cs)
+          start = bisect_left_S(rbuflb, citem1, cs, 0, itemsize) + cs*nchunk
+        else:
+          start = ss
+      else:
+        start = 0
+      # Now, for item2
+      if memcmp(citem2, rbufrv + rvrow*itemsize, itemsize) >= 0:
+        if memcmp(citem2, rbufrv + (rvrow+1)*itemsize, itemsize) < 0:
+          if not bread:
+            # Get the bounds row from the LRU cache or read them.
+            rbufbc = <char *>self.getLRUbounds(nrow, nbounds)
+          nchunk2 = bisect_right_S(rbufbc, citem2, nbounds, 0, itemsize)
+          if nchunk2 <> nchunk:
+            # Get the sorted row from the LRU cache or read it.
+            rbuflb = <char *>self.getLRUsorted(nrow, ncs, nchunk2, cs)
+          stop = bisect_right_S(rbuflb, citem2, cs, 0, itemsize) + cs*nchunk2
+        else:
+          stop = ss
+      else:
+        stop = 0
+      length = stop - start;  tlength = tlength + length
+      rbufst[nrow] = start;  rbufln[nrow] = length;
+    return tlength
+
+
+  # Version for many items of any optimized type at once
+  def _searchBinNA_batch(self, ndarray items1, ndarray items2,
+                         ndarray starts, ndarray lengths):
+    """Look up several ``(item1, item2)`` ranges in all the rows at once.
+
+    `items1` and `items2` have the lower and upper limits of the ranges,
+    as int64 for integer types (but uint64 for uint64), float64 for
+    float types and the type of the values for strings.  The row `i` of
+    the `starts` and `lengths` int32 matrices gets the elements found
+    for the range `i` in every row.  Rows are looked up one after
+    another, so that their bounds are only got once, and so are the
+    sorted chunks shared by consecutive ranges.  The total number of
+    elements found is returned.
+    """
+    cdef int cs, ss, ncs, nrow, nrows, nbounds, rvrow, itemsize, vtype
+    cdef int start, stop, nchunk, nchunk2, lastchunk
+    cdef npy_intp i, nitems, rowstride, isize
+    cdef npy_int64 tlength
+    cdef int *rbufst, *rbufln
+    cdef char *rbufrv, *rbufbc, *rbuflb, *citems1, *citems2, *citem1, *citem2
+
+    dtype = self.atom.dtype
+    vtype = {'int8': IDX_INT8, 'uint8': IDX_UINT8,
+             'int16': IDX_INT16, 'uint16': IDX_UINT16,
+             'int32': IDX_INT32, 'uint32': IDX_UINT32,
+             'int64': IDX_INT64, 'uint64': IDX_UINT64,
+             'float32': IDX_FLOAT32, 'float64': IDX_FLOAT64}.get(
+               str(dtype), IDX_STRING)
+    itemsize = dtype.itemsize
+    isize = items1.itemsize
+    nitems = len(items1)
+    rowstride = starts.shape[1]
+    citems1 = items1.data;  citems2 = items2.data
+
+    cs = self.l_chunksize;  ss = self.l_slicesize; ncs = ss / cs
+    nbounds = self.nbounds;  nrows = self.nrows
+    rbufst = <int *>starts.data;  rbufln = <int *>lengths.data
+    rbufrv = <char *>self.rbufrv; tlength = 0
+    for nrow from 0 <= nrow < nrows:
+      rvrow = nrow*2;  rbufbc = NULL;  lastchunk = -1
+      for i from 0 <= i < nitems:
+        citem1 = citems1 + i*isize;  citem2 = citems2 + i*isize
+        nchunk = -1
+        # Look if item1 is in this row
+        if bisect_left_t(vtype, rbufrv + rvrow*itemsize, citem1, 1,
+                         itemsize):  # item1 > first value
+          if not bisect_left_t(vtype, rbufrv + (rvrow+1)*itemsize, citem1,
+                               1, itemsize):  # item1 <= last value
+            # Get the bounds row from the LRU cache or read them.
+            if rbufbc == NULL:
+              rbufbc = <char *>self.getLRUbounds(nrow, nbounds)
+            nchunk = bisect_left_t(vtype, rbufbc, citem1, nbounds, itemsize)
+            # Get the sorted row from the LRU cache or read it.
+            if nchunk <> lastchunk:
+              rbuflb = <char *>self.getLRUsorted(nrow, ncs, nchunk, cs)
+              lastchunk = nchunk
+            start = (bisect_left_t(vtype, rbuflb, citem1, cs, itemsize) +
+                     cs*nchunk)
+          else:
+            start = ss
+        else:
+          start = 0
+        # Now, for item2
+        if bisect_right_t(vtype, rbufrv + rvrow*itemsize, citem2, 1,
+                          itemsize):  # item2 >= first value
+          if not bisect_right_t(vtype, rbufrv + (rvrow+1)*itemsize, citem2,
+                                1, itemsize):  # item2 < last value
+            if rbufbc == NULL:
+              rbufbc = <char *>self.getLRUbounds(nrow, nbounds)
+            nchunk2 = bisect_right_t(vtype, rbufbc, citem2, nbounds, itemsize)
+            if nchunk2 <> lastchunk:
+              rbuflb = <char *>self.getLRUsorted(nrow, ncs, nchunk2, cs)
+              lastchunk = nchunk2
+            stop = (bisect_right_t(vtype, rbuflb, citem2, cs, itemsize) +
+                    cs*nchunk2)
+          else:
+            stop = ss
+        else:
+          stop = 0
+        # Empty ranges (item1 > item2) find nothing
+        if stop < start:
+          stop = start
+        rbufst[i*rowstride+nrow] = start
+        rbufln[i*rowstride+nrow] = stop - start
+        tlength = tlength + stop - start
+    return tlength
+
+
   def _g_close(self):
     super(Array, self)._g_close()
     # Release specific resources of this class
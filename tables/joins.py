@@ -0,0 +1,258 @@
+########################################################################
+#
+#       License: BSD
+#       Created: October 16, 2026
+#
+#       $Id$
+#
+########################################################################
+
+"""Joins between tables.
+
+Functions:
+
+    join
+
+Misc variables:
+
+    __version__
+"""
+
+import numpy
+
+from tables import indexesExtension
+from tables.extsort import iterSortedColumn
+from tables.flavor import internal_to_flavor
+from tables.utilsExtension import getNestedField
+
+
+__version__ = "$Revision$"
+
+
+# The kinds of joins supported by `join()`.
+_joinKinds = ('inner', 'left')
+
+
+def _matchSorted(lkeys, rkeys, outer):
+    """
+    Get the positions of matching keys in `lkeys` and `rkeys`.
+
+    `rkeys` must be sorted.  A ``(lidx, ridx)`` tuple of arrays is
+    returned, with a pair of positions for every match, in increasing
+    order of `lidx`.  If `outer` is true, keys in `lkeys` without a
+    match also get a pair, with a position of -1 in `ridx`.
+    """
+    lo = rkeys.searchsorted(lkeys, 'left')
+    counts = rkeys.searchsorted(lkeys, 'right') - lo
+    if outer:
+        missing = counts == 0
+        counts[missing] = 1
+    offsets = numpy.cumsum(counts) - counts
+    lidx = numpy.repeat(numpy.arange(len(lkeys), dtype='int64'), counts)
+    ridx = numpy.arange(counts.sum(), dtype='int64')
+    ridx += numpy.repeat(lo - offsets, counts)
+    if outer:
+        ridx[numpy.repeat(missing, counts)] = -1
+    return (lidx, ridx)
+
+
+def _takeCoords(coords, idx):
+    """Take the `coords` at positions `idx`, with -1 for negative ones."""
+    result = numpy.empty(len(idx), dtype='int64')
+    valid = idx >= 0
+    result[valid] = coords[idx[valid]]
+    result[~valid] = -1
+    return result
+
+
+def _indexJoinPairs(left, right, on, outer):
+    """
+    Iterate over the row coordinates of joined rows using an index.
+
+    The `on` column of `left` is read by blocks, and their keys are
+    looked up at once in the index of the `on` column of `right`.  A
+    ``(lcoords, rcoords)`` tuple of arrays is yielded for every block,
+    in increasing order of `lcoords`.
+    """
+    rcol = right.cols._f_col(on)
+    nrows, nrowsinbuf = left.nrows, left.nrowsinbuf
+    for start in xrange(0, nrows, nrowsinbuf):
+        lkeys = left._read(start, min(start+nrowsinbuf, nrows), 1, on)
+        rcoords = rcol.lookup(lkeys)
+        rkeys = right._readCoordinates(rcoords, on)
+        indexesExtension.keysort(rkeys, rcoords)
+        lidx, ridx = _matchSorted(lkeys, rkeys, outer)
+        yield (lidx + start, _takeCoords(rcoords, ridx))
+
+
+def _mergeJoinPairs(left, right, on, outer, maxsize):
+    """
+    Iterate over the row coordinates of joined rows using a sort-merge.
+
+    The `on` columns of `left` and `right` are sorted (externally if
+    they take more than `maxsize` bytes) and merged by blocks.  A
+    ``(lcoords, rcoords)`` tuple of arrays is yielded for every block,
+    in increasing order of keys.
+    """
+    blocks = [ iterSortedColumn(left, on, maxsize),
+               iterSortedColumn(right, on, maxsize) ]
+    keys = [left._read(0, 0, 1, on), right._read(0, 0, 1, on)]
+    coords = [numpy.empty(0, dtype='int64'), numpy.empty(0, dtype='int64')]
+    done = [False, False]
+
+    def pull(i):
+        """Append the next block of the side `i` to its buffers."""
+        try:
+            bkeys, bcoords = blocks[i].next()
+        except StopIteration:
+            done[i] = True
+            return
+        keys[i] = numpy.concatenate([keys[i], bkeys])
+        coords[i] = numpy.concatenate([coords[i], bcoords])
+
+    while True:
+        for i in (0, 1):
+            if len(keys[i]) == 0 and not done[i]:
+                pull(i)
+        if len(keys[0]) == 0 and done[0]:
+            break
+        # Keys lower than the lowest last key in the buffers of the
+        # sides not read yet are complete in both sides.
+        bounds = [keys[i][-1] for i in (0, 1) if not done[i]]
+        if bounds:
+            bound = min(bounds)
+            nl = keys[0].searchsorted(bound, 'left')
+            nr = keys[1].searchsorted(bound, 'left')
+        else:
+            bound = None
+            nl, nr = len(keys[0]), len(keys[1])
+        if nl == 0 and nr == 0:
+            # Keys equal to the bound may go on in the next block
+            for i in (0, 1):
+                if not done[i] and keys[i][-1] == bound:
+                    pull(i)
+            continue
+        lidx, ridx = _matchSorted(keys[0][:nl], keys[1][:nr], outer)
+        if len(lidx) > 0:
+            yield (coords[0][:nl][lidx], _takeCoords(coords[1][:nr], ridx))
+        keys = [keys[0][nl:], keys[1][nr:]]
+        coords = [coords[0][nl:], coords[1][nr:]]
+
+
+def join(left, right, on, how='inner', out=None):
+    """
+    Join the rows of the `left` and `right` tables with equal `on` values.
+
+    `on` is the path name of a column existing in both tables, which
+    must not be multidimensional.  With an ``'inner'`` join (the default
+    value of `how`), a row is produced for every pair of rows of `left`
+    and `right` having the same value in the `on` column.  With a
+    ``'left'`` join, rows in `left` without a match are also produced,
+    with the default values of the columns in `right`.
+
+    If `out` is given, the joined rows are appended to that table in
+    blocks of ``IO_BUFFER_SIZE`` bytes, and the number of rows appended
+    is returned.  The columns in `out` are taken from the column with
+    the same path name in `left` or, when there is none, in `right`.
+    Otherwise, the joined rows are returned in a record array of the
+    flavor of `left`, with all the columns of `left` followed by the
+    ones of `right` not in `left`.
+
+    When the `on` column of `right` has an index, blocks of keys in
+    `left` are looked up at once in it (see `Column.lookup()`), and
+    rows come in the order of `left`.  Otherwise, both columns are
+    sorted (with temporary files if they take more than
+    ``SORT_MAX_SIZE`` bytes) and merged, and rows come in increasing
+    order of `on` values.
+
+    Example of use::
+
+        nrows = tables.join(events, users, on='user_id', out=joined)
+    """
+    if how not in _joinKinds:
+        raise ValueError( "join kind ``%s`` is not supported; "
+                          "please use one of %s" % (how, _joinKinds) )
+    for table in (left, right):
+        if on not in table.coldtypes:
+            raise KeyError( "column ``%s`` not found in table ``%s``"
+                            % (on, table._v_pathname) )
+        if table.coldescrs[on].shape != ():
+            raise ValueError( "can not join on column ``%s``: it is "
+                              "multidimensional" % on )
+
+    if out is not None:
+        out._v_file._checkWritable()
+        dtype, names = out._v_dtype, out.colpathnames
+    else:
+        names = left.colpathnames + [ name for name in right.colpathnames
+                                      if name not in left.coldtypes ]
+        dtype = []
+    sources = []
+    for name in names:
+        if name in left.coldtypes:
+            sources.append((name, left))
+        elif name in right.coldtypes:
+            sources.append((name, right))
+        else:
+            raise ValueError( "column ``%s`` of the output table is not in "
+                              "the joined tables" % name )
+        if out is None:
+            dtype.append((name, sources[-1][1].coldtypes[name]))
+    dtype = numpy.dtype(dtype)
+
+    params = left._v_file.params
+    outer = how == 'left'
+    rindex = right.cols._f_col(on).index
+    if rindex is not None and not rindex.dirty:
+        pairs = _indexJoinPairs(left, right, on, outer)
+    else:
+        pairs = _mergeJoinPairs(
+            left, right, on, outer, params['SORT_MAX_SIZE'])
+
+    blocksize = max(params['IO_BUFFER_SIZE'] // dtype.itemsize, 1)
+    blocks, nrows = [], 0
+    for (lcoords, rcoords) in pairs:
+        for start in xrange(0, len(lcoords), blocksize):
+            bstop = start + blocksize
+            block = _joinedBlock(left, right, lcoords[start:bstop],
+                                 rcoords[start:bstop], dtype, sources)
+            if out is not None:
+                out.append(block)
+            else:
+                blocks.append(block)
+            nrows += len(block)
+    if out is not None:
+        out.flush()
+        return nrows
+    if blocks:
+        result = numpy.concatenate(blocks)
+    else:
+        result = numpy.empty(0, dtype=dtype)
+    return internal_to_flavor(result, left.flavor)
+
+
+def _joinedBlock(left, right, lcoords, rcoords, dtype, sources):
+    """
+    Get a block of joined rows.
+
+    The rows at `lcoords` in `left` are joined with the ones at
+    `rcoords` in `right` (where -1 means no row) into a record array
+    of `dtype` type.  The values of every field are taken from the
+    column of the table in `sources` (a sequence of ``(name, table)``
+    tuples).
+    """
+    block = numpy.empty(len(lcoords), dtype=dtype)
+    lrecords = left._readCoordinates(lcoords)
+    rvalid = rcoords >= 0
+    rrecords = right._readCoordinates(rcoords[rvalid])
+    for (name, table) in sources:
+        if name in dtype.names:
+            field = block[name]
+        else:
+            field = getNestedField(block, name)
+        if table is left:
+            field[:] = getNestedField(lrecords, name)
+        else:
+            field[rvalid] = getNestedField(rrecords, name)
+            field[~rvalid] = right.coldflts[name]
+    return block
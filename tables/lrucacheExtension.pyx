@@ -329,6 +329,11 @@ cdef class ObjectCache(BaseCache):
     self.seqn_ = 0
 
 
+  # Remove a slot (for Python calls)
+  def removeslot(self, long nslot):
+    self.removeslot_(nslot)
+
+
   # Remove a slot (if it exists in cache)
   cdef removeslot_(self, long nslot):
     cdef ObjectNode node
@@ -74,6 +74,24 @@ bytes)."""
 SORTEDLR_MAX_SLOTS = 1024
 """The maximum number of chunks for SORTEDLR cache."""
 
+QUERY_CACHE_FILE = None
+"""The name of a file where the results of table queries are kept
+across sessions.  Repeated queries on tables that have not been modified
+since are answered from this file, even after reopening the HDF5 file.
+Tables keep a version of their data in their ``QUERY_VERSION`` attribute
+for this, which is created the first time they are queried with this
+cache on a writable file, and updated when the table is flushed after
+a modification, along with a random identity in their
+``QUERY_TABLE_ID`` attribute, so that the results of a table are not
+used for another one in a file regenerated at the same path.  Queries on
+tables without these attributes in files opened read-only are not
+cached.  If `None`, the persistent query cache is disabled.  This file
+should not be shared by processes writing to it at the same time."""
+
+QUERY_CACHE_MAX_ELEMENTS = 1024*1024
+"""The maximum number of row coordinates kept in the persistent query
+cache for a query."""
+
 
 # Parameters for general cache behaviour
 # --------------------------------------
@@ -201,6 +219,41 @@ BUFFER_TIMES = 100
 ``PerformanceWarning``."""
 
 
+# Parameters for indexed queries
+# ------------------------------
+
+COORDS_MAX_RATIO = 0.01
+"""The maximum ratio between the number of candidate rows found in
+'full' indexes and the number of rows in a table for reading just those
+rows in indexed queries (instead of whole table chunks).  Only queries
+where all the usable indexes are 'full' ones can benefit from this.  A
+value of 0 disables reading exact row coordinates."""
+
+INDEX_MAX_CHUNK_RATIO = 0.5
+"""The maximum ratio of table chunks selected by the indexes for doing
+an indexed query.  If the indexes select more chunks than that, an
+in-kernel scan of the table is done instead, as it is cheaper than
+reading most of the chunks separately.  When possible, this is
+estimated from the number of candidate rows found in the indexes,
+before computing the chunks that they select.  A value of 1 means that
+indexes are always used."""
+
+INDEX_MAX_DELTA_RATIO = 0.01
+"""The maximum ratio between the number of modified rows kept in the
+delta of an index and the number of elements in the index.  Modified
+rows are taken as candidates in every indexed query, so when there are
+more of them, the index is rebuilt from the column data instead.  A
+value of 0 means that indexes are always rebuilt after modifying rows
+(when automatic indexing is on)."""
+
+ZONEMAP_BLOOM_BITS = 10
+"""The number of bits per row in the Bloom filters of zone maps (see
+``Column.createZoneMap()``).  More bits make Bloom filters select less
+chunks without the values looked up for equality, at the expense of
+more space.  With 10 bits per row, about 1% of those chunks are still
+selected."""
+
+
 # Miscellaneous
 # -------------
 
@@ -224,6 +277,39 @@ set to the number of cores in your machine. In general, it is a good
 idea to set this to the number of cores in your machine or, when your
 machine has many of them (e.g. > 4), perhaps one less than this."""
 
+QUERY_THREADS = 1
+"""The number of threads used by default for evaluating table queries
+in block-oriented methods (like ``Table.whereBlocks()``,
+``Table.readWhere()``, ``Table.getWhereList()`` or
+``Table.aggregateWhere()``).  With more than one thread, chunk-aligned
+I/O buffers are handed to a pool of that number of threads, so that
+reading (and decompressing) a buffer overlaps with the evaluation of
+the condition on others.  However, the HDF5 library and Numexpr are not
+re-entrant, so only one buffer is read and one is evaluated at a time:
+queries get at most about 2x faster (when reading and evaluating take
+about the same time), and queries bound by decompression do not scale
+with the number of cores.  Two or three threads are usually enough.  A
+value of 1 means that queries are evaluated sequentially."""
+
+INDEX_THREADS = 1
+"""The number of threads used by default for building column indexes
+(see ``Column.createIndex()``).  With more than one thread, up to that
+number of index slices are read and sorted concurrently, while the
+sorted ones are written to disk.  Calls to the HDF5 library are still
+serialized.  A value of 1 means that slices are sorted sequentially."""
+
+GROUPBY_MAX_SIZE = 64*_MB
+"""The maximum amount of memory (in bytes) used for keeping the groups
+of rows being aggregated by ``Table.groupby()`` when the key column does
+not have a CSI index.  Beyond that, groups are spilled to a temporary
+file and merged when the table has been completely scanned."""
+
+SORT_MAX_SIZE = 64*_MB
+"""The maximum amount of memory (in bytes) used for sorting the values
+of a column in operations like ``tables.join()``.  Larger columns are
+sorted in runs of that size, which are spilled to a temporary file and
+merged."""
+
 
 ## Local Variables:
 ## mode: python
@@ -0,0 +1,89 @@
+########################################################################
+#
+#       License: BSD
+#       Created: October 16, 2026
+#
+#       $Id$
+#
+########################################################################
+
+"""Persistent cache for the results of table queries.
+
+Classes:
+
+    QueryCache
+
+Misc variables:
+
+    __version__
+"""
+
+import shelve
+
+import numpy
+
+
+__version__ = "$Revision$"
+
+
+class QueryCache(object):
+    """
+    A cache of query results kept in a sidecar file.
+
+    The coordinates of the rows fulfilling a query are stored under a
+    key which identifies the table, the condition, the values of its
+    variables, the range of the query and the version of the table
+    data, so that results remain valid across sessions until the table
+    is modified.  The sidecar file is opened on demand and it should
+    not be written by several processes at the same time.
+
+    Public instance variables
+    -------------------------
+
+    filename
+        The name of the sidecar file.
+    maxelements
+        The maximum number of coordinates stored for a query.
+
+    Public methods
+    --------------
+
+    get(key)
+        Get the coordinates stored under `key`, or `None`.
+    put(key, coords)
+        Store the `coords` array under `key`.
+    close()
+        Close the sidecar file.
+    """
+
+    def __init__(self, filename, maxelements):
+        self.filename = filename
+        self.maxelements = maxelements
+        self._shelf = None
+
+    def _getShelf(self):
+        if self._shelf is None:
+            self._shelf = shelve.open(self.filename, 'c', protocol=2)
+        return self._shelf
+
+    def get(self, key):
+        """Get the coordinates stored under `key`, or `None`."""
+        coords = self._getShelf().get(repr(key))
+        if coords is None:
+            return None
+        return numpy.fromstring(coords, dtype='int64')
+
+    def put(self, key, coords):
+        """Store the `coords` array under `key`."""
+        if len(coords) > self.maxelements:
+            return
+        coords = numpy.asarray(coords, dtype='int64')
+        shelf = self._getShelf()
+        shelf[repr(key)] = coords.tostring()
+        shelf.sync()
+
+    def close(self):
+        """Close the sidecar file."""
+        if self._shelf is not None:
+            self._shelf.close()
+            self._shelf = None
@@ -17,6 +17,8 @@ Classes:
     Table
     Cols
     Column
+    QueryPlan
+    PreparedQuery
 
 Functions:
 
@@ -31,6 +33,9 @@ Misc variables:
 import sys
 import math
 import warnings
+import threading
+import Queue
+import uuid
 import os.path
 from time import time
 
@@ -40,14 +45,19 @@ import numexpr
 from tables import tableExtension
 from tables.utilsExtension import lrange
 from tables.lrucacheExtension import ObjectCache, NumCache
+from tables.bitmap import Bitmap
+from tables.groupby import Grouping, SpilledRuns
+from tables.extsort import iterSortedRows
 from tables.atom import Atom
-from tables.conditions import compile_condition
+from tables.conditions import (
+    compile_condition, call_on_recarr, expand_startswith)
 from numexpr.necompiler import (
     getType as numexpr_getType, double, is_cpu_amd_intel)
 from numexpr.expressions import functions as numexpr_functions
 from tables.flavor import flavor_of, array_as_internal, internal_to_flavor, \
         _numeric_deprecation, _numarray_deprecation
 from tables.utils import is_idx, lazyattr, SizeType, NailedDict as CacheDict
+from tables.idxutils import quantile_positions
 from tables.leaf import Leaf
 from tables.description import (
     IsDescription, Description, Col, descr_from_dtype)
@@ -58,7 +68,8 @@ from tables.utilsExtension import getNestedField
 from tables.path import joinPath, splitPath
 from tables.index import (
     OldIndex, defaultIndexFilters, defaultAutoIndex, Index, IndexesDescG,
-    IndexesTableG)
+    IndexesTableG, CompositeIndex, _compositeIndexNameOf, ZoneMap,
+    _zoneMapNameOf)
 
 profile = False
 #profile = True  # Uncomment for profiling
@@ -98,6 +109,19 @@ _nxTypeFromNPType = {
 # The NumPy scalar type corresponding to `SizeType`.
 _npSizeType = numpy.array(SizeType(0)).dtype.type
 
+# The aggregates supported by `Table.aggregateWhere()`.
+_aggregateFuncs = ('count', 'sum', 'min', 'max', 'mean')
+# The kinds of columns supported by every aggregate.
+_aggregateKinds = { 'sum': 'biufc', 'mean': 'biufc',
+                    'min': 'biuf', 'max': 'biuf', }
+
+# Neither the HDF5 library nor Numexpr are re-entrant, so these locks
+# serialize their calls during queries using several threads.  Both
+# release the GIL while working, so a thread can read (and decompress)
+# a buffer while another one evaluates a condition.
+_hdf5Lock = threading.Lock()
+_numexprLock = threading.Lock()
+
 def _indexNameOf(node):
     return '_i_%s' % node._v_name
 
@@ -165,7 +189,9 @@ _table__autoIndex = property(
     Setting this value states whether existing indexes should be
     automatically updated after an append operation or recomputed
     after an index-invalidating operation (i.e. removal and
-    modification of rows).  The default is true.
+    modification of rows).  Modified rows are just kept in a delta
+    of column indexes, which are only rebuilt when it grows too large
+    (see `Index.addDelta()`).  The default is true.
 
     This value gets into effect whenever a column is altered.  If you
     don't have automatic indexing activated and you want to do an an
@@ -190,46 +216,180 @@ def restorecache(self):
     self._dirtycache = False
 
 
-def _table__whereIndexed(self, compiled, condition, condvars,
-                         start, stop, step):
-    if profile: tref = time()
-    if profile: show_stats("Entering table_whereIndexed", tref)
-    self._useIndex = True
-    # Clean the table caches for indexed queries if needed
-    if self._dirtycache:
-        restorecache(self)
-
+def _table__getSeqKey(self, condition, condvars, start, stop, step):
+    """Get the key of a query in the sequence cache."""
     # Get the values in expression that are not columns
     values = []
     for key, value in condvars.iteritems():
         if isinstance(value, numpy.ndarray):
             values.append((key, value.item()))
-    # Build a key for the sequence cache
-    seqkey = (condition, tuple(values), (start, stop, step))
-    # Do a lookup in sequential cache for this query
+    return (condition, tuple(values), (start, stop, step))
+
+
+class _CoordsSet(object):
+    """Set of sorted row coordinates supporting ``&`` and ``|``."""
+
+    def __init__(self, coords):
+        self.coords = coords
+
+    def __and__(self, other):
+        return _CoordsSet(numpy.intersect1d(self.coords, other.coords))
+
+    def __or__(self, other):
+        return _CoordsSet(numpy.union1d(self.coords, other.coords))
+
+
+def _table__combineCoords(strexpr, cmvars):
+    """Combine the coordinates in `cmvars` following `strexpr`."""
+    if strexpr == 'e0':
+        return cmvars['e0']
+    coordsets = dict((name, _CoordsSet(coords))
+                     for (name, coords) in cmvars.iteritems())
+    return eval(strexpr, {}, coordsets).coords
+
+
+def _table__combineChunkmaps(strexpr, cmvars):
+    """Combine the chunk bitmaps in `cmvars` following `strexpr`."""
+    return eval(strexpr, {}, cmvars)
+
+
+def _sortOrder(keys, coords, reverse):
+    """Get the order of rows with the given sort `keys` and `coords`.
+
+    Rows are sorted by their keys and then by their coordinates, in
+    descending order if `reverse` is true.
+    """
+    order = numpy.lexsort((coords, keys))
+    if reverse:
+        order = order[::-1]
+    return order
+
+
+def _isInSorted(values, keys):
+    """Get a boolean array telling which `values` are in `keys`.
+
+    `keys` must be a non-empty, sorted array.
+    """
+    pos = keys.searchsorted(values)
+    pos[pos == len(keys)] = 0
+    return keys[pos] == values
+
+
+def _table__getCachedCoords(self, condition, condvars, start, stop, step):
+    """
+    Get the coordinates of the result of a query from the sequence cache.
+
+    The (sorted) coordinates of the rows in the ``start:stop:step``
+    range which fulfill the `condition` are returned as an int64 array,
+    or `None` if the result of the query is not in the cache.
+    """
+    # Clean the table caches for indexed queries if needed
+    if self._dirtycache:
+        restorecache(self)
+    seqkey = _table__getSeqKey(self, condition, condvars, start, stop, step)
     nslot = self._seqcache.getslot(seqkey)
-    if nslot >= 0:
-        # Get the row sequence from the cache
-        seq = self._seqcache.getitem(nslot)
+    if nslot < 0:
+        return None
+    seq = numpy.array(self._seqcache.getitem(nslot), dtype='int64')
+    # Correct the ranges in cached sequence
+    if (start, stop, step) != (0, self.nrows, 1):
+        seq = seq[(seq>=start)&(seq<stop)&((seq-start)%step==0)]
+    return seq
+
+
+def _table__whereIndexed(self, compiled, condition, condvars,
+                         start, stop, step):
+    """
+    Get the chunkmap for the indexed part of a compiled condition.
+
+    A `Bitmap` with the table chunks holding candidate rows is
+    returned.  When the query is selective enough and the usable
+    indexes are 'full' ones, the (sorted) coordinates of the candidate
+    rows are returned instead.  If the result is already known (it is
+    empty or it comes from the sequence cache), a row iterator is
+    returned.  Finally, if an in-kernel scan is estimated to be cheaper
+    than using the indexes, `None` is returned.
+    """
+    if profile: tref = time()
+    if profile: show_stats("Entering table_whereIndexed", tref)
+    self._useIndex = True
+    # Do a lookup in sequential cache for this query
+    seq = _table__getCachedCoords(
+        self, condition, condvars, start, stop, step)
+    if seq is not None:
         if len(seq) == 0:
             return iter([])
-        seq = numpy.array(seq, dtype='int64')
-        # Correct the ranges in cached sequence
-        if (start, stop, step) != (0, self.nrows, 1):
-            seq = seq[(seq>=start)&(seq<stop)&((seq-start)%step==0)]
         return self.itersequence(seq)
     else:
         # No luck.  Set row sequence to empty.  It will be populated
         # in the iterator. If not possible, the slot entry will be
         # removed there.
+        seqkey = _table__getSeqKey(
+            self, condition, condvars, start, stop, step)
+        self._nslotseq = self._seqcache.setitem(seqkey, [], 1)
+
+    if compiled.composite_expression is not None:
+        chunkmap = _table__whereComposite(
+            self, compiled, condvars, start, stop, step)
+        if chunkmap is not None or not compiled.index_expressions:
+            if profile: show_stats("Exiting table_whereIndexed", tref)
+            return chunkmap
+        # The composite index fell back to a scan, but the single
+        # column indexes may still pay off
+        self._useIndex = True
         self._nslotseq = self._seqcache.setitem(seqkey, [], 1)
 
-    # Compute the chunkmap for every index in indexed expression
-    idxexprs = compiled.index_expressions
     strexpr = compiled.string_expression
-    cmvars = {}
-    tcoords = 0
-    for i, idxexpr in enumerate(idxexprs):
+    indexes, ranges, ncoords = _table__searchIndexes(self, compiled, condvars)
+    tcoords = sum(ncoords)
+    if indexes[-1].reduction == 1 and tcoords == 0:
+        # No candidates found in any indexed expression component, so leave now
+        return iter([])
+
+    usecoords = _table__useCoords(self, indexes, tcoords)
+    if not usecoords and _table__scanIsCheaper(self, strexpr, indexes, ncoords):
+        # Most of the table would be read anyway
+        return _table__fallbackToScan(self)
+
+    # Compute the chunkmap (or coordinates) for every indexed expression
+    cmvars = _table__getChunkmaps(self, indexes, ranges, ncoords, usecoords)
+
+    if usecoords:
+        # Exact coordinates are not kept in the sequence cache
+        if self._nslotseq >= 0:
+            self._seqcache.removeslot(self._nslotseq)
+        coords = _table__combineCoords(strexpr, cmvars)
+        if (start, stop, step) != (0, self.nrows, 1):
+            coords = coords[(coords>=start) & (coords<stop) &
+                            ((coords-start)%step == 0)]
+        if len(coords) == 0:
+            return iter([])
+        if profile: show_stats("Exiting table_whereIndexed", tref)
+        return coords
+
+    # Compute the final chunkmap
+    chunkmap = _table__combineChunkmaps(strexpr, cmvars)
+    if not chunkmap.any():
+        # The chunkmap is empty
+        return iter([])
+    if _table__scanIsCheaper(self, strexpr, indexes, ncoords, chunkmap):
+        # Most of the table chunks would be read anyway
+        return _table__fallbackToScan(self)
+
+    if profile: show_stats("Exiting table_whereIndexed", tref)
+    return chunkmap
+
+
+def _table__searchIndexes(self, compiled, condvars):
+    """
+    Search the indexes used in the index expressions of `compiled`.
+
+    A tuple with the list of indexes, the list of their lookup ranges
+    and the list of candidate rows found for every index expression is
+    returned.
+    """
+    indexes, ranges, ncoords = [], [], []
+    for idxexpr in compiled.index_expressions:
         var, ops, lims = idxexpr
         col = condvars[var]
         index = col.index
@@ -238,32 +398,206 @@ def _table__whereIndexed(self, compiled, condition, condvars,
 
         # Get the number of rows that the indexed condition yields.
         range_ = index.getLookupRange(ops, lims)
+        ncoords.append(index.search(range_))
+        indexes.append(index)
+        ranges.append(range_)
+    return (indexes, ranges, ncoords)
+
+
+def _table__searchComposite(self, compiled, condvars):
+    """
+    Search the composite index used in the composite expression of
+    `compiled`.
+
+    A tuple with the index, its lookup range (`None` if empty) and the
+    number of candidate rows found in it is returned.  The rows appended
+    after building the index are also candidates.
+    """
+    columns, exprs = compiled.composite_expression
+    index = self._getCompositeIndex(columns)
+    assert index is not None, "the chosen columns have no composite index"
+    assert not index.dirty, "the chosen columns have a dirty composite index"
+    range_ = index.getLookupRange([(ops, lims) for (var, ops, lims) in exprs])
+    ncoords = 0
+    if range_ is not None:
         ncoords = index.search(range_)
-        tcoords += ncoords
-        if index.reduction == 1 and ncoords == 0:
+    return (index, range_, ncoords + self.nrows - index.nelements)
+
+
+def _table__getCompositeCoords(self, index, range_, start, stop, step):
+    """Get the coordinates of the candidate rows found in `index`."""
+    if range_ is not None:
+        coords = index.get_coords()
+    else:
+        coords = numpy.empty(0, dtype='int64')
+    if index.nelements < self.nrows:
+        coords = numpy.concatenate(
+            [coords, numpy.arange(index.nelements, self.nrows, dtype='int64')])
+    if (start, stop, step) != (0, self.nrows, 1):
+        coords = coords[(coords>=start) & (coords<stop) &
+                        ((coords-start)%step == 0)]
+    return coords
+
+
+def _table__whereComposite(self, compiled, condvars, start, stop, step):
+    """
+    Get the candidate rows of a compiled condition from a composite index.
+
+    The (sorted) coordinates of the candidate rows are returned if they
+    are few enough (see the ``COORDS_MAX_RATIO`` parameter).  Otherwise,
+    a `Bitmap` with the table chunks holding them is returned.  If the
+    result is empty, an empty iterator is returned.  Finally, if an
+    in-kernel scan is estimated to be cheaper, `None` is returned.
+    """
+    params = self._v_file.params
+    index, range_, ncoords = _table__searchComposite(
+        self, compiled, condvars)
+    if ncoords == 0:
+        return iter([])
+    if ncoords > params['INDEX_MAX_CHUNK_RATIO'] * self.nrows:
+        return _table__fallbackToScan(self)
+    coords = _table__getCompositeCoords(
+        self, index, range_, start, stop, step)
+    if len(coords) == 0:
+        return iter([])
+    if len(coords) <= params['COORDS_MAX_RATIO'] * self.nrows:
+        # Exact coordinates are not kept in the sequence cache
+        if self._nslotseq >= 0:
+            self._seqcache.removeslot(self._nslotseq)
+        return coords
+    nrowsinchunk = self.chunkshape[0]
+    nchunks = long(math.ceil(float(self.nrows)/nrowsinchunk))
+    chunkmap = Bitmap.frompositions(
+        nchunks, numpy.unique(coords // nrowsinchunk))
+    if _table__scanIsCheaper(self, None, None, None, chunkmap):
+        return _table__fallbackToScan(self)
+    return chunkmap
+
+
+def _table__whereZoneMaps(self, compiled, condvars):
+    """
+    Get the chunkmap for the zone map expressions of a compiled condition.
+
+    A `Bitmap` with the table chunks which may hold rows fulfilling the
+    zone map expressions is returned (see `Column.createZoneMap()`).
+    The chunks with rows not summarized yet are always selected.  If no
+    chunk is selected, an empty iterator is returned.  Finally, if an
+    in-kernel scan is estimated to be cheaper, `None` is returned.
+    """
+    exprs, strexpr = compiled.zonemap_expression
+    nrowsinchunk = self.chunkshape[0]
+    nchunks = long(math.ceil(float(self.nrows)/nrowsinchunk))
+    cmvars = {}
+    for (i, (var, ops, lims)) in enumerate(exprs):
+        zonemap = condvars[var].zonemap
+        assert zonemap is not None, "the chosen column has no zone map"
+        selected = numpy.ones(nchunks, dtype=numpy.bool_)
+        found = zonemap.search(ops, lims)[:nchunks]
+        selected[:len(found)] = found
+        cmvars['e%d' % i] = Bitmap.fromdense(selected)
+    chunkmap = _table__combineChunkmaps(strexpr, cmvars)
+    if not chunkmap.any():
+        return iter([])
+    if _table__scanIsCheaper(self, None, None, None, chunkmap):
+        return None
+    # Chunks are read through the table caches for indexed queries,
+    # but results are not kept in the sequence cache
+    self._useIndex = True
+    if self._dirtycache:
+        restorecache(self)
+    self._nslotseq = -1
+    return chunkmap
+
+
+def _table__useCoords(self, indexes, tcoords):
+    """
+    Should exact coordinates be read from `indexes`?
+
+    Selective queries on 'full' indexes can read just the candidate
+    rows instead of whole chunks.
+    """
+    maxratio = self._v_file.params['COORDS_MAX_RATIO']
+    if tcoords > maxratio * self.nrows:
+        return False
+    for index in indexes:
+        if index.indsize != 8 or index.nelements != self.nrows:
+            return False
+    return True
+
+
+def _table__scanIsCheaper(self, strexpr, indexes, ncoords, chunkmap=None):
+    """
+    Would an in-kernel scan be cheaper than an indexed query?
+
+    If the final `chunkmap` is given, its ratio of selected chunks is
+    compared against the ``INDEX_MAX_CHUNK_RATIO`` parameter.  Else,
+    the candidate rows of a lookup on a single non-lossy index are used,
+    as the ratio of selected chunks can not be lower than that.
+    """
+    maxratio = self._v_file.params['INDEX_MAX_CHUNK_RATIO']
+    if chunkmap is not None:
+        return chunkmap.count() > maxratio * chunkmap.size
+    return (strexpr == 'e0' and indexes[0].reduction == 1
+            and ncoords[0] > maxratio * self.nrows)
+
+
+def _table__fallbackToScan(self):
+    """Prepare an indexed query for doing an in-kernel scan instead."""
+    self._useIndex = False
+    # An in-kernel scan does not populate the sequence cache
+    if self._nslotseq >= 0:
+        self._seqcache.removeslot(self._nslotseq)
+    return None
+
+
+def _table__getChunkmaps(self, indexes, ranges, ncoords, usecoords):
+    """
+    Get the chunkmap of every searched index expression.
+
+    The chunkmaps are returned in a dictionary keyed by the variable
+    names in the string expression of the condition.  If `usecoords`
+    is true, the sorted coordinates of candidate rows are got instead.
+    """
+    # Remember the expression used in the last search of every index
+    lastexpr = dict((id(index), i) for (i, index) in enumerate(indexes))
+    cmvars = {}
+    for i, index in enumerate(indexes):
+        if lastexpr[id(index)] != i:
+            # The index has been searched for another expression later on
+            index.search(ranges[i])
+            lastexpr[id(index)] = i
+        if usecoords:
+            chunkmap = index.get_coords()
+        elif index.reduction == 1 and ncoords[i] == 0:
             # No values from index condition, thus the chunkmap should be empty
             nrowsinchunk = self.chunkshape[0]
             nchunks = long(math.ceil(float(self.nrows)/nrowsinchunk))
-            chunkmap = numpy.zeros(shape=nchunks, dtype="bool")
+            chunkmap = Bitmap(nchunks)
         else:
             # Get the chunkmap from the index
-            chunkmap = index.get_chunkmap()
+            chunkmap = index.get_chunkbitmap()
         # Assign the chunkmap to the cmvars dictionary
         cmvars["e%d"%i] = chunkmap
+    return cmvars
 
-    if index.reduction == 1 and tcoords == 0:
-        # No candidates found in any indexed expression component, so leave now
-        return iter([])
-
-    # Compute the final chunkmap
-    chunkmap = numexpr.evaluate(strexpr, cmvars)
-    # Method .any() is twice as faster than method .sum()
-    if not chunkmap.any():
-        # The chunkmap is empty
-        return iter([])
 
-    if profile: show_stats("Exiting table_whereIndexed", tref)
-    return chunkmap
+def _table__indexPaysOff(self, compiled, condvars):
+    """Would an indexed query on `compiled` be cheaper than a scan?"""
+    if compiled.composite_expression is not None:
+        index, range_, ncoords = _table__searchComposite(
+            self, compiled, condvars)
+        maxratio = self._v_file.params['INDEX_MAX_CHUNK_RATIO']
+        return ncoords <= maxratio * self.nrows
+    strexpr = compiled.string_expression
+    indexes, ranges, ncoords = _table__searchIndexes(self, compiled, condvars)
+    tcoords = sum(ncoords)
+    if _table__useCoords(self, indexes, tcoords):
+        return True
+    if _table__scanIsCheaper(self, strexpr, indexes, ncoords):
+        return False
+    cmvars = _table__getChunkmaps(self, indexes, ranges, ncoords, False)
+    chunkmap = _table__combineChunkmaps(strexpr, cmvars)
+    return not _table__scanIsCheaper(self, strexpr, indexes, ncoords, chunkmap)
 
 
 def createIndexesTable(table):
@@ -282,7 +616,7 @@ def createIndexesDescr(igroup, dname, iname, filters):
 
 
 def _column__createIndex(self, optlevel, kind, filters, tmp_dir,
-                         blocksizes, verbose):
+                         blocksizes, verbose, nthreads=1, memory_budget=None):
     name = self.name
     table = self.table
     tableName = table._v_name
@@ -348,16 +682,23 @@ def _column__createIndex(self, optlevel, kind, filters, tmp_dir,
         tmp_dir=tmp_dir,
         expectedrows=expectedrows,
         byteorder=table.byteorder,
-        blocksizes=blocksizes)
+        blocksizes=blocksizes,
+        memory_budget=memory_budget)
 
     table._setColumnIndexing(self.pathname, True)
 
+    # Do not sort more slices at once than fit in the memory budget
+    if memory_budget is not None and nthreads > 1:
+        slicebytes = index.slicesize * (dtype.itemsize + index.indsize)
+        nthreads = int(max(1, min(nthreads, memory_budget // slicebytes)))
+
     # Feed the index with values
     slicesize = index.slicesize
     # Add rows to the index if necessary
     if table.nrows > 0:
         indexedrows = table._addRowsToIndex(
-            self.pathname, 0, table.nrows, lastrow=True, update=False )
+            self.pathname, 0, table.nrows, lastrow=True, update=False,
+            nthreads=nthreads )
     else:
         indexedrows = 0
     index.dirty = False
@@ -384,6 +725,214 @@ class _ColIndexes(dict):
         return '{\n  %s}' % (',\n  '.join(rep))
 
 
+class QueryPlan(object):
+    """
+    The plan (and execution statistics) of a table query.
+
+    Instances of this class are returned by `Table.explain()`.  Their
+    string representation is a human readable report of the query.
+
+    Public instance variables
+    -------------------------
+
+    condition
+        The condition of the query.  This is also the (residual)
+        expression evaluated by Numexpr over the rows that are read.
+    string_expression
+        The expression combining the results of index expressions (as
+        ``e0``, ``e1``... variables), or `None` if no index is usable.
+    index_expressions
+        A list with a dictionary for every index expression, with the
+        ``column`` path name, the index ``kind``, the ``operators`` and
+        ``limits`` of the lookup, the number of ``candidates`` found by
+        the index search, the number of rows in the lookup range
+        ``estimated`` from the bounds of the index chunks (see
+        `Index.estimate_rows()`) and whether the lookup limits were
+        found in the limits cache (``limboundscache_hit``).  A lookup in
+        a composite index is shown as a single expression of
+        ``'composite'`` kind, with the path names of the columns used,
+        and the operators and limits for every column (and no
+        ``estimated`` rows).
+    method
+        How rows are got: ``'in-kernel'`` (scanning the table),
+        ``'indexed'`` (reading the table chunks selected by indexes),
+        ``'coords'`` (reading the exact candidate rows from 'full'
+        indexes), ``'zonemap'`` (reading the table chunks selected by
+        zone maps) or ``'cached'`` (rows come from the sequence cache).
+    seqcache_hit
+        Whether the query result was found in the sequence cache.
+    nchunks
+        The number of chunks in the table.
+    nchunks_selected
+        The number of table chunks with rows to be read.
+    nrows_read
+        The number of table rows to be read.
+    bytes_read
+        The (estimated) size of the rows to be read.
+    bytes_decompressed
+        The (estimated) size of the chunks to be decompressed, or 0 if
+        the table is not compressed.
+    nhits
+        The number of rows fulfilling the condition, or `None` if the
+        query was not run.
+    times
+        A dictionary with the wall time (in seconds) spent in the
+        ``'compile'``, ``'search'``, ``'chunkmap'`` and ``'read'``
+        phases of the query.  Only the phases actually done are present.
+    """
+
+    def __init__(self, condition, string_expression):
+        self.condition = condition
+        self.string_expression = string_expression
+        self.index_expressions = []
+        self.method = 'in-kernel'
+        self.seqcache_hit = False
+        self.nchunks = 0
+        self.nchunks_selected = 0
+        self.nrows_read = 0
+        self.bytes_read = 0
+        self.bytes_decompressed = 0
+        self.nhits = None
+        self.times = {}
+
+    def __str__(self):
+        lines = ["Query plan for condition ``%s``" % self.condition,
+                 "  method: %s" % self.method]
+        if self.string_expression is not None:
+            lines.append("  index expression: %s" % self.string_expression)
+        for i, idxexpr in enumerate(self.index_expressions):
+            estimated = ""
+            if idxexpr['estimated'] is not None:
+                estimated = ", ~%d estimated" % idxexpr['estimated']
+            lines.append(
+                "    e%d: %s %s %s (%s index, %d candidates%s%s)"
+                % (i, idxexpr['column'], idxexpr['operators'],
+                   idxexpr['limits'], idxexpr['kind'],
+                   idxexpr['candidates'], estimated,
+                   idxexpr['limboundscache_hit'] and ", cached" or ""))
+        lines.append("  sequence cache hit: %s" % self.seqcache_hit)
+        lines.append("  chunks selected: %d of %d"
+                     % (self.nchunks_selected, self.nchunks))
+        lines.append("  rows read: %d (%d bytes, %d bytes decompressed)"
+                     % (self.nrows_read, self.bytes_read,
+                        self.bytes_decompressed))
+        if self.nhits is not None:
+            lines.append("  hits: %d" % self.nhits)
+        for phase in ['compile', 'search', 'chunkmap', 'read']:
+            if phase in self.times:
+                lines.append("  %s time: %.6f s" % (phase, self.times[phase]))
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return str(self)
+
+
+class PreparedQuery(object):
+    """
+    A table query whose condition is compiled once for many uses.
+
+    Instances of this class are returned by `Table.prepare()`.  The
+    condition is compiled the first time that the query is run with
+    parameters of some given types, and it is reused as long as the
+    parameters keep their types, so that only their values need to be
+    replaced in the compiled condition.
+
+    Public instance variables
+    -------------------------
+
+    condition
+        The condition of the query.
+    params
+        A tuple with the names of the parameters in the condition.
+    table
+        The `Table` instance to be queried.
+
+    Public methods
+    --------------
+
+    read([field][, start][, stop][, step][, **params])
+        Read table data fulfilling the condition.
+    where([start][, stop][, step][, **params])
+        Iterate over values fulfilling the condition.
+    """
+
+    def __init__(self, table, condition, params, condvars):
+        self.table = table
+        self.condition = condition
+        self.params = params
+        self._condvars = condvars
+        """The variables of the condition which are not parameters."""
+        self._condkeys = {}
+        """Maps the types of parameters to condition cache keys."""
+
+    def __repr__(self):
+        return "PreparedQuery(%r, params=%r)" % (self.condition, self.params)
+
+    def _compile(self, params):
+        """
+        Get the compiled condition and its variables for `params`.
+
+        The condition cache of the table is used, so that compiled
+        conditions are discarded when the usable indexes change.
+        """
+        unknown = [ name for name in params if name not in self.params ]
+        if unknown:
+            raise TypeError( "unexpected parameters in query: %s"
+                             % ", ".join(unknown) )
+        condvars = self._condvars.copy()
+        types = []
+        for name in self.params:
+            if name not in params:
+                raise TypeError( "missing value for parameter ``%s``"
+                                 % name )
+            val = numpy.asarray(params[name])
+            condvars[name] = val
+            types.append(val.dtype.str)
+        types = tuple(types)
+
+        table = self.table
+        condkey = self._condkeys.get(types)
+        compiled = None
+        if condkey is not None:
+            compiled = table._conditionCache.get(condkey)
+        if not compiled:
+            # New parameter types or evicted from the condition cache
+            condkey = table._getConditionKey(self.condition, condvars)
+            compiled = table._compileConditionKey(condkey, condvars)
+            self._condkeys[types] = condkey
+        return (compiled.with_replaced_vars(condvars), condvars)
+
+    def where(self, start=None, stop=None, step=None, **params):
+        """
+        Iterate over values fulfilling the condition.
+
+        The values of the parameters of the query are given as keyword
+        arguments.  The meaning of `start`, `stop` and `step` is the
+        same as in `Table.where()`.
+        """
+        compiled, condvars = self._compile(params)
+        return self.table._where( self.condition, condvars,
+                                  start, stop, step, compiled )
+
+    def read( self, field=None, start=None, stop=None, step=None,
+              sortby=None, limit=None, reverse=False, **params ):
+        """
+        Read table data fulfilling the condition.
+
+        The values of the parameters of the query are given as keyword
+        arguments.  The meaning of `field`, `start`, `stop`, `step`,
+        `sortby`, `limit` and `reverse` is the same as in
+        `Table.readWhere()`.
+        """
+        table = self.table
+        table._checkFieldIfNumeric(field)
+        compiled, condvars = self._compile(params)
+        (start, stop, step) = table._processRangeRead(start, stop, step)
+        return table._readWhere( compiled, self.condition, condvars, field,
+                                 start, stop, step, 1,
+                                 sortby, limit, reverse )
+
+
 class Table(tableExtension.Table, Leaf):
     """
     This class represents heterogeneous datasets in an HDF5 file.
@@ -479,6 +1028,9 @@ class Table(tableExtension.Table, Leaf):
         non-nested (`Column`) and nested (`Cols`) columns.
     coltypes
         Maps the name of a column to its PyTables data type.
+    compositeindexes
+        A dictionary with the composite indexes of the table, keyed by
+        tuples with the path names of the indexed columns.
     description
         A `Description` instance reflecting the structure of the table.
     extdim
@@ -493,6 +1045,9 @@ class Table(tableExtension.Table, Leaf):
         The associated `Row` instance.
     rowsize
         The size in bytes of each row in the table.
+    zonemaps
+        A dictionary with the zone maps of the table, keyed by the path
+        names of the summarized columns (see `Column.createZoneMap()`).
 
     Public methods -- reading
     -------------------------
@@ -520,19 +1075,28 @@ class Table(tableExtension.Table, Leaf):
     Public methods -- querying
     --------------------------
 
-    * getWhereList(condition[, condvars][, sort][, start][, stop][, step])
-    * readWhere(condition[, condvars][, field][, start][, stop][, step])
+    * aggregateWhere(condition, aggregates[, condvars][, start][, stop][, step][, nthreads])
+    * groupby(key, aggregates[, start][, stop][, step])
+    * getWhereList(condition[, condvars][, sort][, start][, stop][, step][, nthreads])
+    * readWhere(condition[, condvars][, field][, start][, stop][, step][, nthreads][, sortby][, limit][, reverse])
     * where(condition[, condvars][, start][, stop][, step])
+    * whereBlocks(condition[, condvars][, start][, stop][, step][, nthreads])
     * whereAppend(dstTable, condition[, condvars][, start][, stop][, step])
-    * willQueryUseIndexing(condition[, condvars])
+    * willQueryUseIndexing(condition[, condvars][, estimate])
+    * explain(condition[, condvars][, start][, stop][, step][, analyze])
+    * prepare(condition[, params][, condvars])
+    * whereIn(colname, values[, start][, stop][, step])
 
     Public methods -- other
     -----------------------
 
+    * createCompositeIndex(columns[, filters][, tmp_dir])
     * flushRowsToIndex()
     * getEnum(colname)
-    * reIndex()
+    * reIndex([memory_budget])
     * reIndexDirty()
+    * removeCompositeIndex(columns)
+    * sort(sortby[, newparent][, newname][, overwrite][, createparents][, reverse][, tmp_dir])
     """
 
     # Class identifier.
@@ -618,6 +1182,46 @@ class Table(tableExtension.Table, Leaf):
         A dictionary with the indexes of the indexed columns.
         """ )
 
+    def _getcompositeindexes(self):
+        try:
+            itgroup = self._v_file._getNode(_indexPathnameOf(self))
+        except NoSuchNodeError:
+            return {}
+        indexes = {}
+        for name in itgroup._v_hidden.keys():
+            index = itgroup._f_getChild(name)
+            if isinstance(index, CompositeIndex):
+                indexes[index.columns] = index
+        return indexes
+
+    compositeindexes = property(
+        _getcompositeindexes, None, None,
+        """
+        A dictionary with the composite indexes of the table.
+
+        Keys are tuples with the path names of the indexed columns.
+        """ )
+
+    def _getzonemaps(self):
+        try:
+            itgroup = self._v_file._getNode(_indexPathnameOf(self))
+        except NoSuchNodeError:
+            return {}
+        zonemaps = {}
+        for name in itgroup._v_hidden.keys():
+            zonemap = itgroup._f_getChild(name)
+            if isinstance(zonemap, ZoneMap):
+                zonemaps[zonemap.column] = zonemap
+        return zonemaps
+
+    zonemaps = property(
+        _getzonemaps, None, None,
+        """
+        A dictionary with the zone maps of the table.
+
+        Keys are the path names of the summarized columns.
+        """ )
+
     _dirtyindexes = property(
         lambda self: self._conditionCache._nailcount > 0,
         None, None,
@@ -761,6 +1365,10 @@ class Table(tableExtension.Table, Leaf):
         """
         self._dirtycache = True
         """Whether the data caches are dirty or not. Initially set to yes."""
+        self._queryversion = None
+        """The version of table data for the persistent query cache."""
+        self._queryversiondirty = False
+        """Whether table data has been modified since its last version."""
         self._descflavor = None
         """Temporarily keeps the flavor of a description with data."""
 
@@ -886,6 +1494,12 @@ class Table(tableExtension.Table, Leaf):
             if indexed:
                 self.indexed = True
 
+        if igroup:
+            # Tell the condition cache about dirty composite indexes.
+            for index in self.compositeindexes.itervalues():
+                if index.dirty:
+                    self._conditionCache.nail()
+
         if oldindexes:  # this should only appear under 2.x Pro
             warnings.warn(
                 "table ``%s`` has column indexes with PyTables 1.x format. "
@@ -1166,7 +1780,7 @@ class Table(tableExtension.Table, Leaf):
                 # Remove 10 (arbitrary) elements from the cache
                 for k in exprvarsCache.keys()[:10]:
                     del exprvarsCache[k]
-            cexpr = compile(expression, '<string>', 'eval')
+            cexpr = compile(expand_startswith(expression), '<string>', 'eval')
             exprvars = [ var for var in cexpr.co_names
                          if var not in ['None', 'False', 'True']
                          and var not in numexpr_functions ]
@@ -1277,13 +1891,25 @@ class Table(tableExtension.Table, Leaf):
 
         This method makes use of the condition cache when possible.
         """
+        condkey = self._getConditionKey(condition, condvars)
+        compiled = self._compileConditionKey(condkey, condvars)
+        return compiled.with_replaced_vars(condvars)
+
+
+    def _compileConditionKey(self, condkey, condvars):
+        """
+        Compile the condition with the `condkey` condition cache key.
+
+        The compiled condition is returned with no replacement of its
+        index limit variables.  This method makes use of the condition
+        cache when possible.
+        """
 
         # Look up the condition in the condition cache.
         condcache = self._conditionCache
-        condkey = self._getConditionKey(condition, condvars)
         compiled = condcache.get(condkey)
         if compiled:
-            return compiled.with_replaced_vars(condvars)  # bingo!
+            return compiled  # bingo!
 
         # Bad luck, the condition must be parsed and compiled.
         # Fortunately, the key provides some valuable information. ;)
@@ -1312,8 +1938,35 @@ class Table(tableExtension.Table, Leaf):
             if not is_cpu_amd_intel and col.pathname in self._colunaligned:
                 copycols.append(colname)
         indexedcols = frozenset(indexedcols)
+
+        # Get the leading columns of usable composite indexes.
+        compositecols = {}
+        if self._enabledIndexingInQueries:
+            colvars = dict( (condvars[colname].pathname, colname)
+                            for colname in colnames )
+            for (columns, index) in self.compositeindexes.iteritems():
+                if index.dirty:
+                    continue
+                varnames = []
+                for column in columns:
+                    if column not in colvars:
+                        break
+                    varnames.append(colvars[column])
+                if varnames:
+                    compositecols[columns] = tuple(varnames)
+
+        # Get the set of columns with zone maps.
+        zonemapcols = []
+        if self._enabledIndexingInQueries:
+            zonemaps = self.zonemaps
+            zonemapcols = [ colname for colname in colnames
+                            if condvars[colname].pathname in zonemaps ]
+        zonemapcols = frozenset(zonemapcols)
+
         # Now let ``compile_condition()`` do the Numexpr-related job.
-        compiled = compile_condition(condition, typemap, indexedcols, copycols)
+        compiled = compile_condition(
+            condition, typemap, indexedcols, copycols, compositecols,
+            zonemapcols)
 
         # Check that there actually are columns in the condition.
         if not set(compiled.parameters).intersection(set(colnames)):
@@ -1322,10 +1975,10 @@ class Table(tableExtension.Table, Leaf):
 
         # Store the compiled condition in the cache and return it.
         condcache[condkey] = compiled
-        return compiled.with_replaced_vars(condvars)
+        return compiled
 
 
-    def willQueryUseIndexing(self, condition, condvars=None):
+    def willQueryUseIndexing(self, condition, condvars=None, estimate=False):
         """
         Will a query for the `condition` use indexing?
 
@@ -1333,7 +1986,15 @@ class Table(tableExtension.Table, Leaf):
         same as in the `Table.where()` method.  If `condition` can use
         indexing, this method returns a frozenset with the path names of
         the columns whose index is usable.  Otherwise, it returns an
-        empty list.
+        empty list.  When a composite index is usable (see
+        `Table.createCompositeIndex()`), the path names of the columns
+        in its usable prefix are returned instead.
+
+        If `estimate` is true, the usable indexes are also searched in
+        order to estimate whether using them is cheaper than an
+        in-kernel scan of the whole table (see the
+        ``INDEX_MAX_CHUNK_RATIO`` parameter).  If it is not, an empty
+        frozenset is returned, as queries will not use indexing either.
 
         This method is mainly intended for testing.  Keep in mind that
         changing the set of indexed columns or their dirtyness may make
@@ -1345,10 +2006,222 @@ class Table(tableExtension.Table, Leaf):
         condvars = self._requiredExprVars(condition, condvars, depth=2)
         compiled = self._compileCondition(condition, condvars)
         # Return the columns in indexed expressions
-        idxcols = [condvars[var].pathname for var in compiled.index_variables]
+        if compiled.composite_expression is not None:
+            idxvars = [var for (var, ops, lims)
+                       in compiled.composite_expression[1]]
+        else:
+            idxvars = compiled.index_variables
+        idxcols = [condvars[var].pathname for var in idxvars]
+        if (estimate and idxcols and
+            not _table__indexPaysOff(self, compiled, condvars)):
+            return frozenset()
         return frozenset(idxcols)
 
 
+    def explain( self, condition, condvars=None,
+                 start=None, stop=None, step=None, analyze=True ):
+        """
+        Explain how a query for the `condition` is done.
+
+        The meaning of the `condition`, `condvars`, `start`, `stop` and
+        `step` arguments is the same as in the `Table.where()` method.
+        A `QueryPlan` instance is returned describing the index
+        expressions and the residual condition of the query, the
+        candidates found in every index, the table chunks to be read
+        and whether caches are hit.  If `analyze` is true, the query is
+        also run and the number of hits is reported.
+
+        The number of bytes read and decompressed are estimated from the
+        rows and chunks to be read.  Keep in mind that the query plan
+        may change as table caches are populated.
+        """
+        tref = time()
+        condvars = self._requiredExprVars(condition, condvars, depth=2)
+        compiled = self._compileCondition(condition, condvars)
+        (start, stop, step) = self._processRangeRead(start, stop, step)
+        plan = QueryPlan(condition, compiled.string_expression or None)
+        rowsize = self.rowsize
+        nrowsinchunk = self.chunkshape[0]
+        plan.nchunks = long(math.ceil(float(self.nrows) / nrowsinchunk))
+        plan.times['compile'] = time() - tref
+
+        # Rows in range, as read by an in-kernel query
+        nrows = len(xrange(start, stop, step))
+        chunks = None
+        if compiled.composite_expression is not None:
+            (nrows, chunks) = self._explainComposite(
+                plan, compiled, condition, condvars, start, stop, step, nrows)
+        if plan.method == 'in-kernel' and compiled.index_expressions:
+            del plan.index_expressions[:]
+            tref = time()
+            seqkey = _table__getSeqKey(
+                self, condition, condvars, start, stop, step)
+            plan.seqcache_hit = (not self._dirtycache and
+                                 self._seqcache.getslot(seqkey) >= 0)
+            limhits = []
+            for (var, ops, lims) in compiled.index_expressions:
+                index = condvars[var].index
+                range_ = index.getLookupRange(ops, lims)
+                limhits.append(index.limboundscache.getslot(range_) >= 0)
+            indexes, ranges, ncoords = _table__searchIndexes(
+                self, compiled, condvars)
+            for i, (var, ops, lims) in enumerate(compiled.index_expressions):
+                plan.index_expressions.append({
+                    'column': condvars[var].pathname,
+                    'kind': indexes[i].kind,
+                    'operators': ops, 'limits': lims,
+                    'candidates': ncoords[i],
+                    'estimated': indexes[i].estimate_rows(ranges[i]),
+                    'limboundscache_hit': limhits[i], })
+            plan.times['search'] = time() - tref
+
+            tref = time()
+            strexpr = compiled.string_expression
+            tcoords = sum(ncoords)
+            if plan.seqcache_hit:
+                plan.method = 'cached'
+            elif indexes[-1].reduction == 1 and tcoords == 0:
+                plan.method, nrows, chunks = 'indexed', 0, 0
+            elif _table__useCoords(self, indexes, tcoords):
+                cmvars = _table__getChunkmaps(
+                    self, indexes, ranges, ncoords, True)
+                coords = _table__combineCoords(strexpr, cmvars)
+                coords = coords[(coords>=start) & (coords<stop) &
+                                ((coords-start)%step == 0)]
+                plan.method, nrows = 'coords', len(coords)
+                chunks = len(numpy.unique(coords // nrowsinchunk))
+            elif not _table__scanIsCheaper(self, strexpr, indexes, ncoords):
+                cmvars = _table__getChunkmaps(
+                    self, indexes, ranges, ncoords, False)
+                chunkmap = _table__combineChunkmaps(strexpr, cmvars)
+                if not _table__scanIsCheaper(
+                    self, strexpr, indexes, ncoords, chunkmap):
+                    plan.method, chunks = 'indexed', chunkmap.count()
+                    nrows = min(nrows, chunks * nrowsinchunk)
+            plan.times['chunkmap'] = time() - tref
+
+        if ( plan.method == 'in-kernel'
+             and compiled.zonemap_expression is not None ):
+            tref = time()
+            chunkmap = _table__whereZoneMaps(self, compiled, condvars)
+            self._useIndex = False
+            if isinstance(chunkmap, Bitmap):
+                plan.method, chunks = 'zonemap', chunkmap.count()
+                nrows = min(nrows, chunks * nrowsinchunk)
+            elif chunkmap is not None:
+                plan.method, nrows, chunks = 'zonemap', 0, 0
+            plan.times['chunkmap'] = time() - tref
+
+        if plan.method == 'in-kernel':
+            chunks = plan.nchunks
+        if chunks is not None:
+            plan.nchunks_selected = chunks
+            plan.nrows_read = nrows
+            plan.bytes_read = nrows * rowsize
+            if self.filters.complevel > 0:
+                plan.bytes_decompressed = chunks * nrowsinchunk * rowsize
+
+        if analyze:
+            tref = time()
+            plan.nhits = 0
+            for (records, coords) in self._whereBlocks(
+                compiled, condition, condvars, start, stop, step):
+                plan.nhits += len(coords)
+            plan.times['read'] = time() - tref
+            if plan.method == 'cached':
+                plan.nrows_read = plan.nhits
+                plan.bytes_read = plan.nhits * rowsize
+        return plan
+
+
+    def _explainComposite( self, plan, compiled, condition, condvars,
+                           start, stop, step, nrows ):
+        """
+        Fill in the query `plan` for a lookup in a composite index.
+
+        The (possibly reduced) number of rows to be read and the number
+        of chunks to be read (`None` if all of them) are returned.
+        """
+        tref = time()
+        params = self._v_file.params
+        nrowsinchunk = self.chunkshape[0]
+        columns, exprs = compiled.composite_expression
+        seqkey = _table__getSeqKey(
+            self, condition, condvars, start, stop, step)
+        plan.seqcache_hit = (not self._dirtycache and
+                             self._seqcache.getslot(seqkey) >= 0)
+        index, range_, ncoords = _table__searchComposite(
+            self, compiled, condvars)
+        plan.index_expressions.append({
+            'column': ', '.join(columns[:len(exprs)]),
+            'kind': 'composite',
+            'operators': tuple([ops for (var, ops, lims) in exprs]),
+            'limits': tuple([lims for (var, ops, lims) in exprs]),
+            'candidates': ncoords,
+            'estimated': None,
+            'limboundscache_hit': False, })
+        plan.times['search'] = time() - tref
+
+        tref = time()
+        chunks = None
+        if plan.seqcache_hit:
+            plan.method = 'cached'
+        elif ncoords == 0:
+            plan.method, nrows, chunks = 'indexed', 0, 0
+        elif ncoords <= params['INDEX_MAX_CHUNK_RATIO'] * self.nrows:
+            coords = _table__getCompositeCoords(
+                self, index, range_, start, stop, step)
+            if len(coords) <= params['COORDS_MAX_RATIO'] * self.nrows:
+                plan.method, nrows = 'coords', len(coords)
+                chunks = len(numpy.unique(coords // nrowsinchunk))
+            else:
+                chunkmap = Bitmap.frompositions(
+                    plan.nchunks, numpy.unique(coords // nrowsinchunk))
+                if not _table__scanIsCheaper(
+                    self, None, None, None, chunkmap):
+                    plan.method, chunks = 'indexed', chunkmap.count()
+                    nrows = min(nrows, chunks * nrowsinchunk)
+        if plan.method != 'in-kernel':
+            plan.string_expression = 'e0'
+        plan.times['chunkmap'] = time() - tref
+        return (nrows, chunks)
+
+
+    def prepare(self, condition, params=(), condvars=None):
+        """
+        Prepare a query for the `condition` with some parameters.
+
+        `params` is a sequence with the names of the variables in the
+        `condition` whose values are given each time that the query is
+        run.  The rest of variables are looked up in the `condvars`
+        mapping and in the columns of the table *now*, as in
+        `Table.where()`, but the local and global namespace is never
+        sought.  A `PreparedQuery` instance is returned.
+
+        Prepared queries avoid looking up the variables of the condition
+        and compiling it every time that they are run, which makes a
+        difference for many queries with different values which only
+        select a few rows.  Example of use:
+
+        >>> query = table.prepare('(x > lo) & (x < hi)', params=('lo', 'hi'))
+        >>> for (lo, hi) in ranges:
+        ...     result = query.read(lo=lo, hi=hi)
+        """
+        params = tuple(params)
+        uservars = {}
+        if condvars is not None:
+            uservars.update(condvars)
+        for name in params:
+            uservars[name] = 0  # placeholder for discovering variables
+        condvars = self._requiredExprVars(condition, uservars)
+        for name in params:
+            if name not in condvars:
+                raise ValueError( "parameter ``%s`` does not appear "
+                                  "in condition ``%s``" % (name, condition) )
+            del condvars[name]
+        return PreparedQuery(self, condition, params, condvars)
+
+
     def where( self, condition, condvars=None,
                start=None, stop=None, step=None ):
         """
@@ -1421,8 +2294,15 @@ class Table(tableExtension.Table, Leaf):
 
 
     def _where( self, condition, condvars,
-                start=None, stop=None, step=None ):
-        """Low-level counterpart of `self.where()`."""
+                start=None, stop=None, step=None,
+                compiled=None, _usecache=True ):
+        """
+        Low-level counterpart of `self.where()`.
+
+        If the `compiled` condition is given, `condvars` must already
+        hold the variables required by the `condition`.  If `_usecache`
+        is false, the persistent query cache is not used.
+        """
         if profile: tref = time()
         if profile: show_stats("Entering table._where", tref)
         # Adjust the slice to be used.
@@ -1433,14 +2313,45 @@ class Table(tableExtension.Table, Leaf):
             return iter([])
 
         # Compile the condition and extract usable index conditions.
-        condvars = self._requiredExprVars(condition, condvars, depth=3)
-        compiled = self._compileCondition(condition, condvars)
+        if compiled is None:
+            condvars = self._requiredExprVars(condition, condvars, depth=3)
+            compiled = self._compileCondition(condition, condvars)
+
+        # Look up the persistent query cache (if any)
+        querycache, cachekey = None, None
+        if _usecache:
+            querycache = self._v_file._getQueryCache()
+        if querycache is not None:
+            cachekey = self._getQueryCacheKey(
+                condition, condvars, start, stop, step)
+        if cachekey is not None:
+            seq = querycache.get(cachekey)
+            if seq is not None:
+                self._useIndex = False
+                self._whereCondition = None
+                if len(seq) == 0:
+                    return iter([])
+                return self.itersequence(seq)
+            rows = self._where(condition, condvars, start, stop, step,
+                               compiled, _usecache=False)
+            return self._feedQueryCache(rows, querycache, cachekey)
 
         # Can we use indexes?
-        if compiled.index_expressions:
+        coords = None
+        if compiled.index_expressions or compiled.composite_expression:
             chunkmap = _table__whereIndexed(
                 self, compiled, condition, condvars, start, stop, step)
-            if type(chunkmap) != numpy.ndarray:
+            if chunkmap is None:
+                # An in-kernel query is cheaper
+                pass
+            elif isinstance(chunkmap, Bitmap):
+                # Row instances only need the list of selected chunks
+                chunkmap = chunkmap.positions()
+            elif isinstance(chunkmap, numpy.ndarray):
+                # Exact coordinates of candidate rows from 'full' indexes
+                self._useIndex = False
+                coords, chunkmap = chunkmap, None
+            else:
                 # If it is not a NumPy array it should be an iterator
                 # Reset conditions
                 self._useIndex = False
@@ -1450,13 +2361,347 @@ class Table(tableExtension.Table, Leaf):
         else:
             chunkmap = None  # default to an in-kernel query
 
+        # Can we skip chunks with zone maps?
+        if ( coords is None and chunkmap is None
+             and compiled.zonemap_expression is not None ):
+            chunkmap = _table__whereZoneMaps(self, compiled, condvars)
+            if isinstance(chunkmap, Bitmap):
+                chunkmap = chunkmap.positions()
+            elif chunkmap is not None:
+                # An empty result
+                self._useIndex = False
+                self._whereCondition = None
+                return chunkmap
+
         args = [condvars[param] for param in compiled.parameters]
         self._whereCondition = (compiled.function, args)
         row = tableExtension.Row(self)
         if profile: show_stats("Exiting table._where", tref)
+        if coords is not None:
+            # The condition is evaluated on the candidate rows only
+            return row._iter(0, len(coords), 1, coords=coords)
         return row._iter(start, stop, step, chunkmap=chunkmap)
 
 
+    def whereBlocks( self, condition, condvars=None,
+                     start=None, stop=None, step=None, nthreads=None ):
+        """
+        Iterate over blocks of rows fulfilling a `condition`.
+
+        This method works like `Table.where()`, but instead of returning
+        a `Row` instance for every matching row, it yields a
+        ``(records, coords)`` tuple for every I/O buffer with some hit.
+        `records` is a record array with the rows in the buffer that
+        fulfill the `condition`, and `coords` is an array with their row
+        coordinates.  Blocks are never empty and they are yielded in
+        increasing row order.
+
+        As no Python code is run per row, this is the recommended way of
+        processing large query results with vectorized NumPy code.
+
+        `nthreads` is the number of threads used for reading and
+        evaluating the I/O buffers concurrently (see the
+        ``QUERY_THREADS`` parameter, which is used if not specified).
+        With several threads, no other thread should use the HDF5
+        library while iterating.  The meaning of the other arguments is
+        the same as in `Table.where()`.
+
+        Example of use::
+
+            total = 0
+            for recs, coords in table.whereBlocks('(col1 > 0) & (col2 <= 20)'):
+                total += recs['col3'].sum()
+        """
+        nthreads = self._getQueryThreads(nthreads)
+        (start, stop, step) = self._processRangeRead(start, stop, step)
+        if start >= stop:
+            return iter([])
+
+        # Compile the condition and extract usable index conditions.
+        condvars = self._requiredExprVars(condition, condvars, depth=2)
+        compiled = self._compileCondition(condition, condvars)
+        return self._whereBlocks(
+            compiled, condition, condvars, start, stop, step, nthreads)
+
+
+    def _getWhereBlocks( self, condition, condvars,
+                         start, stop, step, nthreads ):
+        """
+        Get a list with the blocks of rows fulfilling a `condition`.
+
+        This is meant to be called directly by API methods, as it looks
+        for the variables in the `condition` in the frame of their
+        caller.
+        """
+        (start, stop, step) = self._processRangeRead(start, stop, step)
+        if start >= stop:
+            return []
+        condvars = self._requiredExprVars(condition, condvars, depth=3)
+        compiled = self._compileCondition(condition, condvars)
+        return list(self._whereBlocks(
+            compiled, condition, condvars, start, stop, step, nthreads))
+
+
+    def _getQueryThreads(self, nthreads, param='QUERY_THREADS'):
+        """
+        Get the number of threads to be used in a query.
+
+        If `nthreads` is `None`, the value of the `param` parameter is
+        used.
+        """
+        if nthreads is None:
+            nthreads = self._v_file.params[param]
+        if not isinstance(nthreads, (int, long)) or nthreads < 1:
+            raise ValueError( "the number of threads must be a positive "
+                              "integer, not ``%r``" % (nthreads,) )
+        return nthreads
+
+
+    def _whereBlocks( self, compiled, condition, condvars,
+                      start, stop, step, nthreads=1 ):
+        """
+        Low-level counterpart of `self.whereBlocks()`.
+
+        The `start`, `stop` and `step` arguments must have already been
+        processed.
+        """
+        func = compiled.function
+        args = [condvars[param] for param in compiled.parameters]
+        chunkmap = None
+        nrowsinbuf = self.nrowsinbuf
+        if compiled.index_expressions or compiled.composite_expression:
+            coords = _table__getCachedCoords(
+                self, condition, condvars, start, stop, step)
+            if coords is not None:
+                # The result comes from the sequence cache
+                for i in xrange(0, len(coords), nrowsinbuf):
+                    bcoords = coords[i:i+nrowsinbuf]
+                    yield (self._readCoordinates(bcoords), bcoords)
+                return
+            chunkmap = _table__whereIndexed(
+                self, compiled, condition, condvars, start, stop, step)
+            # Blocks are not read through a `Row` instance
+            self._useIndex = False
+            if chunkmap is None:
+                # An in-kernel query is cheaper
+                pass
+            elif isinstance(chunkmap, Bitmap):
+                # Only the selected chunks will be read
+                pass
+            elif isinstance(chunkmap, numpy.ndarray):
+                # Exact coordinates of candidate rows from 'full' indexes
+                coords = chunkmap
+                for i in xrange(0, len(coords), nrowsinbuf):
+                    bcoords = coords[i:i+nrowsinbuf]
+                    records = self._readCoordinates(bcoords)
+                    valid = call_on_recarr(func, args, records)
+                    if valid.any():
+                        yield (records[valid], bcoords[valid])
+                return
+            else:
+                # An empty result
+                return
+        if chunkmap is None and compiled.zonemap_expression is not None:
+            chunkmap = _table__whereZoneMaps(self, compiled, condvars)
+            self._useIndex = False
+            if chunkmap is not None and not isinstance(chunkmap, Bitmap):
+                return  # an empty result
+
+        seq, nslot, complete = None, -1, False
+        if chunkmap is not None:
+            # Prepare the feeding of the sequence cache for this query
+            seqkey = _table__getSeqKey(
+                self, condition, condvars, start, stop, step)
+            nslot = self._nslotseq
+            if nslot >= 0 and self._seqcache.getslot(seqkey) == nslot:
+                seq = []
+                maxseq = self._v_file.params['ITERSEQ_MAX_ELEMENTS']
+        ranges = self._blockRanges(start, stop, step, chunkmap)
+        try:
+            for (bstart, bstop, records, valid) in self._evalBlocks(
+                func, args, ranges, step, nthreads):
+                if not valid.any():
+                    continue
+                coords = numpy.arange(bstart, bstop, step, dtype=SizeType)
+                coords = coords[valid]
+                if seq is not None:
+                    if len(seq) + len(coords) < maxseq:
+                        seq.extend(coords)
+                    else:
+                        seq = None
+                yield (records[valid], coords)
+            complete = True
+        finally:
+            if nslot >= 0 and self._seqcache.getslot(seqkey) == nslot:
+                # Only complete results can be kept in the cache
+                self._seqcache.removeslot(nslot)
+                if complete and seq is not None:
+                    self._seqcache.setitem(seqkey, seq, len(seq) * 8)
+
+
+    def _evalBlocks(self, func, args, ranges, step, nthreads):
+        """
+        Evaluate a condition over some row `ranges` of the table.
+
+        For every ``(bstart, bstop)`` range in `ranges`, a ``(bstart,
+        bstop, records, valid)`` tuple is yielded in the same order,
+        where `records` are the rows in the range (taking `step` into
+        account) and `valid` is the result of calling `func` with `args`
+        over them.
+
+        When `nthreads` is larger than 1, a pool of `nthreads` worker
+        threads is kept for the whole query.  Ranges are fed to them
+        through a queue as soon as a worker is free, and their results
+        are put back in order before being yielded, so that a slow
+        range only delays the ones after it.  Up to ``2 * nthreads``
+        ranges are in flight at once.
+        """
+        if nthreads <= 1:
+            for (bstart, bstop) in ranges:
+                records = self._read(bstart, bstop, step)
+                valid = call_on_recarr(func, args, records)
+                yield (bstart, bstop, records, valid)
+            return
+
+        tasks = Queue.Queue()
+        results = {}
+        done = threading.Condition()
+
+        def work():
+            while True:
+                task = tasks.get()
+                if task is None:
+                    return
+                i, bstart, bstop = task
+                try:
+                    result = self._evalBlock(func, args, bstart, bstop, step)
+                except:
+                    result = sys.exc_info()
+                done.acquire()
+                try:
+                    results[i] = result
+                    done.notify()
+                finally:
+                    done.release()
+
+        workers = [threading.Thread(target=work) for i in xrange(nthreads)]
+        for worker in workers:
+            worker.setDaemon(True)
+            worker.start()
+        try:
+            maxpending = 2 * nthreads
+            ranges = iter(ranges)
+            bounds = {}   # the ranges in flight
+            nqueued = nyielded = 0
+            while True:
+                # Keep the workers busy, but the reorder buffer bounded
+                while len(bounds) < maxpending:
+                    try:
+                        bounds[nqueued] = ranges.next()
+                    except StopIteration:
+                        break
+                    tasks.put((nqueued,) + bounds[nqueued])
+                    nqueued += 1
+                if not bounds:
+                    break
+                done.acquire()
+                try:
+                    while nyielded not in results:
+                        done.wait()
+                    result = results.pop(nyielded)
+                finally:
+                    done.release()
+                bstart, bstop = bounds.pop(nyielded)
+                nyielded += 1
+                if len(result) == 3:
+                    # An exception was raised in the worker
+                    raise result[0], result[1], result[2]
+                records, valid = result
+                yield (bstart, bstop, records, valid)
+        finally:
+            # Drop the ranges not started yet and stop the workers
+            try:
+                while True:
+                    tasks.get_nowait()
+            except Queue.Empty:
+                pass
+            for worker in workers:
+                tasks.put(None)
+            for worker in workers:
+                worker.join()
+
+
+    def _evalBlock(self, func, args, bstart, bstop, step):
+        """
+        Read the rows in a range and evaluate a condition over them.
+
+        This is meant to be run from several threads at once, so calls
+        to the HDF5 library and to Numexpr are serialized.
+        """
+        nrecords = bstop - bstart
+        records = self._get_container(nrecords)
+        _hdf5Lock.acquire()
+        try:
+            self._read_records(bstart, nrecords, records)
+        finally:
+            _hdf5Lock.release()
+        if step > 1:
+            records = records[::step]
+        _numexprLock.acquire()
+        try:
+            valid = call_on_recarr(func, args, records)
+        finally:
+            _numexprLock.release()
+        return (records, valid)
+
+
+    def _blockRanges(self, start, stop, step, chunkmap=None):
+        """
+        Iterate over the row ranges of the I/O buffers for a query.
+
+        Every range is yielded as a ``(bstart, bstop)`` tuple that,
+        together with `step`, selects at most `self.nrowsinbuf` rows (or
+        the rows in a table chunk, if larger).  Ranges are aligned with
+        table chunks, so that no chunk is read (and decompressed) for
+        two buffers.  When a `chunkmap` bitmap is given, only the table
+        chunks set in it are covered, and consecutive chunks are
+        gathered in the same buffer.
+        """
+        nrowsinbuf = self.nrowsinbuf
+        cs = self.chunkshape[0]
+        nchunksinbuf = max(nrowsinbuf // cs, 1)
+        if chunkmap is None:
+            buflen = nchunksinbuf * cs * step
+            for bstart in lrange((start // cs) * cs, stop, buflen):
+                bstop = min(bstart + buflen, stop)
+                bstart = max(bstart, start)
+                if step > 1:
+                    # Align the start of the buffer with the step
+                    bstart += (step - (bstart - start) % step) % step
+                if bstart < bstop:
+                    yield (bstart, bstop)
+            return
+
+        chunks = chunkmap.positions()
+        # Only the chunks overlapping the [start, stop) range are needed
+        chunks = chunks[(chunks >= start // cs) & (chunks <= (stop-1) // cs)]
+        nchunks = len(chunks)
+        i = 0
+        while i < nchunks:
+            j = i + 1
+            while (j < nchunks and j - i < nchunksinbuf and
+                   chunks[j] == chunks[j-1] + 1):
+                j += 1
+            bstart = max(long(chunks[i]) * cs, start)
+            bstop = min((long(chunks[j-1]) + 1) * cs, stop)
+            if step > 1:
+                # Align the start of the buffer with the step
+                bstart += (step - (bstart - start) % step) % step
+            if bstart < bstop:
+                yield (bstart, bstop)
+            i = j
+
+
     def _checkFieldIfNumeric(self, field):
         """Check that `field` has been selected with ``numeric`` flavor."""
         if self.flavor == 'numeric' and field is None:
@@ -1467,7 +2712,8 @@ class Table(tableExtension.Table, Leaf):
 
 
     def readWhere( self, condition, condvars=None, field=None,
-                   start=None, stop=None, step=None ):
+                   start=None, stop=None, step=None, nthreads=None,
+                   sortby=None, limit=None, reverse=False ):
         """
         Read table data fulfilling the given `condition`.
 
@@ -1475,13 +2721,83 @@ class Table(tableExtension.Table, Leaf):
         arguments and return values the same meanings.  However, only
         the rows fulfilling the `condition` are included in the result.
 
-        The meaning of the other arguments is the same as in the
-        `Table.where()` method.
+        When `field` is the only column taking part in the `condition`
+        and it has a 'full' index, the values are read from the index
+        alone, without touching the table.
+
+        If `sortby` (a column name or `Column` instance) is given, the
+        resulting rows are sorted by the values in that column, in
+        descending order if `reverse` is true.  The column must not be
+        multidimensional, and rows with equal values in it may come in
+        any order.  If `limit` is given, only the first `limit` rows of
+        the result are returned (the ones with the lowest row numbers if
+        no `sortby` column is given, or the highest ones when `reverse`
+        is true).  When the `sortby` column has a CSI index (see
+        `Column.createCSIndex()`), it is walked in order and the search
+        stops as soon as `limit` rows are found; otherwise, no more than
+        `limit` rows are kept in memory while scanning the table.
+
+        The meaning of `nthreads` is the same as in the
+        `Table.whereBlocks()` method.  The meaning of the other
+        arguments is the same as in the `Table.where()` method.
+
+        Example of use::
+
+            # The 10 most expensive items in stock
+            top = table.readWhere('stock > 0', sortby='price',
+                                  limit=10, reverse=True)
         """
         self._checkFieldIfNumeric(field)
 
-        coords = [ p.nrow for p in
-                   self._where(condition, condvars, start, stop, step) ]
+        nthreads = self._getQueryThreads(nthreads)
+        (start, stop, step) = self._processRangeRead(start, stop, step)
+        # Compile the condition and extract usable index conditions.
+        condvars = self._requiredExprVars(condition, condvars, depth=2)
+        compiled = self._compileCondition(condition, condvars)
+        return self._readWhere(compiled, condition, condvars, field,
+                               start, stop, step, nthreads,
+                               sortby, limit, reverse)
+
+
+    def _readWhere( self, compiled, condition, condvars, field,
+                    start, stop, step, nthreads,
+                    sortby=None, limit=None, reverse=False ):
+        """
+        Low-level counterpart of `self.readWhere()`.
+
+        The `start`, `stop` and `step` arguments must have already been
+        processed.
+        """
+        if sortby is not None or limit is not None or reverse:
+            result = self._readWhereSorted(
+                compiled, condition, condvars, start, stop, step, nthreads,
+                sortby, limit, reverse)
+            if field:
+                result = getNestedField(result, field)
+            return internal_to_flavor(result, self.flavor)
+
+        if field and start < stop:
+            covered = self._coveringWhere(
+                compiled, condvars, field, start, stop, step)
+            if covered is not None:
+                return internal_to_flavor(covered[1], self.flavor)
+
+        if nthreads > 1:
+            blocks = []
+            if start < stop:
+                blocks = list(self._whereBlocks(
+                    compiled, condition, condvars, start, stop, step,
+                    nthreads))
+            if blocks:
+                result = numpy.concatenate([b[0] for b in blocks])
+            else:
+                result = self._get_container(0)
+            if field:
+                result = getNestedField(result, field)
+            return internal_to_flavor(result, self.flavor)
+
+        coords = [ p.nrow for p in self._where(
+            condition, condvars, start, stop, step, compiled) ]
         self._whereCondition = None  # reset the conditions
         if len(coords) > 1:
             cstart, cstop = coords[0], coords[-1]+1
@@ -1494,6 +2810,158 @@ class Table(tableExtension.Table, Leaf):
         return self.readCoordinates(coords, field)
 
 
+    def _readWhereSorted( self, compiled, condition, condvars,
+                          start, stop, step, nthreads,
+                          sortby, limit, reverse ):
+        """
+        Read the first rows fulfilling a condition in the `sortby` order.
+
+        The meaning of the arguments is the same as in
+        `self._readWhere()`.  A record array is returned.
+        """
+        if limit is not None and (
+            not isinstance(limit, (int, long)) or limit < 0 ):
+            raise ValueError( "the limit must be a non-negative integer, "
+                              "not ``%r``" % (limit,) )
+        icol = None
+        if sortby is not None:
+            if isinstance(sortby, Column):
+                icol = sortby
+            else:
+                icol = self.cols._f_col(sortby)
+            if ( not isinstance(icol, Column)
+                 or self.coldescrs[icol.pathname].shape != () ):
+                raise ValueError( "can not sort by column ``%s``: it is "
+                                  "nested or multidimensional" % sortby )
+        if limit == 0 or start >= stop:
+            return self._get_container(0)
+
+        if icol is not None and icol.is_indexed:
+            index = icol.index
+            if ( index.kind == 'full' and index.is_CSI and not index.dirty
+                 and index.nelements == self.nrows and not index.ndelta ):
+                return self._readWhereIndexOrder(
+                    compiled, condvars, start, stop, step,
+                    index, limit, reverse)
+
+        # Keep the best `limit` rows of the blocks read so far
+        records, keys, coords, nrecords = [], [], [], 0
+        for (brecords, bcoords) in self._whereBlocks(
+            compiled, condition, condvars, start, stop, step, nthreads):
+            if icol is None:
+                bkeys = bcoords
+            else:
+                bkeys = getNestedField(brecords, icol.pathname)
+            records.append(brecords)
+            keys.append(bkeys)
+            coords.append(bcoords)
+            nrecords += len(bcoords)
+            if limit is None or nrecords < limit:
+                continue
+            if icol is None and not reverse:
+                # Blocks come in row order, so nothing better can follow
+                break
+            keys, coords = numpy.concatenate(keys), numpy.concatenate(coords)
+            order = _sortOrder(keys, coords, reverse)[:limit]
+            records = [numpy.concatenate(records)[order]]
+            keys, coords = [keys[order]], [coords[order]]
+            nrecords = limit
+        if not records:
+            return self._get_container(0)
+        records, keys, coords = [ numpy.concatenate(l)
+                                  for l in (records, keys, coords) ]
+        return records[_sortOrder(keys, coords, reverse)[:limit]]
+
+
+    def _readWhereIndexOrder( self, compiled, condvars, start, stop, step,
+                              index, limit, reverse ):
+        """
+        Read the first rows fulfilling a condition in the `index` order.
+
+        The `index` must be a CSI one covering all the rows in the
+        table.  It is read by blocks of row coordinates (in reverse
+        order if `reverse` is true), whose rows are then read and
+        checked against the condition, until `limit` rows are found.
+        A record array is returned.
+        """
+        func = compiled.function
+        args = [condvars[param] for param in compiled.parameters]
+        nelements, nrowsinbuf = index.nelements, self.nrowsinbuf
+        wholetable = (start, stop, step) == (0, self.nrows, 1)
+        results, nresults = [], 0
+        for i in xrange(0, nelements, nrowsinbuf):
+            if reverse:
+                coords = index.readIndices(
+                    max(nelements-i-nrowsinbuf, 0), nelements-i)[::-1]
+            else:
+                coords = index.readIndices(i, min(i+nrowsinbuf, nelements))
+            coords = numpy.array(coords, dtype=SizeType)
+            if not wholetable:
+                coords = coords[(coords >= start) & (coords < stop) &
+                                ((coords - start) % step == 0)]
+                if len(coords) == 0:
+                    continue
+            records = self._readCoordinates(coords)
+            valid = call_on_recarr(func, args, records)
+            if not valid.any():
+                continue
+            results.append(records[valid])
+            nresults += len(results[-1])
+            if limit is not None and nresults >= limit:
+                break
+        if not results:
+            return self._get_container(0)
+        return numpy.concatenate(results)[:limit]
+
+
+    def whereIn(self, colname, values, start=None, stop=None, step=None):
+        """
+        Iterate over the rows whose `colname` column is in `values`.
+
+        This method returns a `Row` iterator over the rows in the table
+        whose value in the `colname` column is one of the given
+        `values`, in increasing order of row number.  The row
+        coordinates are found with a single batched lookup (see
+        `Column.lookup()`), which is much faster than a query for every
+        value.  The meaning of the `start`, `stop` and `step` arguments
+        is the same as in the `Table.where()` method.
+
+        Example of use:
+
+        >>> for row in table.whereIn('id', [42, 7, 1001]):
+        ...     print row['id'], row['name']
+        """
+        coords = self.cols._f_col(colname).lookup(values)
+        (start, stop, step) = self._processRangeRead(start, stop, step)
+        if (start, stop, step) != (0, self.nrows, 1):
+            coords = coords[(coords>=start) & (coords<stop) &
+                            ((coords-start)%step == 0)]
+        return self.itersequence(coords)
+
+
+    def _lookupRows(self, colpathname, keys, ranges):
+        """
+        Get the coordinates of rows whose `colpathname` value is in `keys`.
+
+        Only the rows in the ``(start, stop)`` `ranges` are read.  They
+        are read in blocks of whole chunks fitting in the I/O buffer, so
+        that every table chunk in a range is read (and decompressed)
+        just once.  `keys` must be a non-empty, sorted array.
+        """
+        nrowsinchunk = self.chunkshape[0]
+        blocksize = max(self.nrowsinbuf // nrowsinchunk, 1) * nrowsinchunk
+        coords = []
+        for (start, stop) in ranges:
+            while start < stop:
+                bstop = min((start // blocksize + 1) * blocksize, stop)
+                values = self._read(start, bstop, 1, colpathname)
+                coords.append(_isInSorted(values, keys).nonzero()[0] + start)
+                start = bstop
+        if not coords:
+            return numpy.empty(shape=0, dtype='int64')
+        return numpy.concatenate(coords).astype('int64')
+
+
     def whereAppend( self, dstTable, condition, condvars=None,
                      start=None, stop=None, step=None ):
         """
@@ -1526,7 +2994,7 @@ class Table(tableExtension.Table, Leaf):
 
 
     def getWhereList( self, condition, condvars=None, sort=False,
-                      start=None, stop=None, step=None ):
+                      start=None, stop=None, step=None, nthreads=None ):
         """
         Get the row coordinates fulfilling the given `condition`.
 
@@ -1534,10 +3002,21 @@ class Table(tableExtension.Table, Leaf):
         `sort` means that you want to retrieve the coordinates ordered.
         The default is to not sort them.
 
-        The meaning of the other arguments is the same as in the
-        `Table.where()` method.
+        The meaning of `nthreads` is the same as in the
+        `Table.whereBlocks()` method.  The meaning of the other
+        arguments is the same as in the `Table.where()` method.
         """
 
+        nthreads = self._getQueryThreads(nthreads)
+        if nthreads > 1:
+            blocks = self._getWhereBlocks(
+                condition, condvars, start, stop, step, nthreads)
+            coords = numpy.array([], dtype=SizeType)
+            if blocks:
+                coords = numpy.concatenate([b[1] for b in blocks])
+            # Blocks are already ordered
+            return internal_to_flavor(coords, self.flavor)
+
         coords = [ p.nrow for p in
                    self._where(condition, condvars, start, stop, step) ]
         coords = numpy.array(coords, dtype=SizeType)
@@ -1548,6 +3027,340 @@ class Table(tableExtension.Table, Leaf):
         return internal_to_flavor(coords, self.flavor)
 
 
+    def aggregateWhere( self, condition, aggregates, condvars=None,
+                        start=None, stop=None, step=None, nthreads=None ):
+        """
+        Compute `aggregates` over the rows fulfilling a `condition`.
+
+        `aggregates` is a mapping from column path names to the name of
+        the aggregate to be computed on them, which can be any of
+        'count', 'sum', 'min', 'max' or 'mean'.  A sequence of names
+        can also be used in order to get several aggregates on the same
+        column.  A dictionary with the same keys is returned, holding
+        the computed scalars (or tuples of scalars).  When no row
+        fulfills the `condition`, the 'min', 'max' and 'mean' aggregates
+        are ``None``.
+
+        Aggregates are computed buffer by buffer as the query is
+        evaluated, so no `Row` instance is involved.  Moreover, when
+        only counts are requested and the index of a column resolves the
+        whole `condition`, the result is computed from the index alone,
+        without reading the table.
+
+        The meaning of `nthreads` is the same as in the
+        `Table.whereBlocks()` method.  The meaning of the other
+        arguments is the same as in the `Table.where()` method.
+
+        Example of use::
+
+            aggs = table.aggregateWhere('(col1 > 0) & (col2 <= 20)',
+                                        {'col3': 'sum', 'col4': ('min', 'max')})
+        """
+        funcs = self._checkAggregates(aggregates)
+        nthreads = self._getQueryThreads(nthreads)
+        (start, stop, step) = self._processRangeRead(start, stop, step)
+        # Compile the condition and extract usable index conditions.
+        condvars = self._requiredExprVars(condition, condvars, depth=2)
+        compiled = self._compileCondition(condition, condvars)
+
+        count, sums, mins, maxs = None, {}, {}, {}
+        onlycount = [ afunc for afuncs in funcs.itervalues()
+                      for afunc in afuncs if afunc != 'count' ] == []
+        if onlycount and start < stop:
+            count = self._countWithIndex(
+                compiled, condvars, start, stop, step)
+        covered = None
+        if count is None and len(funcs) == 1 and start < stop:
+            # Try to get the values of the column from its index alone
+            covered = self._coveringWhere(
+                compiled, condvars, funcs.keys()[0], start, stop, step)
+        if count is None:
+            count = 0
+            if start >= stop:
+                blocks = []
+            elif covered is not None:
+                blocks = [(covered[1], covered[0])]
+            else:
+                blocks = self._whereBlocks(
+                    compiled, condition, condvars, start, stop, step, nthreads)
+            for (records, coords) in blocks:
+                count += len(coords)
+                if count == 0:
+                    continue
+                for (colname, afuncs) in funcs.iteritems():
+                    if covered is not None:
+                        values = records
+                    else:
+                        values = getNestedField(records, colname)
+                    if 'sum' in afuncs or 'mean' in afuncs:
+                        sums[colname] = sums.get(colname, 0) + values.sum()
+                    if 'min' in afuncs:
+                        value = values.min()
+                        if colname not in mins or value < mins[colname]:
+                            mins[colname] = value
+                    if 'max' in afuncs:
+                        value = values.max()
+                        if colname not in maxs or value > maxs[colname]:
+                            maxs[colname] = value
+
+        result = {}
+        for (colname, afuncs) in funcs.iteritems():
+            values = []
+            for afunc in afuncs:
+                if afunc == 'count':
+                    values.append(count)
+                elif afunc == 'sum':
+                    values.append(sums.get(colname, 0))
+                elif afunc == 'min':
+                    values.append(mins.get(colname))
+                elif afunc == 'max':
+                    values.append(maxs.get(colname))
+                elif count > 0:  # mean
+                    values.append(sums[colname] / float(count))
+                else:
+                    values.append(None)
+            if isinstance(aggregates[colname], basestring):
+                result[colname] = values[0]
+            else:
+                result[colname] = tuple(values)
+        return result
+
+
+    def _checkAggregates(self, aggregates):
+        """
+        Check the requested `aggregates` on columns.
+
+        A `TypeError` is raised for aggregates not supported by the type
+        of their column, like the sum of a string column.  A mapping from column path names to tuples of aggregate names is
+        returned.
+        """
+        funcs = {}
+        for (colname, afuncs) in aggregates.iteritems():
+            if colname not in self.coldtypes:
+                raise KeyError( "column ``%s`` not found in table ``%s``"
+                                % (colname, self._v_pathname) )
+            if isinstance(afuncs, basestring):
+                afuncs = (afuncs,)
+            for afunc in afuncs:
+                if afunc not in _aggregateFuncs:
+                    raise ValueError( "aggregate ``%s`` is not supported; "
+                                      "please use one of %s"
+                                      % (afunc, _aggregateFuncs) )
+                kind = self.coldtypes[colname].base.kind
+                if afunc != 'count' and kind not in _aggregateKinds[afunc]:
+                    raise TypeError( "aggregate ``%s`` is not supported on "
+                                     "column ``%s`` of type ``%s``"
+                                     % (afunc, colname,
+                                        self.coltypes[colname]) )
+            funcs[colname] = tuple(afuncs)
+        return funcs
+
+
+    def groupby(self, key, aggregates, start=None, stop=None, step=None):
+        """
+        Iterate over the aggregates of rows grouped by a `key` column.
+
+        For every distinct value in the `key` column (a column name or
+        `Column` instance), a ``(value, aggs)`` tuple is yielded in
+        increasing order of value, where `aggs` is a dictionary with the
+        `aggregates` computed over the rows having that value.  The
+        meaning of `aggregates` and the format of `aggs` are the same as
+        in `Table.aggregateWhere()`.  The `key` column must not be
+        nested or multidimensional.
+
+        When the `key` column has a CSI index (see
+        `Column.createCSIndex()`) covering the whole table, rows are read
+        by blocks following the order of the index, and groups are
+        yielded as soon as they are complete.  Otherwise, the table is
+        scanned and groups are aggregated in memory; when they take more
+        than about ``GROUPBY_MAX_SIZE`` bytes, they are spilled to a
+        temporary file and merged at the end.
+
+        The meaning of the `start`, `stop` and `step` arguments is the
+        same as in `Table.read()`.
+
+        Example of use::
+
+            for (id_, aggs) in table.groupby('id', {'v': ('sum', 'max')}):
+                print id_, aggs['v']
+        """
+        if isinstance(key, Column):
+            keycol = key
+        else:
+            keycol = self.cols._f_col(key)
+        if ( not isinstance(keycol, Column)
+             or self.coldescrs[keycol.pathname].shape != () ):
+            raise ValueError( "can not group by column ``%s``: it is "
+                              "nested or multidimensional" % key )
+        self._checkAggregates(aggregates)
+        grouping = Grouping(
+            self.coldtypes[keycol.pathname], aggregates, self.coldtypes)
+        (start, stop, step) = self._processRangeRead(start, stop, step)
+        return self._groupby(keycol, grouping, start, stop, step)
+
+
+    def _groupby(self, keycol, grouping, start, stop, step):
+        """Low-level counterpart of `self.groupby()`."""
+        if start >= stop:
+            return
+        index = keycol.index
+        if ( keycol.is_indexed and index.kind == 'full' and index.is_CSI
+             and not index.dirty and index.nelements == self.nrows
+             and not index.ndelta ):
+            blocks = self._groupbyIndexOrder(
+                index, grouping, start, stop, step)
+        else:
+            blocks = self._groupbyScan(
+                keycol.pathname, grouping, start, stop, step)
+        for partials in blocks:
+            for result in grouping.results(partials):
+                yield result
+
+
+    def _groupbyIndexOrder(self, index, grouping, start, stop, step):
+        """
+        Iterate over the partial aggregates of groups in `index` order.
+
+        The `index` must be a CSI one covering all the rows in the
+        table.  Keys are read from the index by blocks, together with
+        the rows they belong to (if the values of other columns are
+        needed), and the complete groups in every block are yielded.
+        """
+        needvalues = len(grouping.dtype) > 2
+        wholetable = (start, stop, step) == (0, self.nrows, 1)
+        nelements, nrowsinbuf = index.nelements, self.nrowsinbuf
+        last = grouping.empty()
+        for i in xrange(0, nelements, nrowsinbuf):
+            j = min(i+nrowsinbuf, nelements)
+            keys, records = index.readSorted(i, j), None
+            if needvalues or not wholetable:
+                coords = numpy.array(index.readIndices(i, j), dtype=SizeType)
+            if not wholetable:
+                valid = ( (coords >= start) & (coords < stop) &
+                          ((coords - start) % step == 0) )
+                keys, coords = keys[valid], coords[valid]
+            if needvalues:
+                records = self._readCoordinates(coords)
+            partials = grouping.reduce(numpy.concatenate(
+                [last, grouping.partial(keys, records)]))
+            # The last group may go on in the next block
+            last = partials[-1:]
+            if len(partials) > 1:
+                yield partials[:-1]
+        if len(last) > 0:
+            yield last
+
+
+    def _groupbyScan(self, keyname, grouping, start, stop, step):
+        """
+        Iterate over the partial aggregates of groups in a table scan.
+
+        The groups of every I/O buffer are aggregated in memory.  When
+        they take more than half of ``GROUPBY_MAX_SIZE`` bytes, they are
+        spilled to a temporary file as a new run.  Finally, the runs are
+        merged and their partial aggregates yielded by blocks.
+        """
+        maxsize = self._v_file.params['GROUPBY_MAX_SIZE']
+        groups, pending, pendingsize = grouping.empty(), [], 0
+        spilled = None
+        try:
+            for (bstart, bstop) in self._blockRanges(start, stop, step):
+                records = self._read(bstart, bstop, step)
+                partials = grouping.partial(
+                    getNestedField(records, keyname), records)
+                pending.append(partials)
+                pendingsize += partials.nbytes
+                # Reducing pending groups only when they are as large as
+                # the current ones keeps the number of reductions low.
+                if pendingsize < groups.nbytes:
+                    continue
+                groups = grouping.reduce(numpy.concatenate([groups] + pending))
+                pending, pendingsize = [], 0
+                if groups.nbytes > maxsize // 2:
+                    if spilled is None:
+                        spilled = SpilledRuns(grouping)
+                    spilled.append(groups)
+                    groups = grouping.empty()
+            groups = grouping.reduce(numpy.concatenate([groups] + pending))
+            if spilled is None:
+                yield groups
+            else:
+                for partials in spilled.merge(groups):
+                    yield partials
+        finally:
+            if spilled is not None:
+                spilled.close()
+
+
+    def _coveringWhere( self, compiled, condvars, colname,
+                        start, stop, step ):
+        """
+        Get the values of `colname` fulfilling a compiled condition.
+
+        This is only possible when the condition is entirely resolved by
+        a 'full' index on the `colname` column, since the index then
+        keeps both the values of the column and their row coordinates.
+        In this case, a ``(coords, values)`` tuple is returned, with
+        `coords` in increasing order, and no table data is read at all.
+        Otherwise, ``None`` is returned.
+        """
+        idxexprs = compiled.index_expressions
+        if not compiled.is_complete or len(idxexprs) != 1:
+            return None
+        var, ops, lims = idxexprs[0]
+        col = condvars[var]
+        if col.pathname != colname:
+            return None
+        index = col.index
+        # The values of modified rows in the index may be out of date
+        if ( index.indsize != 8 or index.nelements != self.nrows
+             or index.ndelta ):
+            return None
+
+        range_ = index.getLookupRange(ops, lims)
+        index.search(range_)
+        coords, values = index.get_coords(withvalues=True)
+        if (start, stop, step) != (0, self.nrows, 1):
+            valid = (coords >= start) & (coords < stop)
+            if step > 1:
+                valid &= ((coords - start) % step == 0)
+            coords, values = coords[valid], values[valid]
+        # Evaluate the condition over the values so as to discard the
+        # ones that can not be compared in the index (NaNs).
+        args = []
+        for param in compiled.parameters:
+            if param == var:
+                args.append(values)
+            else:
+                args.append(condvars[param])
+        valid = compiled.function(*args)
+        return (coords[valid], values[valid])
+
+
+    def _countWithIndex(self, compiled, condvars, start, stop, step):
+        """
+        Count the rows fulfilling a compiled condition from its index.
+
+        The count is only returned when the index alone resolves the
+        whole condition exactly over the whole table.  Otherwise,
+        ``None`` is returned.
+        """
+        idxexprs = compiled.index_expressions
+        if ( not compiled.is_complete or len(idxexprs) != 1
+             or (start, stop, step) != (0, self.nrows, 1) ):
+            return None
+        var, ops, lims = idxexprs[0]
+        index = condvars[var].index
+        # Light indexes do not keep all the values, NaNs in floating
+        # point columns can not be compared safely, and the values of
+        # modified rows in the index may be out of date.
+        if ( index.reduction != 1 or index.nelements != self.nrows
+             or index.dtype.kind not in 'biuS' or index.ndelta ):
+            return None
+        range_ = index.getLookupRange(ops, lims)
+        return SizeType(index.search(range_))
+
+
     def itersequence(self, sequence):
         """
         Iterate over a `sequence` of row coordinates.
@@ -1586,6 +3399,12 @@ Wrong 'sequence' parameter type. Only sequences are suported.""")
                 "`sortby` can only be a `Column` or string object, "
                 "but you passed an object of type: %s" % type(sortby))
         if icol.is_indexed and icol.index.kind == "full":
+            if icol.index.ndelta:
+                # The order of modified rows in the index is out of date
+                raise ValueError(
+                    "The index of field `%s` in table `%s` has modified "
+                    "rows in its delta; use its `compact()` method "
+                    "before reading in sorted order." % (sortby, self))
             if checkCSI and not icol.index.is_CSI:
                 # The index exists, but it is not a CSI one.
                 raise ValueError(
@@ -1607,7 +3426,9 @@ Wrong 'sequence' parameter type. Only sequences are suported.""")
         `sortby` column must have associated a 'full' index.  If you
         want to ensure a completely sorted order, the index must be a
         CSI one.  You may want to use the `checkCSI` argument in order
-        to explicitely check for the existence of a CSI index.
+        to explicitely check for the existence of a CSI index.  The
+        index must not keep modified rows in its delta (see
+        `Index.compact()`).
 
         The meaning of the `start`, `stop` and `step` arguments is the
         same as in `Table.read()`.  However, in this case a negative
@@ -1632,7 +3453,9 @@ Wrong 'sequence' parameter type. Only sequences are suported.""")
         `sortby` column must have associated a 'full' index.  If you
         want to ensure a completely sorted order, the index must be a
         CSI one.  You may want to use the `checkCSI` argument in order
-        to explicitely check for the existence of a CSI index.
+        to explicitely check for the existence of a CSI index.  The
+        index must not keep modified rows in its delta (see
+        `Index.compact()`).
 
         If `field` is supplied only the named column will be selected.
         If the column is not nested, an *array* of the current flavor
@@ -2015,6 +3838,8 @@ Wrong 'sequence' parameter type. Only sequences are suported.""")
         self._open_append(wbufRA)
         self._append_records(lenrows)
         self._close_append()
+        self._bumpQueryVersion()
+        self._updateZoneMaps()
         if self.indexed:
             self._unsaved_indexedrows += lenrows
             # The table caches for indexed queries are dirty now
@@ -2023,8 +3848,9 @@ Wrong 'sequence' parameter type. Only sequences are suported.""")
                 # Flush the unindexed rows
                 self.flushRowsToIndex(_lastrow=False)
             else:
-                # All the columns are dirty now
-                self._markColumnsAsDirty(self.colpathnames)
+                # All the columns are dirty now (but composite indexes
+                # only cover the rows existing when they were built)
+                self._markColumnsAsDirty(self.colpathnames, composites=False)
 
 
     def append(self, rows):
@@ -2136,8 +3962,8 @@ table format '%s'. The error was: <%s>
             # Do the actual update of rows
             self._update_elements(lcoords, coords, recarr)
 
-        # Redo the index if needed
-        self._reIndex(self.colpathnames)
+        # Update the indexes if needed
+        self._reIndex(self.colpathnames, coords)
 
         return SizeType(lcoords)
 
@@ -2189,8 +4015,9 @@ table format '%s'. The error was: <%s>
         # Do the actual update
         self._update_records(start, stop, step, recarr)
 
-        # Redo the index if needed
-        self._reIndex(self.colpathnames)
+        # Update the indexes if needed
+        self._reIndex(self.colpathnames,
+                      numpy.arange(start, stop, step, dtype=SizeType))
 
         return SizeType(lenrows)
 
@@ -2270,8 +4097,9 @@ table format '%s'. The error was: <%s>
         mod_col[:] = column
         # save this modified rows in table
         self._update_records(start, stop, step, mod_recarr)
-        # Redo the index if needed
-        self._reIndex([colname])
+        # Update the indexes if needed
+        self._reIndex([colname],
+                      numpy.arange(start, stop, step, dtype=SizeType))
 
         return SizeType(nrows)
 
@@ -2346,8 +4174,8 @@ The 'names' parameter must be a list of strings.""")
             mod_col[:] = recarray[name].squeeze()
         # save this modified rows in table
         self._update_records(start, stop, step, mod_recarr)
-        # Redo the index if needed
-        self._reIndex(names)
+        # Update the indexes if needed
+        self._reIndex(names, numpy.arange(start, stop, step, dtype=SizeType))
 
         return SizeType(nrows)
 
@@ -2378,7 +4206,8 @@ The 'names' parameter must be a list of strings.""")
         return rowsadded
 
 
-    def _addRowsToIndex(self, colname, start, nrows, lastrow, update):
+    def _addRowsToIndex( self, colname, start, nrows, lastrow, update,
+                         nthreads=1 ):
         """Add more elements to the existing index """
 
         # This method really belongs to Column, but since it makes extensive
@@ -2393,6 +4222,12 @@ The 'names' parameter must be a list of strings.""")
         startLR = index.sorted.nrows*slicesize
         indexedrows = startLR - start
         stop = start+nrows-slicesize+1
+        if nthreads > 1 and index.nelementsILR == 0 and startLR < stop:
+            # The last row does not need to be merged into the slices
+            nadded = self._addSlicesToIndex(
+                index, colname, startLR, stop, update, nthreads)
+            indexedrows += nadded
+            startLR += nadded
         while startLR < stop:
             index.append(
                 [self._read(startLR, startLR+slicesize, 1, colname)],
@@ -2408,6 +4243,68 @@ The 'names' parameter must be a list of strings.""")
         return indexedrows
 
 
+    def _addSlicesToIndex( self, index, colname, start, stop,
+                           update, nthreads ):
+        """
+        Add the complete slices starting in ``[start, stop)`` to `index`.
+
+        Up to `nthreads` slices are read and sorted at once, each one in
+        its own thread, while the sorted slices are appended to the
+        index in order from the calling thread.  Calls to the HDF5
+        library are serialized, but sorting (which does not hold the
+        GIL) overlaps with them.  The number of rows added is returned.
+        """
+        slicesize = index.slicesize
+        where, reduction = index.append_target(update)
+        nrow = where.sorted.nrows
+
+        def sort(result, nrow, bstart):
+            # `result` gets the sorted slice or the raised exception
+            try:
+                _hdf5Lock.acquire()
+                try:
+                    arr = self._read(bstart, bstart+slicesize, 1, colname)
+                finally:
+                    _hdf5Lock.release()
+                idx = index.initial_indices(len(arr), nrow)
+                larr, arr = index.sort_slice(arr, idx, reduction)
+                result[0] = (larr, arr, idx)
+            except:
+                result[1] = sys.exc_info()
+
+        nadded, pending = 0, []
+        try:
+            while start < stop or pending:
+                # Keep `nthreads` slices being sorted
+                while start < stop and len(pending) < nthreads:
+                    result = [None, None]
+                    thread = threading.Thread(
+                        target=sort, args=(result, nrow, start))
+                    thread.start()
+                    pending.append((thread, result))
+                    start += slicesize
+                    nrow += 1
+                thread, result = pending.pop(0)
+                thread.join()
+                if result[1] is not None:
+                    # An exception was raised in the thread
+                    raise result[1][0], result[1][1], result[1][2]
+                larr, arr, idx = result[0]
+                # The slices still being sorted take about the same memory
+                index.track_memory(
+                    (arr.nbytes + idx.nbytes) * (len(pending) + 1))
+                _hdf5Lock.acquire()
+                try:
+                    index.append_sorted(larr, arr, idx, update=update)
+                finally:
+                    _hdf5Lock.release()
+                nadded += slicesize
+        finally:
+            for (thread, result) in pending:
+                thread.join()
+        return nadded
+
+
     def removeRows(self, start, stop=None):
         """
         Remove a range of rows in the table.
@@ -2437,7 +4334,8 @@ The 'names' parameter must be a list of strings.""")
             raise NotImplementedError, \
 """You are trying to delete all the rows in table "%s". This is not supported right now due to limitations on the underlying HDF5 library. Sorry!""" % self._v_pathname
         nrows = self._remove_row(start, nrows)
-        # removeRows is a invalidating index operation
+        # removeRows is a invalidating index operation (the coordinates
+        # of the rows that follow change, so a delta can not be used)
         self._reIndex(self.colpathnames)
 
         return SizeType(nrows)
@@ -2507,21 +4405,174 @@ The 'names' parameter must be a list of strings.""")
         self.indexed = max(colindexed.values())  # this is an OR :)
 
 
-    def _markColumnsAsDirty(self, colnames):
-        """Mark column indexes in `colnames` as dirty."""
+    def _getQueryVersion(self):
+        """
+        Get the version of table data for the persistent query cache.
+
+        The version is kept in the ``QUERY_VERSION`` attribute of the
+        table, which only exists for tables that have been used with the
+        persistent query cache (else, `None` is returned).  Pending
+        modifications of table data get a new version here.
+        """
+        if self._queryversion is None:
+            version = getattr(self._v_attrs, 'QUERY_VERSION', None)
+            if version is not None:
+                self._queryversion = int(version)
+        if self._queryversiondirty:
+            self._queryversion = (self._queryversion or 0) + 1
+            self._v_attrs._g__setattr('QUERY_VERSION', self._queryversion)
+            self._queryversiondirty = False
+        return self._queryversion
+
+
+    def _bumpQueryVersion(self):
+        """Mark the table data as modified for the persistent query cache."""
+        if self._queryversiondirty:
+            return
+        if (self._getQueryVersion() is not None or
+            self._v_file._getQueryCache() is not None):
+            # The new version will be saved on next flush or cache lookup
+            self._queryversiondirty = True
+
+
+    def _getQueryCacheKey(self, condition, condvars, start, stop, step):
+        """
+        Get the key of a query in the persistent query cache.
+
+        Besides the query, the key holds the version of table data and
+        the identity of the table, kept in its ``QUERY_TABLE_ID``
+        attribute, so that a table in a file regenerated at the same
+        path does not get the results of the old one.  If modifications
+        of table data are not tracked yet and the file is not writable,
+        the results of the query can not be cached and `None` is
+        returned.
+        """
+        version = self._getQueryVersion()
+        attrs = self._v_attrs
+        writable = self._v_file._isWritable()
+        if version is None and writable:
+            # Start tracking modifications of table data
+            version = self._queryversion = 0
+            attrs._g__setattr('QUERY_VERSION', 0)
+        tableid = getattr(attrs, 'QUERY_TABLE_ID', None)
+        if tableid is None and version is not None and writable:
+            tableid = uuid.uuid4().hex
+            attrs._g__setattr('QUERY_TABLE_ID', tableid)
+        if version is None or tableid is None:
+            return None
+        values = []
+        for (var, val) in sorted(condvars.iteritems()):
+            if not hasattr(val, 'pathname'):  # not a column
+                val = numpy.asarray(val)
+                values.append((var, val.dtype.str, val.shape, val.tostring()))
+        return ( os.path.abspath(self._v_file.filename), self._v_pathname,
+                 self._getConditionKey(condition, condvars), tuple(values),
+                 (start, stop, step), (tableid, version, self.nrows) )
+
+
+    def _feedQueryCache(self, rows, querycache, key):
+        """Iterate over `rows` and store their coordinates under `key`."""
+        coords = []
+        for row in rows:
+            coords.append(row.nrow)
+            yield row
+        # Only complete results are stored
+        querycache.put(key, coords)
+
+
+    def _markColumnsAsDirty(self, colnames, composites=True, coords=None):
+        """
+        Mark column indexes in `colnames` as dirty.
+
+        Composite indexes over some column in `colnames` are also marked
+        as dirty, unless `composites` is false.  If the coordinates of
+        the modified rows are given in `coords`, column indexes keep
+        them in their delta instead (see `Table._addRowsToDelta()`).
+        """
         assert len(colnames) > 0
+        self._bumpQueryVersion()
+        if coords is not None:
+            self._updateZoneMaps(colnames, coords)
+        if composites:
+            self._markCompositesAsDirty(colnames)
         if self.indexed:
             colindexed, cols = self.colindexed, self.cols
             # Mark the proper indexes as dirty
             for colname in colnames:
                 if colindexed[colname]:
                     col = cols._g_col(colname)
-                    col.index.dirty = True
+                    if not self._addRowsToDelta(col.index, coords):
+                        col.index.dirty = True
+            # The table caches for indexed queries are dirty now
+            self._dirtycache = True
+
+
+    def _addRowsToDelta(self, index, coords):
+        """
+        Add the modified rows with `coords` to the delta of `index`.
+
+        This is only done when automatic indexing is on and `index` is
+        not dirty, so that the index does not need to be rebuilt.  True
+        is returned if the rows were added, false otherwise (and then
+        the `index` should be marked as dirty).  The latter also happens
+        when the delta grows larger than the ``INDEX_MAX_DELTA_RATIO``
+        parameter allows, as rebuilding the index is cheaper then.
+        """
+        if coords is None or index.dirty or not self.autoIndex:
+            return False
+        ndelta = index.addDelta(coords)
+        maxratio = self._v_file.params['INDEX_MAX_DELTA_RATIO']
+        return ndelta <= maxratio * index.nelements
+
+
+    def _updateZoneMaps(self, colnames=None, coords=None):
+        """
+        Update the zone maps of the table after changing its rows.
+
+        If the coordinates of modified rows are given in `coords`, the
+        zone maps of columns in `colnames` are widened to cover their
+        new values.  Otherwise, the rows appended to the table (or all
+        of them, if some rows were removed) are summarized.
+        """
+        zonemaps = self.zonemaps
+        if coords is None:
+            for zonemap in zonemaps.itervalues():
+                zonemap.update()
+            return
+        for colname in colnames:
+            if colname in zonemaps:
+                zonemaps[colname].widen(coords)
 
 
-    def _reIndex(self, colnames):
-        """Re-index columns in `colnames` if automatic indexing is true."""
+    def _markCompositesAsDirty(self, colnames):
+        """
+        Mark composite indexes over some column in `colnames` as dirty.
+
+        A list with the marked indexes is returned.
+        """
+        colnames, marked = set(colnames), []
+        for (columns, index) in self.compositeindexes.iteritems():
+            if colnames.intersection(columns):
+                index.dirty = True
+                marked.append(index)
+        return marked
+
+
+    def _reIndex(self, colnames, coords=None):
+        """
+        Re-index columns in `colnames` if automatic indexing is true.
+
+        If the coordinates of the modified rows are given in `coords`,
+        column indexes just keep them in their delta instead of being
+        rebuilt (see `Index.addDelta()`).  Zone maps are always updated.
+        """
 
+        self._bumpQueryVersion()
+        self._updateZoneMaps(colnames, coords)
+        composites = self._markCompositesAsDirty(colnames)
+        if composites and self.autoIndex:
+            for index in composites:
+                self._rebuildCompositeIndex(index)
         if self.indexed:
             colindexed, cols = self.colindexed, self.cols
             colstoindex = []
@@ -2529,6 +4580,8 @@ The 'names' parameter must be a list of strings.""")
             for colname in colnames:
                 if colindexed[colname]:
                     col = cols._g_col(colname)
+                    if self._addRowsToDelta(col.index, coords):
+                        continue
                     col.index.dirty = True
                     colstoindex.append(colname)
             # Now, re-index the dirty ones
@@ -2538,14 +4591,17 @@ The 'names' parameter must be a list of strings.""")
             self._dirtycache = True
 
 
-    def _doReIndex(self, dirty):
+    def _doReIndex(self, dirty, memory_budget=None):
         """Common code for `reIndex()` and `reIndexDirty()`."""
 
         indexedrows = 0
         for (colname, colindexed) in self.colindexed.iteritems():
             if colindexed:
                 indexcol = self.cols._g_col(colname)
-                indexedrows = indexcol._doReIndex(dirty)
+                indexedrows = indexcol._doReIndex(dirty, memory_budget)
+        for index in self.compositeindexes.values():
+            if index.dirty or not dirty:
+                self._rebuildCompositeIndex(index)
         # Update counters in case some column has been updated
         if indexedrows > 0:
             self._indexedrows = indexedrows
@@ -2554,7 +4610,7 @@ The 'names' parameter must be a list of strings.""")
         return SizeType(indexedrows)
 
 
-    def reIndex(self):
+    def reIndex(self, memory_budget=None):
         """
         Recompute all the existing indexes in the table.
 
@@ -2562,8 +4618,11 @@ The 'names' parameter must be a list of strings.""")
         index information for columns is no longer valid and want to
         rebuild the indexes on it.
 
+        `memory_budget` has the same meaning as in
+        ``Column.createIndex()``, and it applies to every column index.
+
         """
-        self._doReIndex(dirty=False)
+        self._doReIndex(dirty=False, memory_budget=memory_budget)
 
 
     def reIndexDirty(self):
@@ -2579,6 +4638,131 @@ The 'names' parameter must be a list of strings.""")
         self._doReIndex(dirty=True)
 
 
+    def _getKeyColumns(self, columns, action):
+        """
+        Get the path names of the `columns` used as sort or index keys.
+
+        `columns` can be the name of a column or a `Column` instance, or
+        a sequence of them.  The `action` done with the columns is only
+        used in error messages.
+        """
+        if isinstance(columns, (basestring, Column)):
+            columns = [columns]
+        colnames = []
+        for col in columns:
+            if isinstance(col, Column):
+                colname = col.pathname
+            else:
+                colname = col
+            if colname not in self.coldtypes:
+                raise KeyError( "column ``%s`` not found in table ``%s``"
+                                % (colname, self._v_pathname) )
+            coldtype = self.coldtypes[colname]
+            if coldtype.shape != () or coldtype.kind not in 'biufS':
+                raise TypeError( "can not %s column ``%s`` of type ``%s``"
+                                 % (action, colname, coldtype) )
+            colnames.append(colname)
+        if not colnames:
+            raise ValueError("at least a column is needed to %s" % action)
+        return colnames
+
+
+    def _getCompositeIndex(self, columns):
+        """Get the composite index over `columns`, or `None` if missing."""
+        indexpath = joinPath( _indexPathnameOf(self),
+                              _compositeIndexNameOf(columns) )
+        try:
+            index = self._v_file._getNode(indexpath)
+        except NoSuchNodeError:
+            return None
+        if not isinstance(index, CompositeIndex) or index.columns != columns:
+            return None
+        return index
+
+
+    def createCompositeIndex(self, columns, filters=None, tmp_dir=None):
+        """
+        Create a composite index over several columns of this table.
+
+        `columns` is a sequence of column names or `Column` instances.
+        Columns must not be nested nor multidimensional, and they must
+        be of boolean, integer, floating point or string types.  The
+        index keeps the rows sorted by the values of the `columns` in
+        lexicographical order (see `Table.sort()`), so queries comparing
+        a prefix of the columns (all of them for equality but the last
+        one, which may be compared with any operators) can find their
+        candidate rows with a single lookup.  For instance, an index
+        over ``('sym', 't')`` can be used by conditions like::
+
+            (sym == s) & (t >= a) & (t < b)
+
+        The composite index is used by queries instead of the indexes of
+        single columns when more than one of its columns is usable (or
+        when the only usable one has no index by itself).  Rows appended
+        after creating the index are read from the table, while removing
+        or modifying rows makes the index dirty (and it is rebuilt if
+        `Table.autoIndex` is true).
+
+        `filters` is the `Filters` instance used to compress the index
+        (default index filters are used if ``None``), and `tmp_dir` the
+        directory for temporary files while sorting rows (see
+        `Table.sort()`).  The number of indexed rows is returned.
+
+        Example of use::
+
+            table.createCompositeIndex(['sym', 't'])
+        """
+        self._v_file._checkWritable()
+        columns = tuple(self._getKeyColumns(columns, 'index'))
+        if self._getCompositeIndex(columns) is not None:
+            raise ValueError( "a composite index over columns %s already "
+                              "exists in table ``%s``"
+                              % (columns, self._v_pathname) )
+        if filters is None:
+            filters = defaultIndexFilters
+        try:
+            itgroup = self._v_file._getNode(_indexPathnameOf(self))
+        except NoSuchNodeError:
+            itgroup = createIndexesTable(self)
+        index = CompositeIndex(
+            itgroup, _compositeIndexNameOf(columns), columns,
+            title="Composite index for %s columns" % ", ".join(columns),
+            filters=filters, new=True )
+        indexedrows = index._fill(tmp_dir)
+        # Changing the set of indexes invalidates the condition cache
+        self._conditionCache.clear()
+        return SizeType(indexedrows)
+
+
+    def removeCompositeIndex(self, columns):
+        """
+        Remove the composite index over the `columns` of this table.
+
+        `columns` has the same meaning as in
+        `Table.createCompositeIndex()`.  A `KeyError` is raised if there
+        is no composite index over them.
+        """
+        self._v_file._checkWritable()
+        columns = tuple(self._getKeyColumns(columns, 'index'))
+        index = self._getCompositeIndex(columns)
+        if index is None:
+            raise KeyError( "there is no composite index over columns %s "
+                            "in table ``%s``" % (columns, self._v_pathname) )
+        # Let the index unnail the condition cache if it is dirty.
+        index.dirty = False
+        index._f_remove(recursive=True)
+        self._conditionCache.clear()
+
+
+    def _rebuildCompositeIndex(self, index):
+        """Create the composite `index` again from current rows."""
+        self._v_file._checkWritable()
+        columns, filters = index.columns, index.filters
+        index.dirty = False
+        index._f_remove(recursive=True)
+        self.createCompositeIndex(columns, filters)
+
+
     def _g_copyRows(self, object, start, stop, step, sortby, checkCSI):
         "Copy rows from self to object"
         if sortby is None:
@@ -2603,6 +4787,15 @@ The 'names' parameter must be a list of strings.""")
         object.flush()
 
 
+    def _g_copyRowsSorted( self, object, start, stop, step,
+                           colnames, reverse, tmp_dir ):
+        "Copy rows from self to object sorted by the `colnames` columns"
+        for coords in iterSortedRows(
+            self, colnames, start, stop, step, reverse, tmp_dir=tmp_dir):
+            object.append(self._readCoordinates(coords))
+        object.flush()
+
+
     def _g_copyRows_optim(self, object, start, stop, step):
         "Copy rows from self to object (optimized version)"
         nrowsinbuf = self.nrowsinbuf
@@ -2624,7 +4817,11 @@ The 'names' parameter must be a list of strings.""")
 
 
     def _g_propIndexes(self, other):
-        """Generate index in `other` table for every indexed column here."""
+        """
+        Generate index in `other` table for every indexed column here.
+
+        Composite indexes and zone maps are generated as well.
+        """
         oldcols, newcols = self.colinstances, other.colinstances
         for colname in newcols:
             oldcolindexed = oldcols[colname].is_indexed
@@ -2633,7 +4830,13 @@ The 'names' parameter must be a list of strings.""")
                 newcol = newcols[colname]
                 newcol.createIndex(
                     kind=oldcolindex.kind, optlevel=oldcolindex.optlevel,
-                    filters=oldcolindex.filters, tmp_dir=None)
+                    filters=oldcolindex.filters, tmp_dir=None,
+                    memory_budget=oldcolindex.memory_budget)
+        for (columns, index) in self.compositeindexes.iteritems():
+            other.createCompositeIndex(columns, filters=index.filters)
+        for (colname, zonemap) in self.zonemaps.iteritems():
+            other.cols._g_col(colname).createZoneMap(
+                bloom=zonemap.bloom, filters=zonemap.filters)
 
 
     def _g_copyWithStats(self, group, name, start, stop, step,
@@ -2643,6 +4846,7 @@ The 'names' parameter must be a list of strings.""")
         sortby = kwargs.pop('sortby', None)
         propindexes = kwargs.pop('propindexes', False)
         checkCSI = kwargs.pop('checkCSI', False)
+        sortkeys = kwargs.pop('_sortkeys', None)
         # Compute the correct indices.
         (start, stop, step) = self._processRangeRead(
             start, stop, step, warn_negstep = sortby is None)
@@ -2653,10 +4857,14 @@ The 'names' parameter must be a list of strings.""")
                           filters=filters, expectedrows=nrows,
                           chunkshape=chunkshape,
                           _log=_log )
-        self._g_copyRows(newtable, start, stop, step, sortby, checkCSI)
+        if sortkeys is not None:
+            self._g_copyRowsSorted(newtable, start, stop, step, *sortkeys)
+        else:
+            self._g_copyRows(newtable, start, stop, step, sortby, checkCSI)
         nbytes = newtable.nrows * newtable.rowsize
         # Generate equivalent indexes in the new table, if required.
-        if propindexes and self.indexed:
+        if propindexes and (self.indexed or self.compositeindexes
+                            or self.zonemaps):
             self._g_propIndexes(newtable)
         return (newtable, nbytes)
 
@@ -2692,6 +4900,41 @@ The 'names' parameter must be a list of strings.""")
             newparent, newname, overwrite, createparents, **kwargs)
 
 
+    def sort( self, sortby, newparent=None, newname=None, overwrite=False,
+              createparents=False, reverse=False, tmp_dir=None, **kwargs ):
+        """
+        Copy this table with its rows sorted by the `sortby` columns.
+
+        `sortby` can be the name of a column or a `Column` instance, or
+        a sequence of them for sorting by several columns (in
+        lexicographical order).  Columns must not be nested nor
+        multidimensional, and they must be of boolean, integer, floating
+        point or string types.  Rows are sorted in descending order if
+        `reverse` is true.  Rows with equal values in the `sortby`
+        columns keep their relative order.
+
+        Unlike ``Table.copy(sortby=...)``, no index is needed: the
+        selected rows are sorted by an external merge sort, with runs of
+        ``SORT_MAX_SIZE`` bytes of keys and row coordinates which are
+        spilled to temporary files in the `tmp_dir` directory (or the
+        default one for temporary files).  The rows are then read in
+        sorted order and written straight into the new table.
+
+        The meaning of the other arguments is the same as in
+        `Table.copy()`, except that the `sortby`, `checkCSI` and
+        negative values of `step` are not supported.  The new table is
+        returned.
+
+        Example of use::
+
+            sorted_ = table.sort(['station', 'time'], newname='sorted')
+        """
+        colnames = self._getKeyColumns(sortby, 'sort by')
+        kwargs['_sortkeys'] = (colnames, reverse, tmp_dir)
+        return self.copy(
+            newparent, newname, overwrite, createparents, **kwargs)
+
+
     def flush(self):
         """Flush the table buffers."""
 
@@ -2709,6 +4952,9 @@ The 'names' parameter must be a list of strings.""")
             if self._dirtyindexes:
                 # Finally, re-index any dirty column
                 self.reIndexDirty()
+        if self._queryversiondirty:
+            # Save a new version of the modified table data
+            self._getQueryVersion()
 
         super(Table, self).flush()
 
@@ -3116,20 +5362,33 @@ class Column(object):
         The parent `Table` instance.
     type
         The PyTables type of the column (a string).
+    zonemap
+        The `ZoneMap` instance associated with this column (``None`` if
+        the column has no zone map).
 
     Public methods
     --------------
 
-    createIndex([optlevel][, kind][, filters][, tmp_dir])
+    createIndex([optlevel][, kind][, filters][, tmp_dir][, memory_budget])
         Create an index for this column.
-    createCSIndex([filters][, tmp_dir])
+    lookup(values)
+        Get the coordinates of the rows whose value is in `values`.
+    quantiles(qs[, exact])
+        Get the quantiles of the values in this column.
+    histogram([bins])
+        Compute the histogram of the values in this column.
+    createCSIndex([filters][, tmp_dir][, memory_budget])
         Create a completely sorted index (CSI) for this column.
-    reIndex()
+    reIndex([memory_budget])
         Recompute the index associated with this column.
     reIndexDirty()
         Recompute the associated index only if it is dirty.
     removeIndex()
         Remove the index associated with this column.
+    createZoneMap([bloom][, filters])
+        Create a zone map for this column.
+    removeZoneMap()
+        Remove the zone map associated with this column.
 
     Special methods
     ---------------
@@ -3173,6 +5432,20 @@ class Column(object):
     index = property(_getindex)
 
 
+    def _getzonemap(self):
+        zonemapPath = joinPath( _indexPathnameOf_(self._tablePath),
+                                _zoneMapNameOf(self.pathname) )
+        try:
+            zonemap = self._tableFile._getNode(zonemapPath)
+        except NodeError:
+            return None  # The column has no zone map
+        if not isinstance(zonemap, ZoneMap) or zonemap.column != self.pathname:
+            return None
+        return zonemap
+
+    zonemap = property(_getzonemap)
+
+
     def _getshape(self):
         return (self.table.nrows,)+self.descr._v_dtypes[self.name].shape
 
@@ -3341,9 +5614,177 @@ class Column(object):
             raise ValueError, "Non-valid index or slice: %s" % key
 
 
+    def lookup(self, values):
+        """
+        Get the coordinates of the rows whose value is in `values`.
+
+        `values` is a sequence of values in any order, maybe with
+        duplicates.  Values which can not be represented in the type of
+        the column (like ``2.5`` in an integer column) are ignored.  The
+        coordinates are returned as an ``int64`` array, in increasing
+        order.
+
+        If the column has a usable index, the sorted values are looked
+        up in it in a single pass.  'Full' indexes give the coordinates
+        of rows straight away, while with other kinds of indexes, the
+        table chunks with candidate rows are read (each of them only
+        once) and checked.  Rows not in the index (or all of them if
+        there is no index) are read and checked sequentially.
+        """
+        if self.shape[1:] != ():
+            raise NotImplementedError(
+                "column ``%s`` is multidimensional, "
+                "not yet supported in lookups, sorry" % self.pathname )
+        table = self.table
+        keys = numpy.unique(numpy.asarray(values).ravel())
+        keys_ = keys.astype(self.dtype)
+        keys = numpy.unique(keys_[keys_ == keys])
+        if len(keys) == 0:
+            return numpy.empty(shape=0, dtype='int64')
+
+        coords = []
+        nrows, nindexed = table.nrows, 0
+        index = self.index
+        if ( index is not None and not index.dirty
+             and table._enabledIndexingInQueries ):
+            nindexed = index.nelements
+            runs = index.search_values(keys)
+            # Modified rows in the index delta need to be checked
+            if index.indsize == 8 and not index.ndelta:
+                coords.append(index.get_coords(runs=runs))
+            else:
+                nrowsinchunk = table.chunkshape[0]
+                ranges = [ (cstart*nrowsinchunk,
+                            min(cstop*nrowsinchunk, nindexed))
+                           for (cstart, cstop)
+                           in index.get_chunkbitmap(runs).runs() ]
+                coords.append(table._lookupRows(self.pathname, keys, ranges))
+        if nindexed < nrows:
+            coords.append(table._lookupRows(
+                self.pathname, keys, [(nindexed, nrows)]))
+        return numpy.concatenate(coords).astype('int64')
+
+
+    def _getStatsIndex(self):
+        """Get the index of this column usable for statistics, if any."""
+        index = self.index
+        if ( index is None or index.dirty or index.ndelta
+             or index.nelements == 0 ):
+            return None
+        return index
+
+
+    def quantiles(self, qs, exact=False):
+        """
+        Get the quantiles of the values in this column.
+
+        `qs` is a fraction between 0 and 1, or a sequence of them.  The
+        quantile of a fraction ``q`` is the lowest value in the column
+        with at least ``q`` times the number of rows having values lower
+        or equal than it, so 0 gives the minimum and 1 the maximum.  An
+        array of the column type is returned (a scalar if `qs` is a
+        scalar).
+
+        If `exact` is false and the column has a usable index, the
+        quantiles are estimated from the bounds of the index chunks,
+        without reading the column (rows not indexed yet are not taken
+        into account).  If `exact` is true, they are read at their
+        positions in a completely sorted index (see `createCSIndex()`).
+        Otherwise, the column is read and sorted.
+        """
+        if self.shape[1:] != ():
+            raise NotImplementedError(
+                "column ``%s`` is multidimensional, "
+                "not yet supported in quantiles, sorry" % self.pathname )
+        scalar = (numpy.ndim(qs) == 0)
+        qs = numpy.asarray(qs, dtype='float64').ravel()
+        if ((qs < 0) | (qs > 1)).any():
+            raise ValueError("quantiles must be between 0 and 1")
+        table = self.table
+        index = self._getStatsIndex()
+        if ( index is not None and exact and
+             not (index.is_CSI and index.nelements == table.nrows) ):
+            index = None
+        if index is not None:
+            values = index.quantiles(qs, exact)
+        else:
+            svalues = numpy.sort(table.read(field=self.pathname))
+            if len(svalues) == 0:
+                raise ValueError("the column has no values")
+            values = svalues[quantile_positions(qs, len(svalues))]
+        if scalar:
+            return values[0]
+        return values
+
+
+    def histogram(self, bins=10):
+        """
+        Compute the histogram of the values in this column.
+
+        `bins` is either the number of equal-width bins in the range of
+        values of the column or a sequence with the edges of the bins,
+        increasing monotonically.  Like in ``numpy.histogram()``, bins
+        include their left edge but not the right one, except the last
+        bin, which includes both.  A ``(hist, edges)`` tuple with the
+        number of rows in every bin and the edges of the bins is
+        returned.
+
+        If the column has a usable index, rows are counted in it
+        without reading the column: exactly in 'medium' and 'full'
+        indexes, and estimated from the bounds of the index chunks in
+        'light' and 'ultralight' ones.  Otherwise, the column is read
+        and sorted.  String columns are not supported.
+        """
+        if self.shape[1:] != ():
+            raise NotImplementedError(
+                "column ``%s`` is multidimensional, "
+                "not yet supported in histograms, sorry" % self.pathname )
+        if self.dtype.kind == 'S':
+            raise TypeError("histograms of string columns are not supported")
+        table = self.table
+        index = self._getStatsIndex()
+        nindexed = 0
+        if index is not None:
+            nindexed = index.nelements
+        # Rows not in the index are read and sorted
+        svalues = table.read(nindexed, table.nrows, field=self.pathname)
+        svalues = numpy.sort(svalues.astype('float64'))
+        svalues = svalues[~numpy.isnan(svalues)]
+
+        if is_idx(bins):
+            if bins < 1:
+                raise ValueError("the number of bins must be positive")
+            limits = []
+            if len(svalues) > 0:
+                limits.extend([svalues[0], svalues[-1]])
+            if index is not None:
+                limits.extend(index.quantiles([0., 1.]))
+            if limits:
+                vmin, vmax = float(min(limits)), float(max(limits))
+            else:
+                vmin, vmax = 0., 1.
+            if vmin == vmax:
+                vmin, vmax = vmin - 0.5, vmax + 0.5
+            edges = numpy.linspace(vmin, vmax, bins + 1)
+        else:
+            edges = numpy.asarray(bins)
+            if len(edges) < 2 or (numpy.diff(edges) < 0).any():
+                raise ValueError("bins must increase monotonically")
+
+        # Number of rows lower than every edge (or equal to the last one)
+        counts = svalues.searchsorted(edges, side='left')
+        last = svalues.searchsorted(edges[-1], side='right')
+        if index is not None:
+            counts = counts + index.searchsorted(edges, side='left')
+            last += index.searchsorted(edges[-1:], side='right')[0]
+        hist = numpy.diff(counts).astype('int64')
+        hist[-1] = last - counts[-2]
+        return (hist, edges)
+
+
     def createIndex( self, optlevel=6, kind="medium", filters=None,
-                     tmp_dir=None, _blocksizes=None, _testmode=False,
-                     _verbose=False ):
+                     tmp_dir=None, nthreads=None, memory_budget=None,
+                     _blocksizes=None, _testmode=False, _verbose=False ):
         """ Create an index for this column.
 
         Keyword arguments:
@@ -3382,6 +5823,23 @@ class Column(object):
             temporary file.  The default is to create it in the same
             directory as the file containing the original table.
 
+        nthreads -- The number of threads used for reading and sorting
+            the slices of the index concurrently.  Writing the sorted
+            slices to disk is still serialized, but it overlaps with the
+            sorting of the next ones.  If not specified, the
+            ``INDEX_THREADS`` parameter is used.
+
+        memory_budget -- The maximum amount of memory (in bytes) to be
+            used by the temporaries of the index building and
+            optimization processes.  The size of the index slices (and
+            so, the number of slices that are sorted at once) is chosen
+            so that they fit in it, making them smaller than the default
+            ones for small budgets, and larger for big ones.  Larger
+            slices reduce the entropy of the index more quickly.  If not
+            specified, slices are sized after `optlevel` and `kind`.
+            The peak memory used by the temporaries is kept in the
+            ``peakmemory`` attribute of the index afterwards.
+
         .. Warning:: In some situations it is useful to get a completely
            sorted index (CSI).  For those cases, it is best to use the
            `createCSIndex()` method instead.
@@ -3408,13 +5866,22 @@ class Column(object):
             (type(_blocksizes) is not tuple or len(_blocksizes) != 4)):
             raise ValueError, \
                   "_blocksizes must be a tuple with exactly 4 elements"
+        if (memory_budget is not None and
+            (not isinstance(memory_budget, (int, long)) or
+             memory_budget <= 0)):
+            raise ValueError, \
+                  "the memory budget must be a positive integer, not %r" \
+                  % (memory_budget,)
+        nthreads = self.table._getQueryThreads(nthreads, 'INDEX_THREADS')
         idxrows = _column__createIndex(self, optlevel, kind, filters,
-                                       tmp_dir, _blocksizes, _verbose)
+                                       tmp_dir, _blocksizes, _verbose,
+                                       nthreads, memory_budget)
         return SizeType(idxrows)
 
 
-    def createCSIndex( self, filters=None, tmp_dir=None,
-                       _blocksizes=None, _testmode=False, _verbose=False ):
+    def createCSIndex( self, filters=None, tmp_dir=None, nthreads=None,
+                       memory_budget=None, _blocksizes=None,
+                       _testmode=False, _verbose=False ):
         """Create a completely sorted index (CSI) for this column.
 
         This method guarantees the creation of an index with zero
@@ -3425,8 +5892,8 @@ class Column(object):
         ``Table.readSorted()``) in order to ensure completely sorted
         results.
 
-        For the meaning of `filters` and `tmp_dir` arguments see
-        ``Column.createIndex()``.
+        For the meaning of `filters`, `tmp_dir`, `nthreads` and
+        `memory_budget` arguments see ``Column.createIndex()``.
 
         .. Note:: This method is equivalent to
         ``Column.createIndex(optlevel=9, kind='full', ...)``.
@@ -3434,10 +5901,11 @@ class Column(object):
 
         return self.createIndex(
             kind='full', optlevel=9, filters=filters, tmp_dir=tmp_dir,
+            nthreads=nthreads, memory_budget=memory_budget,
             _blocksizes=_blocksizes, _testmode=_testmode, _verbose=_verbose)
 
 
-    def _doReIndex(self, dirty):
+    def _doReIndex(self, dirty, memory_budget=None):
         "Common code for reIndex() and reIndexDirty() codes."
 
         index = self.index
@@ -3449,6 +5917,8 @@ class Column(object):
             kind = index.kind
             optlevel = index.optlevel
             filters = index.filters
+            if memory_budget is None:
+                memory_budget = index.memory_budget
             # We *need* to tell the index that it is going to be undirty.
             # This is needed here so as to unnail() the condition cache.
             index.dirty = False
@@ -3456,23 +5926,28 @@ class Column(object):
             index._f_remove()
             # Create a new Index with the previous parameters
             return SizeType(self.createIndex(
-                kind=kind, optlevel=optlevel, filters=filters))
+                kind=kind, optlevel=optlevel, filters=filters,
+                memory_budget=memory_budget))
         else:
             return SizeType(0)  # The column is not intended for indexing
 
 
-    def reIndex(self):
+    def reIndex(self, memory_budget=None):
         """
         Recompute the index associated with this column.
 
         This can be useful when you suspect that, for any reason, the
         index information is no longer valid and you want to rebuild it.
 
+        `memory_budget` has the same meaning as in
+        ``Column.createIndex()``.  If not specified, the budget that the
+        index was created with (if any) is used again.
+
         This method does nothing if the column is not indexed.
 
         """
 
-        self._doReIndex(dirty=False)
+        self._doReIndex(dirty=False, memory_budget=memory_budget)
 
 
     def reIndexDirty(self):
@@ -3509,6 +5984,82 @@ class Column(object):
             self.table._setColumnIndexing(self.pathname, False)
 
 
+    def createZoneMap(self, bloom=False, filters=None):
+        """
+        Create a zone map for this column.
+
+        A zone map keeps the lowest and highest values of the column in
+        every chunk of the table.  Queries comparing the column with
+        constants (in the same way as indexed queries, see
+        `Table.where()`) only read the chunks whose values may fulfill
+        the comparisons, so scans of tables with clustered values (like
+        timestamps) can skip most of the table without having an index.
+        Zone maps are only used by queries which can not use indexes,
+        and when they select less chunks than allowed by the
+        ``INDEX_MAX_CHUNK_RATIO`` parameter.
+
+        If `bloom` is true, a Bloom filter with the values in every
+        chunk is kept as well (see the ``ZONEMAP_BLOOM_BITS``
+        parameter), so that equality comparisons can also skip the
+        chunks without the value looked up.  This is only supported for
+        integer and string columns.
+
+        Zone maps are much cheaper than indexes to build and maintain:
+        rows appended to the table are summarized as they are written,
+        and the summaries of modified rows are widened to cover their
+        new values (even if `Table.autoIndex` is false).  Only removing
+        rows makes the whole column be summarized again.
+
+        `filters` is the `Filters` instance used to compress the zone
+        map (default index filters are used if ``None``).  The number of
+        summarized rows is returned.  A `ValueError` is raised if the
+        column already has a zone map.
+
+        Example of use::
+
+            table.cols.timestamp.createZoneMap()
+        """
+        table = self.table
+        table._v_file._checkWritable()
+        table._getKeyColumns(self.pathname, 'create a zone map on')
+        if self.zonemap is not None:
+            raise ValueError( "column ``%s`` of table ``%s`` already has "
+                              "a zone map"
+                              % (self.pathname, table._v_pathname) )
+        if bloom and self.dtype.kind not in 'iuS':
+            raise TypeError( "Bloom filters are only supported for integer "
+                             "and string columns, not ``%s``" % self.dtype )
+        if filters is None:
+            filters = defaultIndexFilters
+        try:
+            itgroup = self._tableFile._getNode(_indexPathnameOf(table))
+        except NoSuchNodeError:
+            itgroup = createIndexesTable(table)
+        zonemap = ZoneMap(
+            itgroup, _zoneMapNameOf(self.pathname), self.pathname,
+            title="Zone map for %s column" % self.pathname,
+            filters=filters, new=True )
+        nrows = zonemap._fill(bloom)
+        # Changing the set of zone maps invalidates the condition cache
+        table._conditionCache.clear()
+        return SizeType(nrows)
+
+
+    def removeZoneMap(self):
+        """
+        Remove the zone map associated with this column.
+
+        This method does nothing if the column has no zone map.  The
+        removed zone map can be created again by calling the
+        `Column.createZoneMap()` method.
+        """
+        self._tableFile._checkWritable()
+        zonemap = self.zonemap
+        if zonemap is not None:
+            zonemap._f_remove(recursive=True)
+            self.table._conditionCache.clear()
+
+
     def close(self):
         """Close this column"""
         self.__dict__.clear()
@@ -683,7 +683,7 @@ cdef class Row:
   cdef long _row, _unsaved_nrows, _mod_nrows
   cdef hsize_t start, stop, step, absstep, nextelement, _nrow
   cdef hsize_t nrowsinbuf, nrows, nrowsread
-  cdef hsize_t chunksize, nchunksinbuf, totalchunks
+  cdef hsize_t chunksize, nchunksinbuf, nchunksel, ichunk
   cdef hsize_t startb, stopb, lenbuf
   cdef long long indexChunk
   cdef int     bufcounter, counter
@@ -695,7 +695,8 @@ cdef class Row:
   cdef int     iterseqMaxElements
   cdef ndarray bufcoords, indexValid, indexValues, chunkmap
   cdef hsize_t *bufcoordsData, *indexValuesData
-  cdef char    *chunkmapData, *indexValidData
+  cdef long long *chunkmapData
+  cdef char    *indexValidData
   cdef object  dtype
   cdef object  IObuf, IObufcpy
   cdef object  wrec, wreccpy
@@ -819,6 +820,11 @@ cdef class Row:
 
     self.nrows = table.nrows   # Update the row counter
 
+    if table._whereCondition:
+      self.whereCond = 1
+      self.condfunc, self.condargs = table._whereCondition
+      table._whereCondition = None
+
     if coords is not None:
       self.nrowsread = start
       self.nextelement = start
@@ -826,22 +832,15 @@ cdef class Row:
       self.absstep = abs(step)
       return
 
-    if table._whereCondition:
-      self.whereCond = 1
-      self.condfunc, self.condargs = table._whereCondition
-      table._whereCondition = None
-
     if table._useIndex:
       self.indexed = 1
-      # Compute totalchunks here because self.nrows can change during the
-      # life of a Row instance.
-      self.totalchunks = self.nrows / self.chunksize
-      if self.nrows % self.chunksize:
-        self.totalchunks = self.totalchunks + 1
       self.nrowsread = 0
       self.nextelement = 0
-      self.chunkmap = chunkmap
-      self.chunkmapData = <char*>self.chunkmap.data
+      # The chunkmap is the sorted list of chunks selected by indexes
+      self.chunkmap = numpy.ascontiguousarray(chunkmap, dtype='int64')
+      self.chunkmapData = <long long *>self.chunkmap.data
+      self.nchunksel = len(self.chunkmap)
+      self.ichunk = 0
       table._useIndex = False
       self.lenbuf = self.nrowsinbuf
       # Check if we have limitations on start, stop, step
@@ -867,7 +866,7 @@ cdef class Row:
   cdef __next__indexed(self):
     """The version of next() for indexed columns and a chunkmap."""
     cdef long recout, j, cs, vlen, rowsize
-    cdef hsize_t nchunksread
+    cdef hsize_t nchunk
     cdef object tmp_range
     cdef Table table
     cdef ndarray IObuf
@@ -879,38 +878,40 @@ cdef class Row:
     assert self.nrowsinbuf >= self.chunksize
     while self.nextelement < self.stop:
       if self.nextelement >= self.nrowsread:
-        # Skip until there is interesting information
-        while self.start > self.nrowsread + self.nrowsinbuf:
-          self.nrowsread = self.nrowsread + self.nrowsinbuf
-          self.nextelement = self.nextelement + self.nrowsinbuf
-
         table = self.table
         IObuf = self.IObuf
         j = 0;  recout = 0;  cs = self.chunksize
-        nchunksread = self.nrowsread / cs
         tmp_range = numpy.arange(0, cs, dtype='int64')
         self.bufcoords = numpy.empty(self.nrowsinbuf, dtype='int64')
-        # Fetch valid chunks until the I/O buffer is full
-        while nchunksread < self.totalchunks:
-          if self.chunkmapData[nchunksread]:
-            self.bufcoords[j*cs:(j+1)*cs] = tmp_range + self.nrowsread
-            # Not optimized read
-            #  recout = recout + table._read_records(
-            #    nchunksread*cs, cs, IObuf[j*cs:])
-            #
-            # Optimized read through the use of a chunk cache.  This cache has
-            # more or less the same speed than the integrated HDF5 chunk
-            # cache, but using the PyTables one has the advantage that the
-            # user can easily change this parameter.
-            recout = recout + table._read_chunk(nchunksread, IObuf, j*cs)
-            j = j + 1
-          self.nrowsread = (nchunksread+1)*cs
+        # Fetch selected chunks until the I/O buffer is full
+        while self.ichunk < self.nchunksel and j < self.nchunksinbuf:
+          nchunk = self.chunkmapData[self.ichunk]
+          if nchunk*cs >= self.stop:
+            # The remaining chunks are beyond the range
+            self.ichunk = self.nchunksel
+            break
+          self.ichunk = self.ichunk + 1
+          if (nchunk+1)*cs <= self.start:
+            # Skip until there is interesting information
+            continue
+          self.bufcoords[j*cs:(j+1)*cs] = tmp_range + nchunk*cs
+          # Not optimized read
+          #  recout = recout + table._read_records(
+          #    nchunk*cs, cs, IObuf[j*cs:])
+          #
+          # Optimized read through the use of a chunk cache.  This cache has
+          # more or less the same speed than the integrated HDF5 chunk
+          # cache, but using the PyTables one has the advantage that the
+          # user can easily change this parameter.
+          recout = recout + table._read_chunk(nchunk, IObuf, j*cs)
+          j = j + 1
+        # All the rows before the next selected chunk have been dealt with
+        if self.ichunk < self.nchunksel:
+          self.nrowsread = self.chunkmapData[self.ichunk]*cs
           if self.nrowsread > self.stop:
             self.nrowsread = self.stop
-            break
-          elif j == self.nchunksinbuf:
-            break
-          nchunksread = nchunksread + 1
+        else:
+          self.nrowsread = self.stop
 
         # Evaluate the condition on this table fragment.
         IObuf = IObuf[:recout]
@@ -994,9 +995,16 @@ cdef class Row:
         if recout == 0:
           # no items were read, skip out
           continue
+        if self.whereCond:
+          # Evaluate the condition on the rows read (exact index queries).
+          self.indexValid = call_on_recarr(
+            self.condfunc, self.condargs, self.IObuf[:recout])
+          self.indexValidData = <char *>self.indexValid.data
       self._row = self._row + 1
       self._nrow = self.bufcoordsData[self._row]
       self.nextelement = self.nextelement + self.absstep
+      if self.whereCond and not self.indexValidData[self._row]:
+        continue
       return self
     else:
       # All the elements have been read for this mode
@@ -1285,10 +1293,12 @@ cdef class Row:
     table = self.table
     # Save the records on disk
     table._update_elements(self._mod_nrows, self.mod_elements, self.IObufcpy)
+    # Mark the modified fields' indexes as dirty (or keep the modified
+    # rows in their deltas).
+    table._markColumnsAsDirty(self.modified_fields,
+                              coords=self.mod_elements[:self._mod_nrows])
     # Reset the counter of modified rows to 0
     self._mod_nrows = 0
-    # Mark the modified fields' indexes as dirty.
-    table._markColumnsAsDirty(self.modified_fields)
 
 
   def __contains__(self, item):
@@ -6,6 +6,8 @@ import copy
 from tables import *
 from tables.index import Index, defaultAutoIndex, defaultIndexFilters
 from tables.idxutils import calcChunksize
+from tables.bitmap import Bitmap
+from tables.indexesExtension import keysort
 from tables.tests.common import verbose, allequal, heavy, cleanup, \
      PyTablesTestCase, TempFileMixin
 from tables.exceptions import OldIndexWarning
@@ -2318,6 +2320,899 @@ class readSortedIndex9(readSortedIndexTestCase):
     optlevel = 9
 
 
+class ExternalSortTestCase(TempFileMixin, PyTablesTestCase):
+    nrows = 500
+    maxsize = None
+
+    def setUp(self):
+        super(ExternalSortTestCase, self).setUp()
+        self.table = table = self.h5file.createTable(
+            '/', 'table', {'icol': Int32Col(pos=0), 'fcol': FloatCol(pos=1),
+                           'scol': StringCol(4, pos=2)})
+        table.append([ ((i * 37) % 23 - 11, ((i * 13) % 17) / 3.,
+                        'a%d' % (i % 5)) for i in xrange(self.nrows) ])
+        table.flush()
+        table.nrowsinbuf = 19
+        if self.maxsize is not None:
+            self.h5file.params['SORT_MAX_SIZE'] = self.maxsize
+        self.data = table.read()
+
+    def expected(self, colnames, reverse=False, start=0, stop=None, step=1):
+        data = self.data[start:stop:step]
+        coords = numpy.arange(len(data))
+        keys = [data[name] for name in colnames]
+        if reverse:
+            # Descending keys, ascending coordinates
+            keys = [ numpy.unique(k).searchsorted(k) * -1 for k in keys ]
+        return data[numpy.lexsort([coords] + keys[::-1])]
+
+    def test00_sort(self):
+        """Sorting a table by a column."""
+        table2 = self.table.sort('icol', '/', 'table2')
+        if verbose:
+            print "Sorted values:", table2.cols.icol[:]
+        self.assertEqual(table2.nrows, self.nrows)
+        self.assertTrue(allequal(table2.read(), self.expected(['icol'])))
+        table3 = self.table.sort(self.table.cols.fcol, '/', 'table3',
+                                 reverse=True)
+        self.assertTrue(allequal(table3.read(),
+                                 self.expected(['fcol'], reverse=True)))
+
+    def test01_multicolumn(self):
+        """Sorting a table by several columns."""
+        table2 = self.table.sort(['scol', 'fcol', 'icol'], '/', 'table2')
+        self.assertTrue(allequal(table2.read(),
+                                 self.expected(['scol', 'fcol', 'icol'])))
+        table3 = self.table.sort(['scol', 'icol'], '/', 'table3',
+                                 reverse=True)
+        self.assertTrue(allequal(table3.read(),
+                                 self.expected(['scol', 'icol'], True)))
+
+    def test02_range(self):
+        """Sorting a range of rows of a table."""
+        table2 = self.table.sort('icol', '/', 'table2',
+                                 start=3, stop=400, step=3)
+        self.assertTrue(allequal(table2.read(),
+                                 self.expected(['icol'], False, 3, 400, 3)))
+        table3 = self.table.sort('icol', '/', 'table3', start=10, stop=10)
+        self.assertEqual(table3.nrows, 0)
+
+    def test03_errors(self):
+        """Sorting a table by wrong columns."""
+        table = self.table
+        self.assertRaises(KeyError, table.sort, 'none', '/', 'table2')
+        self.assertRaises(ValueError, table.sort, [], '/', 'table2')
+        table2 = self.h5file.createTable(
+            '/', 'table2', {'ccol': ComplexCol(16)})
+        self.assertRaises(TypeError, table2.sort, 'ccol', '/', 'table3')
+
+
+class SpilledExternalSortTestCase(ExternalSortTestCase):
+    maxsize = 512
+
+
+class CompositeIndexTestCase(TempFileMixin, PyTablesTestCase):
+    nrows = 500
+    coordsratio = 1.0
+
+    def setUp(self):
+        super(CompositeIndexTestCase, self).setUp()
+        self.table = table = self.h5file.createTable(
+            '/', 'table', {'sym': Int16Col(pos=0), 't': Float32Col(pos=1),
+                           'x': Int32Col(pos=2)}, chunkshape=16)
+        table.append([ ((i * 7) % 10, ((i * 37) % 101) / 10., i)
+                       for i in xrange(self.nrows) ])
+        table.flush()
+        params = self.h5file.params
+        params['COORDS_MAX_RATIO'] = self.coordsratio
+        params['INDEX_MAX_CHUNK_RATIO'] = 1.0
+        self.indexedrows = table.createCompositeIndex(['sym', 't'])
+
+    def expected(self, condition, condvars):
+        condvars = dict(condvars)
+        for name in self.table.colnames:
+            condvars[name] = self.table.col(name)
+        return numpy.flatnonzero(numpy.asarray(eval(condition, {}, condvars)))
+
+    def checkQuery(self, condition, condvars, idxcols):
+        table = self.table
+        self.assertEqual(table.willQueryUseIndexing(condition, condvars),
+                         frozenset(idxcols))
+        coords = [row.nrow for row in table.where(condition, condvars)]
+        if verbose:
+            print "Selected coordinates:", coords
+        expected = self.expected(condition, condvars)
+        self.assertEqual(coords, expected.tolist())
+        self.assertTrue(allequal(table.readWhere(condition, condvars),
+                                 table.readCoordinates(expected)))
+
+    def test00_create(self):
+        """Creating a composite index."""
+        table = self.table
+        self.assertEqual(self.indexedrows, self.nrows)
+        self.assertEqual(table.compositeindexes.keys(), [('sym', 't')])
+        index = table.compositeindexes[('sym', 't')]
+        self.assertEqual(index.nelements, self.nrows)
+        self.assertFalse(index.dirty)
+        self.assertFalse(table.cols.sym.is_indexed)
+
+    def test01_prefix(self):
+        """Querying a prefix of the columns of a composite index."""
+        self.checkQuery('(sym == s) & (t >= a) & (t < b)',
+                        {'s': 3, 'a': 2.0, 'b': 6.5}, ['sym', 't'])
+        self.checkQuery('(t <= 4) & (sym == 7) & (x > 100)', {},
+                        ['sym', 't'])
+        self.checkQuery('(sym == 2) & (t == 9.5)', {}, ['sym', 't'])
+        self.checkQuery('sym == 5', {}, ['sym'])
+        self.checkQuery('(sym == 11) & (t > 0)', {}, ['sym', 't'])
+
+    def test02_notUsable(self):
+        """Conditions not matching a prefix of a composite index."""
+        self.checkQuery('t > 2', {}, [])
+        self.checkQuery('(sym == 3) | (t > 9)', {}, [])
+        self.checkQuery('(sym > 3) & (t < 1)', {}, ['sym'])
+
+    def test03_append(self):
+        """Querying rows appended after creating a composite index."""
+        table = self.table
+        table.append([(3, 1.5, -1), (3, 7.5, -2), (4, 1.5, -3)])
+        table.flush()
+        self.assertEqual(
+            table.compositeindexes[('sym', 't')].nelements, self.nrows)
+        self.checkQuery('(sym == 3) & (t < 2)', {}, ['sym', 't'])
+
+    def test04_modify(self):
+        """Modifying rows indexed by a composite index."""
+        table = self.table
+        table.modifyColumn(0, 10, 1, numpy.arange(10) % 2, 'sym')
+        self.assertFalse(table.compositeindexes[('sym', 't')].dirty)
+        self.checkQuery('(sym == 1) & (t < 5)', {}, ['sym', 't'])
+        table.autoIndex = False
+        table.removeRows(0, 10)
+        self.assertTrue(table.compositeindexes[('sym', 't')].dirty)
+        self.checkQuery('(sym == 1) & (t < 5)', {}, [])
+        table.reIndexDirty()
+        self.assertFalse(table.compositeindexes[('sym', 't')].dirty)
+        self.checkQuery('(sym == 1) & (t < 5)', {}, ['sym', 't'])
+
+    def test05_reopen(self):
+        """Using a composite index after reopening the file."""
+        self._reopen()
+        self.table = self.h5file.root.table
+        self.assertEqual(self.table.compositeindexes.keys(), [('sym', 't')])
+        self.checkQuery('(sym == 6) & (t > 3)', {}, ['sym', 't'])
+
+    def test06_remove(self):
+        """Removing a composite index."""
+        table = self.table
+        self.assertRaises(ValueError, table.createCompositeIndex,
+                          ['sym', table.cols.t])
+        self.assertRaises(KeyError, table.removeCompositeIndex, ['t'])
+        self.assertRaises(KeyError, table.createCompositeIndex, ['none'])
+        table.removeCompositeIndex(['sym', 't'])
+        self.assertEqual(table.compositeindexes, {})
+        self.checkQuery('(sym == 3) & (t < 2)', {}, [])
+
+    def test07_explain(self):
+        """Explaining a query using a composite index."""
+        plan = self.table.explain('(sym == 3) & (t < 2)')
+        self.assertEqual(plan.index_expressions[0]['kind'], 'composite')
+        self.assertEqual(plan.index_expressions[0]['column'], 'sym, t')
+        self.assertEqual(plan.nhits, len(self.expected(
+            '(sym == 3) & (t < 2)', {})))
+
+
+    def test08_fallbackToSingle(self):
+        """Using a single index when the composite one does not pay off."""
+        table = self.table
+        table.cols.x.createIndex(_blocksizes=small_blocksizes)
+        self.h5file.params['INDEX_MAX_CHUNK_RATIO'] = 0.5
+        condition = '(sym >= 0) & (x < 20)'
+        plan = table.explain(condition, {}, analyze=False)
+        if verbose:
+            print plan
+        self.assertEqual(plan.method, 'indexed')
+        self.assertEqual(plan.index_expressions[0]['column'], 'x')
+        self.assertFalse(plan.seqcache_hit)
+        coords = [row.nrow for row in table.where(condition, {})]
+        self.assertEqual(coords, range(20))
+        # The rows have been read through the chunkmap of the index of
+        # ``x``, so the result has been kept in the sequence cache
+        self.assertTrue(
+            table.explain(condition, {}, analyze=False).seqcache_hit)
+        coords = [row.nrow for row in table.where(condition, {})]
+        self.assertEqual(coords, range(20))
+
+
+class ChunkmapCompositeIndexTestCase(CompositeIndexTestCase):
+    coordsratio = 0
+
+
+class DeltaIndexTestCase(TempFileMixin, PyTablesTestCase):
+    nrows = 500
+    kind = 'full'
+
+    def setUp(self):
+        super(DeltaIndexTestCase, self).setUp()
+        self.table = table = self.h5file.createTable(
+            '/', 'table', {'x': Int32Col(pos=0), 'y': Float64Col(pos=1)},
+            chunkshape=16)
+        table.append([(i % 50, i) for i in xrange(self.nrows)])
+        table.flush()
+        table.cols.x.createIndex(kind=self.kind, _blocksizes=small_blocksizes)
+        params = self.h5file.params
+        params['INDEX_MAX_CHUNK_RATIO'] = 1.0
+        params['INDEX_MAX_DELTA_RATIO'] = 0.1
+
+    def checkQuery(self, condition):
+        table = self.table
+        coords = [row.nrow for row in table.where(condition)]
+        x = table.col('x')
+        expected = numpy.flatnonzero(eval(condition, {}, {'x': x}))
+        if verbose:
+            print "Selected coordinates:", coords
+        self.assertEqual(coords, expected.tolist())
+        self.assertEqual(table.cols.x.lookup([7, 1000]).tolist(),
+                         numpy.flatnonzero((x == 7) | (x == 1000)).tolist())
+
+    def test00_modify(self):
+        """Modifying rows keeps them in the delta of indexes."""
+        table = self.table
+        table.modifyColumn(3, 6, 1, [1000, 1000, 7], 'x')
+        table.modifyRows(100, rows=[(1000, -1.)])
+        index = table.cols.x.index
+        self.assertFalse(index.dirty)
+        self.assertEqual(index.readDelta().tolist(), [3, 4, 5, 100])
+        self.checkQuery('x == 1000')
+        self.checkQuery('(x == 3) | (x == 7)')
+        self.checkQuery('(x > 40) & (x < 2000)')
+
+    def test01_update(self):
+        """Modifying rows through `Row.update()`."""
+        table = self.table
+        for row in table.where('x == 3'):
+            row['x'] = 1000
+            row.update()
+        table.flush()
+        index = table.cols.x.index
+        self.assertFalse(index.dirty)
+        self.assertEqual(index.ndelta, self.nrows // 50)
+        self.checkQuery('x == 3')
+        self.checkQuery('x == 1000')
+
+    def test02_reopen(self):
+        """The delta of indexes is kept after reopening the file."""
+        self.table.modifyColumn(10, 12, 1, [1000, 1000], 'x')
+        self._reopen('a')
+        self.h5file.params['INDEX_MAX_CHUNK_RATIO'] = 1.0
+        self.table = self.h5file.root.table
+        self.assertEqual(self.table.cols.x.index.readDelta().tolist(),
+                         [10, 11])
+        self.checkQuery('x >= 1000')
+
+    def test03_compact(self):
+        """Folding the delta into the index."""
+        table = self.table
+        table.modifyColumn(10, 12, 1, [1000, 1000], 'x')
+        self.assertEqual(table.cols.x.index.compact(), self.nrows)
+        index = table.cols.x.index
+        self.assertEqual(index.ndelta, 0)
+        self.assertFalse('delta' in index)
+        self.checkQuery('x >= 1000')
+        self.assertEqual(index.compact(), 0)
+
+    def test04_overflow(self):
+        """Rebuilding indexes when their delta grows too large."""
+        table = self.table
+        self.h5file.params['INDEX_MAX_DELTA_RATIO'] = 0.01
+        table.modifyColumn(0, 10, 1, numpy.arange(10) + 1000, 'x')
+        self.assertEqual(table.cols.x.index.ndelta, 0)
+        self.checkQuery('x >= 1000')
+
+    def test05_noauto(self):
+        """Modifying rows with automatic indexing off makes indexes dirty."""
+        table = self.table
+        table.autoIndex = False
+        table.modifyColumn(3, 4, 1, [1000], 'x')
+        self.assertTrue(table.cols.x.index.dirty)
+        self.assertEqual(table.cols.x.index.ndelta, 0)
+
+    def test06_remove(self):
+        """Removing rows rebuilds indexes."""
+        table = self.table
+        table.modifyColumn(3, 4, 1, [1000], 'x')
+        table.removeRows(0, 2)
+        self.assertEqual(table.cols.x.index.ndelta, 0)
+        self.checkQuery('x == 1000')
+
+    def test07_sorted(self):
+        """Reading in sorted order requires an empty delta."""
+        table = self.table
+        if self.kind != 'full':
+            return
+        table.modifyColumn(3, 4, 1, [1000], 'x')
+        self.assertRaises(ValueError, table.readSorted, 'x')
+        self.assertRaises(ValueError, list, table.itersorted('x'))
+        self.assertEqual(table.cols.x.index.ndelta, 1)
+        self._reopen('r')
+        table = self.h5file.root.table
+        self.assertRaises(ValueError, table.readSorted, 'x')
+        self._reopen('a')
+        table = self.h5file.root.table
+        table.cols.x.index.compact()
+        x = table.readSorted('x', field='x')
+        self.assertEqual(x.tolist(), sorted(table.col('x')))
+        self.assertEqual(x[-1], 1000)
+
+
+class MediumDeltaIndexTestCase(DeltaIndexTestCase):
+    kind = 'medium'
+
+
+class ParallelIndexTestCase(TempFileMixin, PyTablesTestCase):
+    nrows = 500
+
+    def setUp(self):
+        super(ParallelIndexTestCase, self).setUp()
+        self.table = table = self.h5file.createTable(
+            '/', 'table', {'x': Int32Col(pos=0), 'y': Int32Col(pos=1),
+                           's': StringCol(4, pos=2)})
+        values = [(i * 37) % 101 for i in xrange(self.nrows)]
+        table.append([(v, v, str(v)) for v in values])
+        table.flush()
+
+    def checkIndex(self, colname, kind, optlevel):
+        table = self.table
+        cols = [table.cols.x, table.cols.y]
+        if colname == 's':
+            # Build the serial index in another table
+            table2 = table.copy('/', 'table2')
+            cols = [table2.cols.s, table.cols.s]
+        cols[0].createIndex(optlevel, kind, _blocksizes=small_blocksizes,
+                            nthreads=1)
+        cols[1].createIndex(optlevel, kind, _blocksizes=small_blocksizes,
+                            nthreads=3)
+        index1, index2 = cols[0].index, cols[1].index
+        self.assertEqual(index1.nelements, index2.nelements)
+        for name in ['sorted', 'indices', 'ranges', 'bounds', 'sortedLR']:
+            if verbose:
+                print "Comparing %s arrays" % name
+            self.assertTrue(allequal(getattr(index1, name).read(),
+                                     getattr(index2, name).read()))
+
+    def test00_full(self):
+        """Building 'full' indexes with several threads."""
+        self.checkIndex('x', 'full', 6)
+
+    def test01_medium(self):
+        """Building 'medium' indexes with several threads."""
+        self.checkIndex('x', 'medium', 6)
+
+    def test02_light(self):
+        """Building 'light' indexes with several threads."""
+        self.checkIndex('x', 'light', 3)
+
+    def test03_csi(self):
+        """Building CSI indexes with several threads."""
+        self.checkIndex('x', 'full', 9)
+        self.assertTrue(self.table.cols.y.index.is_CSI)
+
+    def test04_strings(self):
+        """Building indexes on string columns with several threads."""
+        self.checkIndex('s', 'medium', 6)
+
+    def test05_badThreads(self):
+        """Passing a wrong number of threads."""
+        self.assertRaises(ValueError, self.table.cols.x.createIndex,
+                          nthreads=0)
+
+
+class MemoryBudgetTestCase(TempFileMixin, PyTablesTestCase):
+    nrows = 10000
+
+    def setUp(self):
+        super(MemoryBudgetTestCase, self).setUp()
+        self.table = table = self.h5file.createTable(
+            '/', 'table', {'x': Int32Col(pos=0)})
+        self.values = numpy.array([(i * 37) % 10007
+                                   for i in xrange(self.nrows)], 'int32')
+        table.append([(v,) for v in self.values])
+        table.flush()
+
+    def checkQuery(self):
+        condition = '(x > 1000) & (x < 1500)'
+        coords = self.table.getWhereList(condition)
+        expected = numpy.flatnonzero(
+            (self.values > 1000) & (self.values < 1500))
+        self.assertTrue(allequal(coords, expected))
+
+    def test00_small(self):
+        """Building an index with a small memory budget."""
+        col = self.table.cols.x
+        col.createIndex(memory_budget=2**16)
+        index = col.index
+        if verbose:
+            print "index:", repr(index)
+        # Values and indices of medium indexes take 8 bytes per element
+        self.assertEqual(index.slicesize, 2**16 // (4 * 8))
+        self.assertTrue(index.slicesize < calcChunksize(self.nrows)[2])
+        self.assertTrue(0 < index.peakmemory <= 2**16)
+        self.checkQuery()
+
+    def test01_csi(self):
+        """Building a CSI index with a small memory budget."""
+        col = self.table.cols.x
+        col.createCSIndex(memory_budget=2**17)
+        index = col.index
+        self.assertTrue(index.slicesize < calcChunksize(self.nrows, 9, 8)[2])
+        self.assertTrue(index.peakmemory > 0)
+        self.assertTrue(index.is_CSI)
+        self.assertTrue(allequal(index.readSorted(), numpy.sort(self.values)))
+        self.checkQuery()
+
+    def test02_large(self):
+        """Large memory budgets make larger slices."""
+        table = self.h5file.createTable(
+            '/', 'table2', {'x': Int32Col(pos=0)}, expectedrows=10**6)
+        table.cols.x.createIndex(memory_budget=2**26)
+        self.assertTrue(table.cols.x.index.slicesize >
+                        calcChunksize(10**6)[2])
+
+    def test03_reIndex(self):
+        """Re-indexing keeps the memory budget of the index."""
+        self.table.cols.x.createIndex(memory_budget=2**16)
+        self._reopen('a')
+        col = self.h5file.root.table.cols.x
+        self.assertEqual(col.index.memory_budget, 2**16)
+        self.assertTrue(col.index.peakmemory > 0)
+        col.reIndex()
+        self.assertEqual(col.index.slicesize, 2**16 // (4 * 8))
+        col.reIndex(memory_budget=2**15)
+        self.assertEqual(col.index.slicesize, 2**15 // (4 * 8))
+        self.table = self.h5file.root.table
+        self.checkQuery()
+
+    def test04_badBudget(self):
+        """Passing a wrong memory budget."""
+        for budget in [0, -1, 1.5]:
+            self.assertRaises(ValueError, self.table.cols.x.createIndex,
+                              memory_budget=budget)
+
+
+class BatchSearchTestCase(TempFileMixin, PyTablesTestCase):
+    nrows = 500
+
+    def setUp(self):
+        super(BatchSearchTestCase, self).setUp()
+        self.table = table = self.h5file.createTable(
+            '/', 'table', {'i': Int32Col(pos=0), 'f': Float32Col(pos=1),
+                           's': StringCol(4, pos=2), 'b': Int8Col(pos=3)})
+        values = [(i * 37) % 101 for i in xrange(self.nrows)]
+        table.append([(v, v / 2., str(v), v - 50) for v in values])
+        table.flush()
+
+    def checkBatch(self, colname, kind, items):
+        col = self.table.colinstances[colname]
+        col.createIndex(kind=kind, _blocksizes=small_blocksizes)
+        index = col.index
+        lows = [item[0] for item in items]
+        highs = [item[1] for item in items]
+        starts, lengths = index.search_batch(lows, highs)
+        self.assertEqual(starts.shape, (len(items), index.nrows))
+        for (i, item) in enumerate(items):
+            index._search(item)
+            if verbose:
+                print "Lengths for %s:" % (item,), lengths[i]
+            self.assertTrue(allequal(lengths[i], index.lengths))
+            found = index.lengths.nonzero()[0]
+            self.assertTrue(allequal(starts[i][found], index.starts[found]))
+        # Searching several ranges at once gives the same coordinates
+        items = sorted(items)
+        coords = index.get_coords(runs=index.search_ranges(items))
+        values = col[:]
+        expected = numpy.zeros(len(values), dtype=bool)
+        for (lo, hi) in items:
+            expected |= (values >= lo) & (values <= hi)
+        if kind == 'full':
+            self.assertEqual(sorted(coords), expected.nonzero()[0].tolist())
+
+    def test00_int(self):
+        """Searching many ranges at once in integer indexes."""
+        items = [(v, v) for v in xrange(-5, 110, 3)]
+        items += [(10, 20), (30, 29), (-1000, 1000)]
+        self.checkBatch('i', 'full', items)
+
+    def test01_float(self):
+        """Searching many ranges at once in float indexes."""
+        items = [(v, v + 0.7) for v in numpy.arange(-1, 52, 1.3)]
+        self.checkBatch('f', 'full', items)
+
+    def test02_string(self):
+        """Searching many ranges at once in string indexes."""
+        items = [(str(v), str(v)) for v in xrange(0, 101, 7)]
+        items += [('1', '2'), ('55555', '6'), ('9', '99')]
+        self.checkBatch('s', 'full', items)
+
+    def test03_medium(self):
+        """Searching many ranges at once in medium indexes."""
+        items = [(v, v + 2) for v in xrange(-60, 60, 5)]
+        self.checkBatch('b', 'medium', items)
+
+    def test04_outOfRange(self):
+        """Searching ranges beyond the limits of the column type."""
+        items = [(-300, -200), (-300, -40), (40, 300), (200, 300)]
+        self.checkBatch('b', 'full', items)
+
+    def test05_lookup(self):
+        """Looking up many values in an indexed column."""
+        col = self.table.cols.i
+        col.createIndex(kind='full', _blocksizes=small_blocksizes)
+        keys = range(-10, 120, 2)
+        values = col[:]
+        expected = [i for (i, v) in enumerate(values) if v in keys]
+        self.assertTrue(allequal(col.lookup(keys), expected))
+
+
+class StatsTestCase(TempFileMixin, PyTablesTestCase):
+    nrows = 1000
+
+    def setUp(self):
+        super(StatsTestCase, self).setUp()
+        self.table = table = self.h5file.createTable(
+            '/', 'table', {'i': Int32Col(pos=0), 'f': Float64Col(pos=1),
+                           's': StringCol(4, pos=2)})
+        self.ivalues = numpy.array([(i * 37) % 1009 - 500
+                                    for i in xrange(self.nrows)], 'int32')
+        self.fvalues = self.ivalues / 10.
+        table.append([(v, v / 10., str(v)) for v in self.ivalues])
+        table.flush()
+        self.qs = [0., 0.1, 0.25, 0.5, 0.75, 0.9, 1.]
+
+    def expectedQuantiles(self, values, qs):
+        svalues = numpy.sort(values)
+        positions = numpy.ceil(numpy.array(qs) * len(values)) - 1
+        return svalues[numpy.maximum(positions, 0).astype('int64')]
+
+    def expectedHistogram(self, values, edges):
+        svalues = numpy.sort(values)
+        counts = svalues.searchsorted(edges, side='left')
+        hist = numpy.diff(counts)
+        hist[-1] = svalues.searchsorted(edges[-1], side='right') - counts[-2]
+        return hist
+
+    def test00_exactQuantiles(self):
+        """Exact quantiles from a completely sorted index."""
+        col = self.table.cols.f
+        col.createCSIndex(_blocksizes=small_blocksizes)
+        quantiles = col.quantiles(self.qs, exact=True)
+        if verbose:
+            print "Quantiles:", quantiles
+        self.assertTrue(allequal(
+            quantiles, self.expectedQuantiles(self.fvalues, self.qs)))
+        self.assertEqual(col.quantiles(0.5, exact=True),
+                         self.expectedQuantiles(self.fvalues, [0.5])[0])
+
+    def test01_approxQuantiles(self):
+        """Approximate quantiles from the bounds of an index."""
+        col = self.table.cols.i
+        col.createIndex(kind='light', _blocksizes=small_blocksizes)
+        quantiles = col.quantiles(self.qs)
+        expected = self.expectedQuantiles(self.ivalues, self.qs)
+        if verbose:
+            print "Quantiles:", quantiles
+            print "Expected:", expected
+        self.assertEqual(quantiles.dtype, col.dtype)
+        # The minimum and maximum are always exact
+        self.assertEqual(quantiles[0], expected[0])
+        self.assertEqual(quantiles[-1], expected[-1])
+        self.assertTrue((abs(quantiles - expected) <= 100).all())
+        self.assertTrue((numpy.diff(quantiles) >= 0).all())
+
+    def test02_scanQuantiles(self):
+        """Exact quantiles without a completely sorted index."""
+        col = self.table.cols.i
+        expected = self.expectedQuantiles(self.ivalues, self.qs)
+        self.assertTrue(allequal(col.quantiles(self.qs), expected))
+        col.createIndex(kind='medium', _blocksizes=small_blocksizes)
+        self.assertTrue(allequal(col.quantiles(self.qs, exact=True),
+                                 expected))
+        svalues = numpy.sort(numpy.array([str(v) for v in self.ivalues]))
+        self.assertEqual(self.table.cols.s.quantiles(1.), svalues[-1])
+
+    def test03_exactHistogram(self):
+        """Histograms from indexes without reduction."""
+        for (colname, values) in [('i', self.ivalues), ('f', self.fvalues)]:
+            col = self.table.colinstances[colname]
+            col.createIndex(kind='full', _blocksizes=small_blocksizes)
+            hist, edges = col.histogram(7)
+            if verbose:
+                print "Histogram:", hist, edges
+            self.assertEqual(len(edges), 8)
+            self.assertEqual(edges[0], values.min())
+            self.assertEqual(edges[-1], values.max())
+            self.assertTrue(allequal(
+                hist, self.expectedHistogram(values, edges)))
+            edges = [-100, -50.5, 0, 3.25, 10, 1000]
+            hist, edges = col.histogram(edges)
+            self.assertTrue(allequal(
+                hist, self.expectedHistogram(values, edges)))
+
+    def test04_approxHistogram(self):
+        """Approximate histograms from the bounds of an index."""
+        col = self.table.cols.f
+        col.createIndex(kind='light', _blocksizes=small_blocksizes)
+        hist, edges = col.histogram(5)
+        expected = self.expectedHistogram(self.fvalues, edges)
+        if verbose:
+            print "Histogram:", hist
+            print "Expected:", expected
+        self.assertEqual(abs(hist.sum() - self.nrows) <= 1, True)
+        self.assertTrue((abs(hist - expected) <= self.nrows / 10).all())
+
+    def test05_unindexedHistogram(self):
+        """Histograms of columns without a usable index."""
+        col = self.table.cols.i
+        hist, edges = col.histogram(4)
+        self.assertTrue(allequal(
+            hist, self.expectedHistogram(self.ivalues, edges)))
+        self.assertRaises(TypeError, self.table.cols.s.histogram)
+        self.assertRaises(ValueError, col.histogram, [3, 1, 2])
+        self.assertRaises(ValueError, col.quantiles, [0.5, 1.5])
+
+    def test06_estimates(self):
+        """Estimating the number of rows in the range of a query."""
+        col = self.table.cols.i
+        col.createIndex(kind='medium', _blocksizes=small_blocksizes)
+        index = col.index
+        self.assertEqual(index.estimate_rows((-1000, 1000)), self.nrows)
+        self.assertEqual(index.estimate_rows((1000, 2000)), 0)
+        nrows = ((self.ivalues >= -100) & (self.ivalues <= 100)).sum()
+        self.assertTrue(abs(index.estimate_rows((-100, 100)) - nrows) <= 50)
+        plan = self.table.explain('(i >= -100) & (i <= 100)')
+        if verbose:
+            print plan
+        idxexpr = plan.index_expressions[0]
+        self.assertEqual(idxexpr['candidates'], nrows)
+        self.assertTrue(abs(idxexpr['estimated'] - nrows) <= 50)
+
+
+class ZoneMapTestCase(TempFileMixin, PyTablesTestCase):
+    nrows = 500
+
+    def setUp(self):
+        super(ZoneMapTestCase, self).setUp()
+        self.table = table = self.h5file.createTable(
+            '/', 'table', {'t': Float64Col(pos=0), 'sym': Int32Col(pos=1),
+                           'name': StringCol(8, pos=2), 'x': Int32Col(pos=3)},
+            chunkshape=16)
+        table.append([ (i * 0.5, i // 50, 'n%03d' % (i // 25), (i * 37) % 500)
+                       for i in xrange(self.nrows) ])
+        table.flush()
+        self.nchunks = (self.nrows + 15) // 16
+        self.nsummarized = table.cols.t.createZoneMap()
+        table.cols.name.createZoneMap(bloom=True)
+        table.cols.x.createZoneMap(bloom=True)
+
+    def expected(self, condition):
+        condvars = dict( (name, self.table.col(name))
+                         for name in self.table.colnames )
+        return numpy.flatnonzero(numpy.asarray(eval(condition, {}, condvars)))
+
+    def checkQuery(self, condition, maxchunks=None):
+        table = self.table
+        coords = [row.nrow for row in table.where(condition)]
+        expected = self.expected(condition)
+        if verbose:
+            print "Selected coordinates:", coords
+        self.assertEqual(coords, expected.tolist())
+        self.assertEqual(table.getWhereList(condition).tolist(),
+                         expected.tolist())
+        plan = table.explain(condition)
+        self.assertEqual(plan.nhits, len(expected))
+        if maxchunks is not None:
+            self.assertEqual(plan.method, 'zonemap')
+            self.assertTrue(plan.nchunks_selected <= maxchunks)
+
+    def test00_create(self):
+        """Creating zone maps."""
+        table = self.table
+        self.assertEqual(self.nsummarized, self.nrows)
+        self.assertEqual(sorted(table.zonemaps.keys()), ['name', 't', 'x'])
+        zonemap = table.cols.t.zonemap
+        self.assertEqual(zonemap.nrows, self.nrows)
+        self.assertEqual(zonemap.nchunks, self.nchunks)
+        self.assertFalse(zonemap.bloom)
+        self.assertTrue(table.cols.x.zonemap.bloom)
+        self.assertTrue(table.cols.sym.zonemap is None)
+        self.assertEqual(table.willQueryUseIndexing('t < 10'), frozenset())
+
+    def test01_range(self):
+        """Skipping chunks in range queries."""
+        self.checkQuery('t < 10', 2)
+        self.checkQuery('(t >= 100.25) & (t < 110)', 3)
+        self.checkQuery('(t < 5) | (t > 245)', 3)
+        self.checkQuery('(t > 200) & (sym == 2)', 7)
+        self.checkQuery('(name >= "n015") & (x < 100)', 9)
+        self.checkQuery('t > 1000', 0)
+        self.checkQuery('(t < 10) | (sym == 3)')
+
+    def test02_bloom(self):
+        """Skipping chunks in equality queries with Bloom filters."""
+        self.checkQuery('x == 123', 3)
+        self.checkQuery('x == 1000', 0)
+        self.checkQuery('(x == 3) | (x == 5)', 5)
+        self.checkQuery('name == "n007"', 3)
+        self.checkQuery('name == "zzz"', 0)
+        self.checkQuery('x == 2.5')
+
+    def test03_append(self):
+        """Querying rows appended after creating zone maps."""
+        table = self.table
+        table.append([(1.5, 0, 'new', 1001), (300.5, 0, 'n000', 1002)])
+        table.flush()
+        self.assertEqual(table.cols.t.zonemap.nrows, self.nrows + 2)
+        self.checkQuery('t < 2')
+        self.checkQuery('x == 1001')
+        self.checkQuery('name == "new"')
+        row = table.row
+        for i in xrange(40):
+            row['t'] = -i
+            row['x'] = 2000 + i
+            row.append()
+        table.flush()
+        self.checkQuery('t < 0', 3)
+        self.checkQuery('x == 2010', 3)
+
+    def test04_modify(self):
+        """Querying modified rows."""
+        table = self.table
+        table.modifyColumn(3, 4, 1, numpy.array([-5.]), 't')
+        table.cols.x[200] = 5000
+        table.modifyRows(300, 301, 1, [(0., 0, 'mod', 6000)])
+        self.checkQuery('t < 0', 1)
+        self.checkQuery('x == 5000', 3)
+        self.checkQuery('name == "mod"', 3)
+        self.checkQuery('x == 6000', 3)
+        for row in table.where('x < 50'):
+            row['x'] = row['x'] + 7000
+            row.update()
+        self.checkQuery('x < 50')
+        self.checkQuery('x == 7003')
+        table.removeRows(0, 20)
+        self.assertEqual(table.cols.t.zonemap.nrows, self.nrows - 20)
+        self.checkQuery('t < 20', 3)
+        self.checkQuery('x == 123', 3)
+
+    def test05_reopen(self):
+        """Using zone maps after reopening the file."""
+        self._reopen()
+        self.table = self.h5file.root.table
+        self.assertEqual(sorted(self.table.zonemaps.keys()),
+                         ['name', 't', 'x'])
+        self.checkQuery('(t > 100) & (t <= 120)', 4)
+        self.checkQuery('x == 77', 3)
+
+    def test06_remove(self):
+        """Removing zone maps."""
+        table = self.table
+        self.assertRaises(ValueError, table.cols.t.createZoneMap)
+        table.cols.t.removeZoneMap()
+        table.cols.t.removeZoneMap()
+        self.assertRaises(TypeError, table.cols.t.createZoneMap, bloom=True)
+        self.assertTrue(table.cols.t.zonemap is None)
+        self.assertEqual(table.explain('t < 10').method, 'in-kernel')
+        self.checkQuery('t < 10')
+
+    def test07_indexed(self):
+        """Indexes are preferred to zone maps."""
+        table = self.table
+        table.cols.t.createIndex(_blocksizes=small_blocksizes)
+        self.assertEqual(table.willQueryUseIndexing('t < 10'),
+                         frozenset(['t']))
+        self.assertNotEqual(table.explain('t < 10').method, 'zonemap')
+        self.checkQuery('t < 10')
+
+    def test08_copy(self):
+        """Copying a table with zone maps."""
+        table2 = self.table.copy('/', 'table2', propindexes=True)
+        self.assertEqual(sorted(table2.zonemaps.keys()), ['name', 't', 'x'])
+        self.assertTrue(table2.cols.name.zonemap.bloom)
+        self.table = table2
+        self.checkQuery('name == "n007"', 3)
+
+
+class KeysortTestCase(unittest.TestCase):
+    """Tests for the sorts of index slices."""
+
+    def checkKeysort(self, dtype, method):
+        rnd = numpy.random.randint(-1000, 1000, size=10000)
+        for dtype2 in ['uint32', 'uint64']:
+            original = numpy.array(rnd, dtype)
+            values = original.copy()
+            indices = numpy.arange(len(values), dtype=dtype2)
+            order = values.argsort(kind='mergesort')
+            expected = values[order]
+            keysort(values, indices, method)
+            self.assertTrue(allequal(values, expected))
+            if method == 'quicksort':
+                self.assertTrue(allequal(original[indices], expected))
+            else:
+                # Elements with equal keys keep their order
+                self.assertTrue(allequal(indices, order))
+
+    def test00_radix(self):
+        """Sorting numbers with a radix sort."""
+        for dtype in ['bool', 'int8', 'uint8', 'int16', 'uint16', 'int32',
+                      'uint32', 'int64', 'uint64', 'float32', 'float64']:
+            self.checkKeysort(dtype, 'radix')
+            self.checkKeysort(dtype, None)
+
+    def test01_quicksort(self):
+        """Sorting numbers with a quicksort."""
+        for dtype in ['int32', 'float64']:
+            self.checkKeysort(dtype, 'quicksort')
+
+    def test02_floats(self):
+        """Sorting special float values with a radix sort."""
+        values = numpy.array([0., -numpy.inf, 1.5, -0., numpy.inf, -2.5]*500)
+        indices = numpy.arange(len(values), dtype='uint64')
+        expected = numpy.sort(values)
+        keysort(values, indices, 'radix')
+        self.assertTrue(allequal(values, expected))
+
+    def test03_badMethod(self):
+        """Sorting with a wrong method."""
+        indices = numpy.arange(10, dtype='uint32')
+        self.assertRaises(ValueError, keysort,
+                          numpy.zeros(10, 'S4'), indices, 'radix')
+        self.assertRaises(ValueError, keysort,
+                          numpy.zeros(10, 'int32'), indices, 'heapsort')
+
+
+class BitmapTestCase(unittest.TestCase):
+    """Tests for the compressed bitmaps of indexed queries."""
+
+    def setUp(self):
+        self.dense1 = numpy.zeros(100, dtype='bool')
+        self.dense1[[0, 1, 2, 10, 50, 51, 99]] = True
+        self.dense2 = numpy.zeros(100, dtype='bool')
+        self.dense2[2:60] = True
+        self.bitmap1 = Bitmap.fromdense(self.dense1)
+        self.bitmap2 = Bitmap.fromdense(self.dense2)
+
+    def test00_runs(self):
+        """Checking the runs of a bitmap."""
+        self.assertEqual(list(self.bitmap1.runs()),
+                         [(0, 3), (10, 11), (50, 52), (99, 100)])
+        self.assertEqual(self.bitmap1.count(), 7)
+        self.assertTrue(self.bitmap1.any())
+        self.assertFalse(Bitmap(100).any())
+        self.assertTrue(allequal(self.bitmap1.positions(),
+                                 self.dense1.nonzero()[0]))
+        self.assertTrue(allequal(self.bitmap1.todense(), self.dense1))
+
+    def test01_build(self):
+        """Building bitmaps from positions and runs."""
+        bitmap = Bitmap.frompositions(100, [51, 0, 99, 2, 10, 1, 50, 2])
+        self.assertTrue(allequal(bitmap.todense(), self.dense1))
+        bitmap = Bitmap.fromruns(100, [50, 0, 1, 99, 10], [52, 2, 3, 100, 11])
+        self.assertEqual(list(bitmap.runs()), list(self.bitmap1.runs()))
+
+    def test02_operators(self):
+        """Combining bitmaps."""
+        bitmap1, bitmap2 = self.bitmap1, self.bitmap2
+        dense1, dense2 = self.dense1, self.dense2
+        self.assertTrue(allequal((bitmap1 & bitmap2).todense(),
+                                 dense1 & dense2))
+        self.assertTrue(allequal((bitmap1 | bitmap2).todense(),
+                                 dense1 | dense2))
+        self.assertTrue(allequal((~bitmap1).todense(), ~dense1))
+        self.assertTrue(allequal((~bitmap1 & bitmap2).todense(),
+                                 ~dense1 & dense2))
+        self.assertEqual(list((bitmap1 | bitmap2).runs()),
+                         [(0, 60), (99, 100)])
+
+
 #----------------------------------------------------------------------
 
 def suite():
@@ -2351,6 +3246,19 @@ def suite():
         theSuite.addTest(unittest.makeSuite(readSortedIndex3))
         theSuite.addTest(unittest.makeSuite(readSortedIndex6))
         theSuite.addTest(unittest.makeSuite(readSortedIndex9))
+        theSuite.addTest(unittest.makeSuite(ExternalSortTestCase))
+        theSuite.addTest(unittest.makeSuite(SpilledExternalSortTestCase))
+        theSuite.addTest(unittest.makeSuite(CompositeIndexTestCase))
+        theSuite.addTest(unittest.makeSuite(ChunkmapCompositeIndexTestCase))
+        theSuite.addTest(unittest.makeSuite(DeltaIndexTestCase))
+        theSuite.addTest(unittest.makeSuite(MediumDeltaIndexTestCase))
+        theSuite.addTest(unittest.makeSuite(ParallelIndexTestCase))
+        theSuite.addTest(unittest.makeSuite(MemoryBudgetTestCase))
+        theSuite.addTest(unittest.makeSuite(BatchSearchTestCase))
+        theSuite.addTest(unittest.makeSuite(StatsTestCase))
+        theSuite.addTest(unittest.makeSuite(ZoneMapTestCase))
+        theSuite.addTest(unittest.makeSuite(KeysortTestCase))
+        theSuite.addTest(unittest.makeSuite(BitmapTestCase))
     if heavy:
         # These are too heavy for normal testing
         theSuite.addTest(unittest.makeSuite(AI4bTestCase))
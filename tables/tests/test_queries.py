@@ -10,8 +10,12 @@ Test module for queries on datasets
 """
 
 import re
+import os
 import new
+import glob
+import tempfile
 import unittest
+import threading
 
 import numpy
 
@@ -1044,11 +1048,10 @@ class IndexedTableUsage30(IndexedTableUsage):
         '((c_int32 == 3) | (c_int32 == 4)) & (c_int32 == 5)'+
         ' & (c_extra > 0)',
         ]
-    idx_expr = [ ( 'c_int32', ('eq',), (3,) ),
-                 ( 'c_int32', ('eq',), (4,) ),
+    idx_expr = [ ( 'c_int32', (('eq',), ('eq',)), ((3,), (4,)) ),
                  ( 'c_int32', ('eq',), (5,) ),
                  ]
-    str_expr = '((e0 | e1) & e2)'
+    str_expr = '(e0 & e1)'
 
 class IndexedTableUsage31(IndexedTableUsage):
     conditions = [
@@ -1067,6 +1070,1074 @@ class IndexedTableUsage32(IndexedTableUsage):
     idx_expr = []
     str_expr = ''
 
+class IndexedTableUsage33(IndexedTableUsage):
+    conditions = [
+        '(c_int32 < 0) | (c_int32 > 5)',
+        '((c_int32 < 0) | (c_int32 > 5)) & (c_extra > 0)',
+        '(c_extra > 0) & ((c_int32 < 0) | ~(c_int32 <= 5))',
+        ]
+    idx_expr = [ ( 'c_int32', (('lt',), ('gt',)), ((0,), (5,)) ),
+                 ]
+    str_expr = 'e0'
+
+class IndexedTableUsage34(IndexedTableUsage):
+    conditions = [
+        '(c_int32 == 1) | (c_int32 == 3) | ((c_int32 > 5) & (c_int32 < 9))',
+        '((c_int32 == 1) | (c_int32 == 3) | ((c_int32 > 5) & (c_int32 < 9)))'+
+        ' & (c_extra > 0)',
+        ]
+    idx_expr = [ ( 'c_int32', (('eq',), ('eq',), ('gt', 'lt')),
+                   ((1,), (3,), (5, 9)) ),
+                 ]
+    str_expr = 'e0'
+
+
+# Query API tests
+# ---------------
+class BaseQueryAPITestCase(common.TempFileMixin, common.PyTablesTestCase):
+
+    """
+    Base test case for the query methods working on a simple table.
+
+    Sub-classes may redefine the ``indexed`` attribute in order to
+    index the ``c_int32`` column with an index of ``kind`` kind.
+    """
+
+    nrows = 500
+    nrowsinbuf = 33
+    chunkshape = None
+    indexed = False
+    kind = 'medium'
+
+    class Description(tables.IsDescription):
+        c_int32 = tables.Int32Col(pos=0)
+        c_float64 = tables.Float64Col(pos=1)
+        c_key = tables.Int32Col(pos=2)
+
+    def setUp(self):
+        super(BaseQueryAPITestCase, self).setUp()
+        self.table = table = self.h5file.createTable(
+            '/', 'test', self.Description, expectedrows=self.nrows,
+            chunkshape=self.chunkshape )
+        row = table.row
+        for i in xrange(self.nrows):
+            row['c_int32'] = (i * 7) % 101
+            row['c_float64'] = i / 3.
+            row['c_key'] = i % 10
+            row.append()
+        table.flush()
+        table.nrowsinbuf = self.nrowsinbuf
+        if self.indexed:
+            table.cols.c_int32.createIndex(
+                kind=self.kind, _blocksizes=small_blocksizes)
+        self.data = table.read()
+
+
+class WhereBlocksTestCase(BaseQueryAPITestCase):
+
+    def check(self, condition, start=None, stop=None, step=None):
+        table = self.table
+        coords = table.getWhereList(condition, {}, start=start,
+                                    stop=stop, step=step, sort=True)
+        blocks = list(table.whereBlocks(condition, {}, start, stop, step))
+        if blocks:
+            bcoords = numpy.concatenate([c for (r, c) in blocks])
+            brecords = numpy.concatenate([r for (r, c) in blocks])
+        else:
+            bcoords = numpy.array([], dtype=SizeType)
+            brecords = self.data[:0]
+        vprint("* %d blocks for condition ``%s``" % (len(blocks), condition))
+        self.assertTrue(common.allequal(bcoords, coords))
+        self.assertTrue(common.allequal(brecords, self.data[coords]))
+        for (records, bcoords) in blocks:
+            self.assertTrue(len(records) > 0)
+
+    def test00_simple(self):
+        """Blocks of a simple condition."""
+        self.check('c_int32 < 20')
+
+    def test01_complex(self):
+        """Blocks of a condition involving several columns."""
+        self.check('(c_int32 >= 10) & (c_int32 < 60) & (c_float64 > 50)')
+
+    def test02_range(self):
+        """Blocks of a condition on a range of rows."""
+        self.check('c_int32 < 50', start=3, stop=451, step=4)
+
+    def test03_empty(self):
+        """Blocks of a condition without hits."""
+        self.check('c_int32 > 200')
+        self.check('c_int32 < 50', start=10, stop=10)
+
+    def test04_cached(self):
+        """Blocks of a condition repeated several times."""
+        for i in range(3):
+            self.check('(c_int32 > 10) & (c_int32 <= 12)')
+            self.check('(c_int32 > 10) & (c_int32 <= 12)', step=3)
+
+
+class IndexedWhereBlocksTestCase(WhereBlocksTestCase):
+    indexed = True
+
+    def test05_cachedBlocks(self):
+        """Blocks of a cached result are read from their coordinates."""
+        table = self.table
+        condition = 'c_int32 < 30'
+        self.check(condition)
+        self.assertTrue(table.explain(condition, analyze=False).seqcache_hit)
+        def itersequence(sequence):
+            self.fail("rows of cached results must not be iterated")
+        table.itersequence = itersequence
+        try:
+            blocks = list(table.whereBlocks(condition, {}))
+        finally:
+            del table.itersequence
+        coords = numpy.concatenate([c for (r, c) in blocks])
+        self.assertTrue(common.allequal(
+            coords, numpy.flatnonzero(self.data['c_int32'] < 30)))
+        for (records, bcoords) in blocks:
+            self.assertTrue(len(bcoords) <= self.nrowsinbuf)
+            self.assertTrue(common.allequal(records, self.data[bcoords]))
+
+
+class AggregateWhereTestCase(BaseQueryAPITestCase):
+
+    def test00_aggregates(self):
+        """Computing all the supported aggregates."""
+        condition = '(c_int32 > 10) & (c_float64 < 120)'
+        data = self.data
+        sel = data[(data['c_int32'] > 10) & (data['c_float64'] < 120)]
+        aggs = self.table.aggregateWhere(
+            condition, {'c_int32': ('count', 'min', 'max'),
+                        'c_float64': ('sum', 'mean'), 'c_key': 'max'}, {})
+        vprint("* Aggregates: %s" % aggs)
+        self.assertEqual(aggs['c_int32'],
+                         (len(sel), sel['c_int32'].min(),
+                          sel['c_int32'].max()))
+        self.assertAlmostEqual(aggs['c_float64'][0], sel['c_float64'].sum())
+        self.assertAlmostEqual(aggs['c_float64'][1], sel['c_float64'].mean())
+        self.assertEqual(aggs['c_key'], sel['c_key'].max())
+
+    def test01_count(self):
+        """Counting the rows fulfilling a condition."""
+        data = self.data
+        for condition, sel in [
+            ('c_int32 == 42', data['c_int32'] == 42),
+            ('(c_int32 >= 3) & (c_int32 < 90)',
+             (data['c_int32'] >= 3) & (data['c_int32'] < 90)),
+            ('(c_int32 > 3) & (c_key == 2)',
+             (data['c_int32'] > 3) & (data['c_key'] == 2)), ]:
+            aggs = self.table.aggregateWhere(condition, {'c_key': 'count'}, {})
+            self.assertEqual(aggs['c_key'], sel.sum())
+
+    def test02_range(self):
+        """Computing aggregates on a range of rows."""
+        data = self.data[10:400:3]
+        sel = data[data['c_int32'] < 30]
+        aggs = self.table.aggregateWhere(
+            'c_int32 < 30', {'c_int32': ('count', 'sum')}, {},
+            start=10, stop=400, step=3)
+        self.assertEqual(aggs['c_int32'], (len(sel), sel['c_int32'].sum()))
+
+    def test03_empty(self):
+        """Computing aggregates without hits."""
+        aggs = self.table.aggregateWhere(
+            'c_int32 < 0', {'c_int32': ('count', 'sum', 'min', 'max', 'mean')},
+            {})
+        self.assertEqual(aggs['c_int32'], (0, 0, None, None, None))
+
+    def test04_errors(self):
+        """Requesting unsupported aggregates."""
+        self.assertRaises(KeyError, self.table.aggregateWhere,
+                          'c_int32 < 0', {'foo': 'sum'}, {})
+        self.assertRaises(ValueError, self.table.aggregateWhere,
+                          'c_int32 < 0', {'c_int32': 'median'}, {})
+
+    def test04b_types(self):
+        """Requesting aggregates not supported by the column type."""
+        table = self.h5file.createTable(
+            '/', 'strings', {'s': tables.StringCol(4), 'x': tables.Int32Col()})
+        table.append([('a', 1), ('b', 2)])
+        for afunc in ['sum', 'mean', 'min', 'max']:
+            self.assertRaises(TypeError, table.aggregateWhere,
+                              'x > 0', {'s': afunc}, {})
+            self.assertRaises(TypeError, table.groupby, 'x', {'s': afunc})
+        self.assertEqual(table.aggregateWhere('x > 0', {'s': 'count'}, {}),
+                         {'s': 2})
+
+class IndexedAggregateWhereTestCase(AggregateWhereTestCase):
+    indexed = True
+    kind = 'full'
+
+    def test05_index_count(self):
+        """Counting rows from the index alone."""
+        table = self.table
+        condvars = table._requiredExprVars('c_int32 < 50', {})
+        compiled = table._compileCondition('c_int32 < 50', condvars)
+        count = table._countWithIndex(compiled, condvars, 0, table.nrows, 1)
+        self.assertEqual(count, (self.data['c_int32'] < 50).sum())
+
+
+class ParallelQueryTestCase(BaseQueryAPITestCase):
+
+    conditions = [
+        'c_int32 < 20',
+        '(c_int32 >= 10) & (c_int32 < 60) & (c_float64 > 50)',
+        'c_int32 > 200', ]
+
+    def test00_getWhereList(self):
+        """Getting coordinates with several threads."""
+        table = self.table
+        for condition in self.conditions:
+            coords1 = table.getWhereList(condition, {}, sort=True)
+            coords2 = table.getWhereList(condition, {}, nthreads=3)
+            self.assertTrue(common.allequal(coords1, coords2))
+            coords1 = table.getWhereList(condition, {}, sort=True,
+                                         start=5, stop=450, step=7)
+            coords2 = table.getWhereList(condition, {}, nthreads=4,
+                                         start=5, stop=450, step=7)
+            self.assertTrue(common.allequal(coords1, coords2))
+
+    def test01_readWhere(self):
+        """Reading rows with several threads."""
+        table = self.table
+        for condition in self.conditions:
+            rows1 = table.readWhere(condition, {})
+            rows2 = table.readWhere(condition, {}, nthreads=3)
+            self.assertTrue(common.allequal(rows1, rows2))
+            rows1 = table.readWhere(condition, {}, field='c_float64')
+            rows2 = table.readWhere(condition, {}, field='c_float64',
+                                    nthreads=2)
+            self.assertTrue(common.allequal(rows1, rows2))
+
+    def test02_parameter(self):
+        """Using the ``QUERY_THREADS`` parameter."""
+        table = self.table
+        self.h5file.params['QUERY_THREADS'] = 4
+        aggs = table.aggregateWhere('c_int32 < 20', {'c_float64': 'sum'}, {})
+        data = self.data
+        self.assertAlmostEqual(
+            aggs['c_float64'], data['c_float64'][data['c_int32'] < 20].sum())
+
+    def test03_errors(self):
+        """Using wrong numbers of threads."""
+        self.assertRaises(ValueError, self.table.readWhere,
+                          'c_int32 < 20', {}, nthreads=0)
+        self.assertRaises(ValueError, self.table.getWhereList,
+                          'c_int32 < 20', {}, nthreads='2')
+
+    def test04_stopEarly(self):
+        """Stopping a query with several threads before its end."""
+        table = self.table
+        nthreads = threading.activeCount()
+        blocks = table.whereBlocks('c_int32 >= 0', {}, nthreads=4)
+        records, coords = blocks.next()
+        self.assertTrue(threading.activeCount() > nthreads)
+        blocks.close()
+        # The workers are stopped when the blocks are not needed anymore
+        self.assertEqual(threading.activeCount(), nthreads)
+
+    def test05_chunkAligned(self):
+        """Buffers are aligned with table chunks."""
+        table = self.table
+        cs = table.chunkshape[0]
+        for (start, step) in [(0, 1), (5, 1), (3, 4)]:
+            ranges = list(table._blockRanges(start, table.nrows, step))
+            self.assertEqual(ranges[0][0], start)
+            self.assertEqual(ranges[-1][1], table.nrows)
+            for (bstart, bstop) in ranges[:-1]:
+                self.assertEqual(bstop % cs, 0)
+                self.assertEqual((bstart - start) % step, 0)
+                nrows = len(xrange(bstart, bstop, step))
+                self.assertTrue(nrows <= max(table.nrowsinbuf, cs))
+
+class IndexedParallelQueryTestCase(ParallelQueryTestCase):
+    indexed = True
+
+
+class CoveringQueryTestCase(BaseQueryAPITestCase):
+    indexed = True
+    kind = 'full'
+
+    def test00_readWhere(self):
+        """Reading the indexed column from its index."""
+        table, data = self.table, self.data
+        for (condition, sel) in [
+            ('c_int32 == 42', data['c_int32'] == 42),
+            ('(c_int32 >= 3) & (c_int32 < 90)',
+             (data['c_int32'] >= 3) & (data['c_int32'] < 90)),
+            ('c_int32 > 200', data['c_int32'] > 200), ]:
+            values = table.readWhere(condition, {}, field='c_int32')
+            vprint("* %d values for condition ``%s``"
+                   % (len(values), condition))
+            self.assertTrue(common.allequal(values, data['c_int32'][sel]))
+            values = table.readWhere(condition, {}, field='c_int32',
+                                     start=3, stop=400, step=7)
+            self.assertTrue(common.allequal(
+                values, data['c_int32'][3:400:7][sel[3:400:7]]))
+
+    def test01_covering(self):
+        """Checking which queries are answered from the index."""
+        table = self.table
+        for (condition, colname, covered) in [
+            ('c_int32 < 50', 'c_int32', True),
+            ('c_int32 < 50', 'c_key', False),
+            ('(c_int32 < 50) & (c_key > 3)', 'c_int32', False), ]:
+            condvars = table._requiredExprVars(condition, {})
+            compiled = table._compileCondition(condition, condvars)
+            result = table._coveringWhere(
+                compiled, condvars, colname, 0, table.nrows, 1)
+            self.assertEqual(result is not None, covered)
+
+    def test02_aggregateWhere(self):
+        """Computing aggregates of the indexed column from its index."""
+        data = self.data
+        sel = data['c_int32'][(data['c_int32'] > 5) & (data['c_int32'] <= 77)]
+        aggs = self.table.aggregateWhere(
+            '(c_int32 > 5) & (c_int32 <= 77)',
+            {'c_int32': ('count', 'sum', 'min', 'max')}, {})
+        self.assertEqual(aggs['c_int32'],
+                         (len(sel), sel.sum(), sel.min(), sel.max()))
+
+
+class ExactCoordsQueryTestCase(BaseQueryAPITestCase):
+    indexed = True
+    kind = 'full'
+
+    def setUp(self):
+        super(ExactCoordsQueryTestCase, self).setUp()
+        # Always read exact coordinates from the index
+        self.h5file.params['COORDS_MAX_RATIO'] = 1.0
+
+    conditions = [
+        'c_int32 == 42',
+        '(c_int32 >= 3) & (c_int32 < 10)',
+        '(c_int32 < 10) | (c_int32 > 95)',
+        '(c_int32 < 10) & (c_key > 3)',
+        'c_int32 > 200', ]
+
+    def selection(self, condition, start, stop, step):
+        data = self.data
+        sel = eval(condition, {}, dict((name, data[name])
+                                       for name in data.dtype.names))
+        return numpy.arange(len(data))[start:stop:step][sel[start:stop:step]]
+
+    def test00_getWhereList(self):
+        """Getting coordinates of rows from exact index coordinates."""
+        for condition in self.conditions:
+            for (start, stop, step) in [(None, None, None), (3, 400, 7)]:
+                coords = self.table.getWhereList(condition, {}, start=start,
+                                                 stop=stop, step=step)
+                vprint("* %d coordinates for condition ``%s``"
+                       % (len(coords), condition))
+                self.assertTrue(common.allequal(
+                    coords, self.selection(condition, start, stop, step)))
+
+    def test01_where(self):
+        """Iterating over rows from exact index coordinates."""
+        for condition in self.conditions:
+            values = [r['c_float64'] for r in self.table.where(condition, {})]
+            sel = self.selection(condition, None, None, None)
+            self.assertEqual(values, list(self.data['c_float64'][sel]))
+            # Repeating the query must give the same results
+            values = [r['c_float64'] for r in self.table.where(condition, {})]
+            self.assertEqual(values, list(self.data['c_float64'][sel]))
+
+    def test02_whereBlocks(self):
+        """Reading blocks of rows from exact index coordinates."""
+        for condition in self.conditions:
+            blocks = list(self.table.whereBlocks(condition, {}))
+            sel = self.selection(condition, None, None, None)
+            if blocks:
+                records = numpy.concatenate([r for (r, c) in blocks])
+                coords = numpy.concatenate([c for (r, c) in blocks])
+            else:
+                records, coords = self.data[:0], numpy.array([])
+            self.assertTrue(common.allequal(coords, sel))
+            self.assertTrue(common.allequal(records, self.data[sel]))
+
+
+class QueryCostTestCase(BaseQueryAPITestCase):
+    chunkshape = (10,)
+    indexed = True
+
+    def test00_estimate(self):
+        """Estimating whether indexes pay off."""
+        table = self.table
+        for (condition, useindex) in [
+            ('c_int32 == 42', True),
+            ('(c_int32 > 40) & (c_int32 < 43)', True),
+            ('c_int32 >= 0', False),
+            ('c_int32 < 90', False),
+            ('(c_int32 < 90) & (c_key > 3)', False), ]:
+            self.assertEqual(table.willQueryUseIndexing(condition, {}),
+                             frozenset(['c_int32']))
+            idxcols = table.willQueryUseIndexing(condition, {}, estimate=True)
+            vprint("* condition ``%s`` uses indexes %s" % (condition, idxcols))
+            self.assertEqual(bool(idxcols), useindex)
+
+    def test01_index_always(self):
+        """Using indexes whatever the ratio of selected chunks is."""
+        self.h5file.params['INDEX_MAX_CHUNK_RATIO'] = 1
+        self.assertTrue(self.table.willQueryUseIndexing(
+            'c_int32 >= 0', {}, estimate=True))
+
+    def test02_results(self):
+        """Getting the same results when falling back to a scan."""
+        table, data = self.table, self.data
+        for condition in ['c_int32 >= 0', 'c_int32 < 90', 'c_int32 == 42']:
+            sel = eval(condition, {}, {'c_int32': data['c_int32']})
+            for i in range(2):  # the second time the cache may be hit
+                coords = table.getWhereList(condition, {})
+                self.assertTrue(common.allequal(coords, numpy.where(sel)[0]))
+                values = [r['c_float64'] for r in table.where(condition, {})]
+                self.assertEqual(values, list(data['c_float64'][sel]))
+
+
+class ExplainTestCase(BaseQueryAPITestCase):
+    chunkshape = (10,)
+    indexed = True
+
+    def test00_inkernel(self):
+        """Explaining an in-kernel query."""
+        plan = self.table.explain('c_key > 7', {})
+        vprint(plan)
+        self.assertEqual(plan.method, 'in-kernel')
+        self.assertEqual(plan.string_expression, None)
+        self.assertEqual(plan.index_expressions, [])
+        self.assertEqual(plan.nchunks, 50)
+        self.assertEqual(plan.nchunks_selected, 50)
+        self.assertEqual(plan.nrows_read, self.nrows)
+        self.assertEqual(plan.bytes_read, self.nrows * self.table.rowsize)
+        self.assertEqual(plan.nhits, (self.data['c_key'] > 7).sum())
+        self.assertTrue('read' in plan.times)
+
+    def test01_indexed(self):
+        """Explaining an indexed query."""
+        condition = '(c_int32 == 42) & (c_key > 3)'
+        plan = self.table.explain(condition, {})
+        vprint(plan)
+        self.assertEqual(plan.method, 'indexed')
+        self.assertEqual(len(plan.index_expressions), 1)
+        idxexpr = plan.index_expressions[0]
+        self.assertEqual(idxexpr['column'], 'c_int32')
+        self.assertEqual(idxexpr['candidates'],
+                         (self.data['c_int32'] == 42).sum())
+        self.assertEqual(plan.nchunks_selected, 5)
+        data = self.data
+        self.assertEqual(plan.nhits,
+                         ((data['c_int32'] == 42) & (data['c_key'] > 3)).sum())
+
+    def test02_caches(self):
+        """Explaining repeated queries."""
+        table = self.table
+        plan = table.explain('c_int32 == 42', {}, analyze=False)
+        self.assertEqual(plan.nhits, None)
+        self.assertFalse('read' in plan.times)
+        self.assertFalse(plan.seqcache_hit)
+        list(table.where('c_int32 == 42', {}))
+        plan = table.explain('c_int32 == 42', {})
+        vprint(plan)
+        self.assertTrue(plan.seqcache_hit)
+        self.assertEqual(plan.method, 'cached')
+        self.assertEqual(plan.nhits, 5)
+
+
+class PersistentQueryCacheTestCase(BaseQueryAPITestCase):
+    indexed = True
+    condition = '(c_int32 < 10) & (c_key > 3)'
+
+    def setUp(self):
+        super(PersistentQueryCacheTestCase, self).setUp()
+        self.cachefname = tempfile.mktemp(suffix='.cache')
+        self.reopen('a')
+
+    def tearDown(self):
+        super(PersistentQueryCacheTestCase, self).tearDown()
+        for fname in glob.glob(self.cachefname + '*'):
+            os.remove(fname)
+
+    def reopen(self, mode):
+        self.h5file.close()
+        self.h5file = tables.openFile(self.h5fname, mode,
+                                      QUERY_CACHE_FILE=self.cachefname)
+        self.table = self.h5file.root.test
+
+    def cached(self, condition):
+        table = self.table
+        condvars = table._requiredExprVars(condition, {})
+        key = table._getQueryCacheKey(condition, condvars, 0, table.nrows, 1)
+        if key is None:
+            return None
+        return self.h5file._getQueryCache().get(key)
+
+    def check(self, condition):
+        data = self.table.read()
+        sel = eval(condition, {}, dict((name, data[name])
+                                       for name in data.dtype.names))
+        coords = self.table.getWhereList(condition, {})
+        self.assertTrue(common.allequal(coords, numpy.where(sel)[0]))
+
+    def test00_reopen(self):
+        """Answering queries from the cache after reopening the file."""
+        self.assertTrue(self.cached(self.condition) is None)
+        self.check(self.condition)
+        self.reopen('r')
+        coords = self.cached(self.condition)
+        vprint("* cached coordinates: %s" % coords)
+        self.assertTrue(coords is not None)
+        self.check(self.condition)
+        values = [r['c_float64'] for r in self.table.where(self.condition, {})]
+        self.assertEqual(values, list(self.table.read(field='c_float64')[coords]))
+
+    def test01_modify(self):
+        """Discarding cached results after modifying the table."""
+        self.check(self.condition)
+        self.table.cols.c_key[:5] = numpy.arange(5) + 5
+        self.assertTrue(self.cached(self.condition) is None)
+        self.check(self.condition)
+        self.reopen('a')
+        self.table.modifyColumn(0, 10, column=numpy.zeros(10, 'int32'),
+                                colname='c_int32')
+        self.reopen('r')
+        self.assertTrue(self.cached(self.condition) is None)
+        self.check(self.condition)
+
+    def test02_append(self):
+        """Discarding cached results after appending rows."""
+        self.check(self.condition)
+        self.table.append([(1, 0., 9)])
+        self.assertTrue(self.cached(self.condition) is None)
+        self.check(self.condition)
+        self.reopen('r')
+        self.assertTrue(self.cached(self.condition) is not None)
+        self.check(self.condition)
+
+    def test03_untracked(self):
+        """Not caching queries on tables without a data version."""
+        self.h5file.close()
+        self.h5file = tables.openFile(self.h5fname, 'r')
+        self.assertFalse('QUERY_VERSION' in self.h5file.root.test._v_attrs)
+        self.reopen('r')
+        self.assertTrue(self.table._getQueryCacheKey(
+            self.condition, {}, 0, self.table.nrows, 1) is None)
+        self.check(self.condition)
+        self.assertTrue(self.cached(self.condition) is None)
+
+    def test04_modifyUncached(self):
+        """Discarding cached results after modifying without the cache."""
+        self.check(self.condition)
+        self.h5file.close()
+        self.h5file = tables.openFile(self.h5fname, 'a')
+        self.h5file.root.test.modifyRows(0, 1, rows=[(0, 0., 9)])
+        self.reopen('r')
+        self.assertTrue(self.cached(self.condition) is None)
+        self.check(self.condition)
+
+    def test05_regenerate(self):
+        """Discarding cached results of a regenerated file."""
+        self.check(self.condition)
+        self.reopen('r')
+        self.assertTrue(self.cached(self.condition) is not None)
+        data = self.table.read()
+        data['c_int32'] = data['c_int32'][::-1].copy()
+        self.h5file.close()
+        os.remove(self.h5fname)
+        self.h5file = tables.openFile(self.h5fname, 'w')
+        table = self.h5file.createTable('/', 'test', data)
+        table.cols.c_int32.createIndex(
+            kind=self.kind, _blocksizes=small_blocksizes)
+        self.reopen('a')
+        self.assertTrue(self.cached(self.condition) is None)
+        self.check(self.condition)
+
+
+class PreparedQueryTestCase(BaseQueryAPITestCase):
+    indexed = True
+    condition = '(c_int32 > lo) & (c_int32 < hi) & (c_key != k)'
+
+    def setUp(self):
+        super(PreparedQueryTestCase, self).setUp()
+        self.query = self.table.prepare(
+            self.condition, params=('lo', 'hi'), condvars={'k': 3})
+
+    def expected(self, lo, hi):
+        data = self.data
+        sel = ( (data['c_int32'] > lo) & (data['c_int32'] < hi)
+                & (data['c_key'] != 3) )
+        return numpy.where(sel)[0]
+
+    def test00_where(self):
+        """Iterating over prepared queries with several parameters."""
+        for (lo, hi) in [(10, 20), (0, 3), (50, 50), (-1, 200), (2.5, 7.5)]:
+            coords = [r.nrow for r in self.query.where(lo=lo, hi=hi)]
+            vprint("* %s < c_int32 < %s: %d rows" % (lo, hi, len(coords)))
+            self.assertEqual(coords, list(self.expected(lo, hi)))
+
+    def test01_read(self):
+        """Reading from prepared queries with several parameters."""
+        for (lo, hi) in [(10, 20), (90, 95), (50, 50)]:
+            sel = self.expected(lo, hi)
+            result = self.query.read(lo=lo, hi=hi)
+            self.assertTrue(common.areArraysEqual(result, self.data[sel]))
+            result = self.query.read(field='c_float64', lo=lo, hi=hi)
+            self.assertTrue(common.areArraysEqual(
+                result, self.data['c_float64'][sel]))
+            result = self.query.read(start=100, stop=300, lo=lo, hi=hi)
+            sel = sel[(sel >= 100) & (sel < 300)]
+            self.assertTrue(common.areArraysEqual(result, self.data[sel]))
+
+    def test02_reuse(self):
+        """Reusing the compiled condition of prepared queries."""
+        list(self.query.where(lo=10, hi=20))
+        self.assertEqual(len(self.query._condkeys), 1)
+        list(self.query.where(lo=30, hi=40))
+        self.assertEqual(len(self.query._condkeys), 1)
+        list(self.query.where(lo=30., hi=40.))
+        self.assertEqual(len(self.query._condkeys), 2)
+
+    def test03_errors(self):
+        """Checking errors in prepared queries."""
+        self.assertRaises(TypeError, self.query.where, lo=1)
+        self.assertRaises(TypeError, self.query.where, lo=1, hi=2, x=3)
+        self.assertRaises(ValueError, self.table.prepare,
+                          'c_int32 > lo', params=('lo', 'hi'))
+        self.assertRaises(NameError, self.table.prepare, 'c_int32 > lo')
+
+
+class MultiRangeQueryTestCase(BaseQueryAPITestCase):
+    indexed = True
+    conditions = [
+        '(c_int32 < 5) | (c_int32 > 95)',
+        '(c_int32 == 1) | (c_int32 == 7) | (c_int32 == 42)',
+        '(c_int32 < 10) | (c_int32 < 20) | (c_int32 == 15)',
+        '(((c_int32 > 10) & (c_int32 < 20)) | (c_int32 >= 15)) & (c_key > 3)',
+        '(c_int32 < lo) | (c_int32 > hi)',
+        '(c_int32 > 50) | (c_int32 < 0)',
+        '(c_int32 < 0) | (c_int32 > 200)',
+        ]
+    condvars = {'lo': 3, 'hi': 97}
+
+    def test00_results(self):
+        """Querying disjunctions of ranges on a single index."""
+        table, data = self.table, self.data
+        for condition in self.conditions:
+            self.assertEqual(
+                table.willQueryUseIndexing(condition, self.condvars),
+                frozenset(['c_int32']))
+            names = dict((name, data[name]) for name in data.dtype.names)
+            names.update(self.condvars)
+            expected = numpy.where(eval(condition, {}, names))[0]
+            coords = table.getWhereList(condition, self.condvars)
+            vprint("* %d rows for condition ``%s``"
+                   % (len(coords), condition))
+            self.assertTrue(common.allequal(coords, expected))
+            coords = [r.nrow for r in table.where(condition, self.condvars)]
+            self.assertEqual(coords, list(expected))
+
+    def test01_single(self):
+        """Searching the index once for the whole disjunction."""
+        condition = '(c_int32 < 5) | (c_int32 > 95)'
+        plan = self.table.explain(condition, {})
+        vprint(plan)
+        self.assertEqual(plan.string_expression, 'e0')
+        self.assertEqual(len(plan.index_expressions), 1)
+        sel = (self.data['c_int32'] < 5) | (self.data['c_int32'] > 95)
+        if self.table.cols.c_int32.index.reduction == 1:
+            self.assertEqual(plan.index_expressions[0]['candidates'],
+                             sel.sum())
+        self.assertEqual(plan.nhits, sel.sum())
+
+
+class FullMultiRangeQueryTestCase(MultiRangeQueryTestCase):
+    kind = 'full'
+
+
+class UltraLightMultiRangeQueryTestCase(MultiRangeQueryTestCase):
+    kind = 'ultralight'
+
+
+class ReadWhereSortedTestCase(BaseQueryAPITestCase):
+    condition = '(c_int32 < 50) & (c_key != 3)'
+    csi = False
+
+    def setUp(self):
+        super(ReadWhereSortedTestCase, self).setUp()
+        if self.csi:
+            self.table.cols.c_float64.createCSIndex(
+                _blocksizes=small_blocksizes)
+
+    def expected(self, sortby, limit, reverse, start=0, stop=None, step=1):
+        data = self.data
+        coords = numpy.arange(len(data))[start:stop:step]
+        data = data[start:stop:step]
+        sel = (data['c_int32'] < 50) & (data['c_key'] != 3)
+        data, coords = data[sel], coords[sel]
+        if sortby is None:
+            keys = coords
+        else:
+            keys = data[sortby]
+        order = numpy.lexsort((coords, keys))
+        if reverse:
+            order = order[::-1]
+        return data[order][:limit]
+
+    def test00_sortby(self):
+        """Reading sorted query results."""
+        table = self.table
+        for sortby in ['c_float64', table.cols.c_float64, 'c_int32']:
+            for reverse in [False, True]:
+                for limit in [None, 1, 10, 1000]:
+                    result = table.readWhere(
+                        self.condition, sortby=sortby, limit=limit,
+                        reverse=reverse)
+                    colname = getattr(sortby, 'pathname', sortby)
+                    expected = self.expected(colname, limit, reverse)
+                    vprint("* %d rows sorted by %s (reverse: %s)"
+                           % (len(result), colname, reverse))
+                    self.assertEqual(len(result), len(expected))
+                    # Rows with equal values may come in any order
+                    self.assertTrue(common.allequal(result[colname],
+                                                    expected[colname]))
+                    if colname == 'c_float64':
+                        self.assertTrue(common.allequal(result, expected))
+
+    def test01_limit(self):
+        """Reading the first and last rows of query results."""
+        table = self.table
+        for reverse in [False, True]:
+            for limit in [0, 1, 10, 1000]:
+                result = table.readWhere(
+                    self.condition, limit=limit, reverse=reverse)
+                expected = self.expected(None, limit, reverse)
+                self.assertTrue(common.allequal(result, expected))
+
+    def test02_range(self):
+        """Reading sorted query results in a range of rows."""
+        result = self.table.readWhere(
+            self.condition, start=50, stop=400, step=3, sortby='c_float64',
+            limit=20, reverse=True)
+        expected = self.expected('c_float64', 20, True, 50, 400, 3)
+        self.assertTrue(common.allequal(result, expected))
+
+    def test03_field(self):
+        """Reading a field of sorted query results."""
+        result = self.table.readWhere(
+            self.condition, field='c_key', sortby='c_float64', limit=10)
+        expected = self.expected('c_float64', 10, False)['c_key']
+        self.assertTrue(common.allequal(result, expected))
+
+    def test04_errors(self):
+        """Reading sorted query results with wrong arguments."""
+        table = self.table
+        self.assertRaises(ValueError, table.readWhere, self.condition,
+                          limit=-1)
+        self.assertRaises(ValueError, table.readWhere, self.condition,
+                          limit=2.5)
+        self.assertRaises(KeyError, table.readWhere, self.condition,
+                          sortby='c_none')
+
+
+class IndexedReadWhereSortedTestCase(ReadWhereSortedTestCase):
+    indexed = True
+
+
+class CSIndexedReadWhereSortedTestCase(ReadWhereSortedTestCase):
+    indexed = True
+    kind = 'full'
+    csi = True
+
+
+class GroupbyTestCase(BaseQueryAPITestCase):
+    aggregates = { 'c_float64': ('sum', 'min', 'max', 'mean'),
+                   'c_int32': 'count' }
+    csi = False
+    maxsize = None
+
+    def setUp(self):
+        super(GroupbyTestCase, self).setUp()
+        if self.csi:
+            self.table.cols.c_key.createCSIndex(_blocksizes=small_blocksizes)
+        if self.maxsize is not None:
+            self.h5file.params['GROUPBY_MAX_SIZE'] = self.maxsize
+
+    def check(self, result, data, key):
+        keys = numpy.unique(data[key])
+        self.assertEqual([k for (k, aggs) in result], list(keys))
+        for (k, aggs) in result:
+            values = data['c_float64'][data[key] == k]
+            self.assertEqual(aggs['c_int32'], len(values))
+            self.assertAlmostEqual(aggs['c_float64'][0], values.sum())
+            self.assertEqual(aggs['c_float64'][1], values.min())
+            self.assertEqual(aggs['c_float64'][2], values.max())
+            self.assertAlmostEqual(aggs['c_float64'][3], values.mean())
+
+    def test00_groupby(self):
+        """Aggregating rows grouped by a key."""
+        table = self.table
+        for key in ['c_key', table.cols.c_key, 'c_int32']:
+            result = list(table.groupby(key, self.aggregates))
+            key = getattr(key, 'pathname', key)
+            vprint("* %d groups by %s" % (len(result), key))
+            self.check(result, self.data, key)
+
+    def test01_range(self):
+        """Aggregating rows in a range grouped by a key."""
+        result = list(self.table.groupby('c_key', self.aggregates,
+                                         start=20, stop=450, step=7))
+        self.check(result, self.data[20:450:7], 'c_key')
+        self.assertEqual(list(self.table.groupby('c_key', {}, 10, 10)), [])
+
+    def test02_count(self):
+        """Counting rows grouped by a key."""
+        result = list(self.table.groupby('c_key', {'c_float64': 'count'}))
+        self.assertEqual(
+            result, [(k, {'c_float64': 50}) for k in xrange(10)])
+
+    def test03_errors(self):
+        """Aggregating rows grouped by a key with wrong arguments."""
+        table = self.table
+        self.assertRaises(KeyError, table.groupby, 'c_none', {})
+        self.assertRaises(KeyError, table.groupby, 'c_key', {'c_none': 'sum'})
+        self.assertRaises(ValueError, table.groupby, 'c_key',
+                          {'c_int32': 'median'})
+
+
+class CSIndexedGroupbyTestCase(GroupbyTestCase):
+    csi = True
+
+
+class SpilledGroupbyTestCase(GroupbyTestCase):
+    maxsize = 1024
+
+
+class JoinTestCase(common.TempFileMixin, common.PyTablesTestCase):
+    indexed = False
+    maxsize = None
+
+    class Events(tables.IsDescription):
+        user = tables.Int32Col(pos=0)
+        amount = tables.Float64Col(pos=1)
+
+    class Users(tables.IsDescription):
+        user = tables.Int32Col(pos=0)
+        name = tables.StringCol(8, pos=1)
+
+    class Joined(tables.IsDescription):
+        user = tables.Int32Col(pos=0)
+        amount = tables.Float64Col(pos=1)
+        name = tables.StringCol(8, pos=2)
+
+    def setUp(self):
+        super(JoinTestCase, self).setUp()
+        self.events = events = self.h5file.createTable(
+            '/', 'events', self.Events)
+        events.append([((i * 7) % 40, i / 2.) for i in xrange(300)])
+        events.flush()
+        self.users = users = self.h5file.createTable(
+            '/', 'users', self.Users)
+        # Users with no events, and also repeated users
+        users.append([ (i, 'u%d' % i) for i in xrange(0, 60, 3) ]
+                     + [(9, 'u9bis'), (21, 'u21bis')])
+        users.flush()
+        if self.indexed:
+            users.cols.user.createIndex(_blocksizes=small_blocksizes)
+        if self.maxsize is not None:
+            self.h5file.params['SORT_MAX_SIZE'] = self.maxsize
+        events.nrowsinbuf = users.nrowsinbuf = 7
+
+    def expected(self, how):
+        result = []
+        for (user, amount) in self.events.read():
+            names = [ name for (user2, name) in self.users.read()
+                      if user == user2 ]
+            if not names and how == 'left':
+                names = ['']
+            result.extend([(user, amount, name) for name in names])
+        return sorted(result)
+
+    def test00_join(self):
+        """Joining two tables."""
+        for how in ['inner', 'left']:
+            result = tables.join(self.events, self.users, 'user', how)
+            vprint("* %d rows in %s join" % (len(result), how))
+            self.assertEqual(result.dtype.names, ('user', 'amount', 'name'))
+            self.assertEqual(sorted(result.tolist()), self.expected(how))
+            if self.indexed:
+                # Rows come in the order of the left table
+                self.assertTrue((numpy.diff(result['amount']) >= 0).all())
+            else:
+                self.assertTrue((numpy.diff(result['user']) >= 0).all())
+
+    def test01_out(self):
+        """Joining two tables into another one."""
+        joined = self.h5file.createTable('/', 'joined', self.Joined)
+        nrows = tables.join(self.events, self.users, on='user', out=joined)
+        self.assertEqual(nrows, joined.nrows)
+        self.assertEqual(sorted(joined.read().tolist()),
+                         self.expected('inner'))
+
+    def test02_errors(self):
+        """Joining two tables with wrong arguments."""
+        events, users = self.events, self.users
+        self.assertRaises(ValueError, tables.join, events, users, 'user',
+                          how='outer')
+        self.assertRaises(KeyError, tables.join, events, users, 'amount')
+        other = self.h5file.createTable('/', 'other', {'foo': tables.IntCol()})
+        self.assertRaises(ValueError, tables.join, events, users, 'user',
+                          out=other)
+
+
+class IndexedJoinTestCase(JoinTestCase):
+    indexed = True
+
+
+class ExternalSortJoinTestCase(JoinTestCase):
+    maxsize = 200
+
+
+class StringQueryTestCase(common.TempFileMixin, common.PyTablesTestCase):
+    nrows = 500
+    indexed = True
+    kind = 'medium'
+    conditions = [
+        "name.startswith('ab')",
+        "name.startswith('b') & (num > 100)",
+        "name.startswith('')",
+        "name.startswith('zz')",
+        "(name >= 'ab') & (name < 'ac')",
+        "(name > 'abcd') & (name <= 'c')",
+        "name == 'ba5'",
+        "(name >= 'abcd') & (name < 'abcdefgh12345678X')",
+        "name > 'abcdefgh12345678X'",
+        ]
+
+    class Description(tables.IsDescription):
+        name = tables.StringCol(16, pos=0)
+        num = tables.Int32Col(pos=1)
+
+    def setUp(self):
+        super(StringQueryTestCase, self).setUp()
+        self.table = table = self.h5file.createTable(
+            '/', 'test', self.Description, expectedrows=self.nrows)
+        prefixes = ['a', 'ab', 'abc', 'abcdefgh12345678', 'b', 'ba', 'c']
+        row = table.row
+        for i in xrange(self.nrows):
+            row['name'] = "%s%d" % (prefixes[(i * 7) % len(prefixes)], i % 13)
+            row['num'] = i
+            row.append()
+        table.flush()
+        if self.indexed:
+            table.cols.name.createIndex(
+                kind=self.kind, _blocksizes=small_blocksizes)
+
+    def test00_expand(self):
+        """Expanding prefix predicates into ranges."""
+        expand = tables.conditions.expand_startswith
+        self.assertEqual(expand("name.startswith('ab')"),
+                         "((name >= 'ab') & (name < 'ac'))")
+        self.assertEqual(expand("name.startswith('a\\xff') & (x > 1)"),
+                         "((name >= 'a\\xff') & (name < 'b')) & (x > 1)")
+        self.assertEqual(expand("x > 1"), "x > 1")
+        self.assertEqual(expand("(s == 'x.startswith(\"ab\")') | "
+                                "name.startswith(\"it's\")"),
+                         "(s == 'x.startswith(\"ab\")') | "
+                         "((name >= \"it's\") & (name < \"it't\"))")
+
+    def test01_results(self):
+        """Querying string columns with ranges and prefixes."""
+        table = self.table
+        rows = [(r['name'], r['num']) for r in table]
+        for condition in self.conditions:
+            pycond = condition.replace('name', 'r[0]').replace('num', 'r[1]')
+            pycond = pycond.replace('&', 'and')
+            expected = [ r[1] for r in rows if eval(pycond, {}, {'r': r}) ]
+            result = [ r['num'] for r in table.where(condition) ]
+            vprint("* %d rows for condition ``%s``"
+                   % (len(result), condition))
+            self.assertEqual(result, expected)
+            if self.indexed:
+                self.assertEqual(table.willQueryUseIndexing(condition),
+                                 frozenset(['name']))
+
+    def test02_largest(self):
+        """Querying string columns beyond their largest value."""
+        table = self.table
+        table.append([('\xff' * 16, -1)])
+        table.flush()
+        for (condition, expected) in [
+            ("name >= %r" % ('\xff' * 16), [-1]),
+            ("name >= %r" % ('\xff' * 17), []),
+            ("name.startswith(%r)" % ('\xff' * 17), []), ]:
+            result = [ r['num'] for r in table.where(condition) ]
+            self.assertEqual(result, expected)
+
+
+class FullStringQueryTestCase(StringQueryTestCase):
+    kind = 'full'
+
+
+class InKernelStringQueryTestCase(StringQueryTestCase):
+    indexed = False
+
+
+class WhereInTestCase(BaseQueryAPITestCase):
+    chunkshape = (10,)
+    probes = [42, 7, 100, 42, -3, 2.5, 1000, 0]
+
+    def expected(self, data):
+        keys = [42, 7, 100, 0]
+        sel = numpy.zeros(len(data), dtype=bool)
+        for key in keys:
+            sel |= data['c_int32'] == key
+        return numpy.where(sel)[0]
+
+    def test00_lookup(self):
+        """Looking up several values in a column."""
+        coords = self.table.cols.c_int32.lookup(self.probes)
+        vprint("* coordinates found: %s" % coords)
+        self.assertEqual(coords.dtype, numpy.dtype('int64'))
+        self.assertTrue(common.allequal(coords, self.expected(self.data)))
+        self.assertEqual(len(self.table.cols.c_int32.lookup([])), 0)
+        self.assertEqual(len(self.table.cols.c_int32.lookup([-1, 0.5])), 0)
+
+    def test01_whereIn(self):
+        """Iterating over the rows with values in a list."""
+        table = self.table
+        coords = [r.nrow for r in table.whereIn('c_int32', self.probes)]
+        self.assertEqual(coords, list(self.expected(self.data)))
+        values = [r['c_float64'] for r in table.whereIn('c_int32', [7])]
+        sel = self.data['c_int32'] == 7
+        self.assertEqual(values, list(self.data['c_float64'][sel]))
+        coords = [ r.nrow for r in
+                   table.whereIn('c_int32', self.probes, 100, 400, 3) ]
+        expected = [ c for c in self.expected(self.data)
+                     if 100 <= c < 400 and (c - 100) % 3 == 0 ]
+        self.assertEqual(coords, expected)
+
+    def test02_unindexedRows(self):
+        """Looking up values in rows appended after indexing."""
+        table = self.table
+        table.autoIndex = False
+        table.append([(42, 0., 0), (1, 0., 0), (7, 0., 0)])
+        table.flush()
+        coords = table.cols.c_int32.lookup(self.probes)
+        self.assertTrue(common.allequal(coords, self.expected(table.read())))
+
+
+class IndexedWhereInTestCase(WhereInTestCase):
+    indexed = True
+
+
+class FullIndexedWhereInTestCase(WhereInTestCase):
+    indexed = True
+    kind = 'full'
+
+
+class UltraLightIndexedWhereInTestCase(WhereInTestCase):
+    indexed = True
+    kind = 'ultralight'
+
 
 
 # Main part
@@ -1130,6 +2201,40 @@ def suite():
         testSuite.addTest(unittest.makeSuite(IndexedTableUsage30))
         testSuite.addTest(unittest.makeSuite(IndexedTableUsage31))
         testSuite.addTest(unittest.makeSuite(IndexedTableUsage32))
+        testSuite.addTest(unittest.makeSuite(IndexedTableUsage33))
+        testSuite.addTest(unittest.makeSuite(IndexedTableUsage34))
+        # Tests on the query API.
+        testSuite.addTest(unittest.makeSuite(WhereBlocksTestCase))
+        testSuite.addTest(unittest.makeSuite(IndexedWhereBlocksTestCase))
+        testSuite.addTest(unittest.makeSuite(AggregateWhereTestCase))
+        testSuite.addTest(unittest.makeSuite(IndexedAggregateWhereTestCase))
+        testSuite.addTest(unittest.makeSuite(ParallelQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(IndexedParallelQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(CoveringQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(ExactCoordsQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(QueryCostTestCase))
+        testSuite.addTest(unittest.makeSuite(ExplainTestCase))
+        testSuite.addTest(unittest.makeSuite(PersistentQueryCacheTestCase))
+        testSuite.addTest(unittest.makeSuite(PreparedQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(MultiRangeQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(FullMultiRangeQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(UltraLightMultiRangeQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(ReadWhereSortedTestCase))
+        testSuite.addTest(unittest.makeSuite(IndexedReadWhereSortedTestCase))
+        testSuite.addTest(unittest.makeSuite(CSIndexedReadWhereSortedTestCase))
+        testSuite.addTest(unittest.makeSuite(GroupbyTestCase))
+        testSuite.addTest(unittest.makeSuite(CSIndexedGroupbyTestCase))
+        testSuite.addTest(unittest.makeSuite(SpilledGroupbyTestCase))
+        testSuite.addTest(unittest.makeSuite(JoinTestCase))
+        testSuite.addTest(unittest.makeSuite(IndexedJoinTestCase))
+        testSuite.addTest(unittest.makeSuite(ExternalSortJoinTestCase))
+        testSuite.addTest(unittest.makeSuite(StringQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(FullStringQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(InKernelStringQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(WhereInTestCase))
+        testSuite.addTest(unittest.makeSuite(IndexedWhereInTestCase))
+        testSuite.addTest(unittest.makeSuite(FullIndexedWhereInTestCase))
+        testSuite.addTest(unittest.makeSuite(UltraLightIndexedWhereInTestCase))
 
     return testSuite
 